@@ -0,0 +1,258 @@
+import hashlib
+import math
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import List, Any, Optional, Callable, Dict
+from rag_source_base import RetrievedDocument
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip("?!. ")
+
+
+def document_fingerprint(documents: List[Any]) -> str:
+    """Hash the IDs and contents of the retrieved documents, in retrieval order."""
+    digest = hashlib.sha256()
+    for doc in documents:
+        doc = RetrievedDocument.from_any(doc)
+        digest.update(str(doc.id if doc.id is not None else '').encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(hashlib.sha256(doc.text_bytes()).digest())
+    return digest.hexdigest()
+
+
+def _cosine(a: array, b: array) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class AnswerCache:
+    """
+    Persistent cache of generated answers, stored in SQLite.
+
+    Entries are keyed on the normalized question plus a fingerprint of the
+    retrieved documents, so an answer is only reused when the model would
+    have seen exactly the same context. When an embed function is supplied,
+    questions that miss exactly can still hit an entry with the same
+    documents whose question embedding is close enough.
+    """
+
+    def __init__(self,
+                 path: str,
+                 max_entries: int = 1000,
+                 ttl_seconds: Optional[float] = None,
+                 embed_fn: Optional[Callable[[str], List[float]]] = None,
+                 similarity_threshold: float = 0.95,
+                 namespace: str = ""):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.embed_fn = embed_fn
+        self.similarity_threshold = similarity_threshold
+        self.namespace = namespace
+
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._pending_embeddings: Dict[str, array] = {}
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS answers (
+                key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                embedding BLOB,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS answers_fingerprint ON answers (fingerprint);
+            CREATE INDEX IF NOT EXISTS answers_last_access ON answers (last_access);
+            CREATE TABLE IF NOT EXISTS meta (
+                name TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        self._conn.commit()
+
+    def _key(self, normalized: str, fingerprint: str) -> str:
+        raw = f"{self.namespace}\0{normalized}\0{fingerprint}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def _embed(self, normalized: str) -> array:
+        with self._lock:
+            embedding = self._pending_embeddings.get(normalized)
+        if embedding is None:
+            # Embed outside the lock: it is a network call
+            embedding = array('f', self.embed_fn(normalized))
+            with self._lock:
+                if len(self._pending_embeddings) >= 256:
+                    self._pending_embeddings.clear()
+                self._pending_embeddings[normalized] = embedding
+        return embedding
+
+    def get(self, question: str, documents: List[Any]) -> Optional[str]:
+        normalized = normalize_question(question)
+        fingerprint = document_fingerprint(documents)
+        key = self._key(normalized, fingerprint)
+        now = time.time()
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT answer, created_at FROM answers WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row and self._is_expired(row[1], now):
+                self._conn.execute("DELETE FROM answers WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+
+            if row:
+                self._touch(key, now)
+                self.hits += 1
+                return row[0]
+
+        if self.embed_fn:
+            answer = self._get_similar(normalized, fingerprint, now)
+            if answer is not None:
+                return answer
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _get_similar(self, normalized: str, fingerprint: str, now: float) -> Optional[str]:
+        try:
+            embedding = self._embed(normalized)
+        except Exception:
+            return None
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, answer, embedding, created_at FROM answers "
+                "WHERE fingerprint = ? AND embedding IS NOT NULL",
+                (fingerprint,)
+            ).fetchall()
+
+            best_key, best_answer, best_score = None, None, self.similarity_threshold
+            for key, answer, blob, created_at in rows:
+                if self._is_expired(created_at, now):
+                    continue
+                score = _cosine(embedding, array('f', blob))
+                if score >= best_score:
+                    best_key, best_answer, best_score = key, answer, score
+
+            if best_key is None:
+                return None
+
+            self._touch(best_key, now)
+            self.hits += 1
+            self.semantic_hits += 1
+            return best_answer
+
+    def _touch(self, key: str, now: float):
+        self._conn.execute(
+            "UPDATE answers SET last_access = ? WHERE key = ?", (now, key))
+        self._conn.commit()
+
+    def put(self, question: str, documents: List[Any], answer: str):
+        normalized = normalize_question(question)
+        fingerprint = document_fingerprint(documents)
+        key = self._key(normalized, fingerprint)
+        now = time.time()
+
+        blob = None
+        if self.embed_fn:
+            try:
+                blob = self._embed(normalized).tobytes()
+            except Exception:
+                blob = None
+
+        with self._lock:
+            self._pending_embeddings.pop(normalized, None)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers "
+                "(key, fingerprint, answer, embedding, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, fingerprint, answer, blob, now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        if self.ttl_seconds is not None:
+            cursor = self._conn.execute(
+                "DELETE FROM answers WHERE created_at < ?", (now - self.ttl_seconds,))
+            self.evictions += cursor.rowcount
+
+        count = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            cursor = self._conn.execute(
+                "DELETE FROM answers WHERE key IN "
+                "(SELECT key FROM answers ORDER BY last_access LIMIT ?)",
+                (overflow,)
+            )
+            self.evictions += cursor.rowcount
+
+    def invalidate(self):
+        """Drop every cached answer."""
+        with self._lock:
+            self._conn.execute("DELETE FROM answers")
+            self._conn.commit()
+            self._pending_embeddings.clear()
+
+    def sync_source_version(self, version: Optional[str]):
+        """
+        Invalidate the cache if the source's document set changed since the last call.
+
+        Sources that cannot report a version (None) rely on the document
+        fingerprint in each key instead.
+        """
+        if version is None:
+            return
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM meta WHERE name = 'source_version'").fetchone()
+            if row and row[0] == version:
+                return
+
+            if row:
+                self._conn.execute("DELETE FROM answers")
+                self._pending_embeddings.clear()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES ('source_version', ?)",
+                (version,)
+            )
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
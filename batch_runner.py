@@ -0,0 +1,158 @@
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Iterator, Set, Tuple, Optional, Callable
+from rag_chat import RAGChat
+from instrumentation import TurnTrace
+from cli_interface import Config
+
+
+class BatchRunner:
+    """
+    Answers every question in a JSONL file with bounded concurrency.
+
+    Each input line is a JSON object with a question field and an optional
+    "id" or "request_id". Results are appended to the output JSONL as soon as
+    each question finishes, so a crashed run can be resumed: questions whose
+    id already has a successful result in the output are skipped, and failed
+    ones are retried. A line that is not JSON or has no question gets an
+    error record of its own instead of stopping the run.
+    """
+
+    def __init__(self, rag: RAGChat,
+                 concurrency: int = Config.BATCH_CONCURRENCY,
+                 num_results: int = Config.DEFAULT_NUM_RESULTS,
+                 question_field: str = "question",
+                 on_result: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.rag = rag
+        self.concurrency = concurrency
+        self.num_results = num_results
+        self.question_field = question_field
+        self.on_result = on_result
+
+        self.stats = {
+            "skipped": 0,
+            "answered": 0,
+            "failed": 0,
+            "invalid": 0,
+        }
+
+    @staticmethod
+    def load_completed(output_path: Path) -> Set[str]:
+        """IDs that already have a successful answer in the output file."""
+        completed = set()
+        if not output_path.exists():
+            return completed
+
+        with open(output_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A partial last line from a crashed run
+                    continue
+                if not record.get("error"):
+                    completed.add(str(record["id"]))
+        return completed
+
+    def iter_questions(self, input_path: Path,
+                       completed: Set[str]) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+        """(id, question, error) for each question still to answer; error is set for unusable lines."""
+        with open(input_path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield str(line_number), None, f"Invalid JSON on line {line_number}: {e}"
+                    continue
+                if not isinstance(record, dict):
+                    record = {}
+                question_id = str(record.get("id", record.get("request_id", line_number)))
+                if question_id in completed:
+                    self.stats["skipped"] += 1
+                    continue
+                if self.question_field not in record:
+                    yield question_id, None, f"No {self.question_field!r} field on line {line_number}"
+                    continue
+                yield question_id, record[self.question_field], None
+
+    @staticmethod
+    def _ends_with_newline(path: Path) -> bool:
+        with open(path, "rb") as f:
+            f.seek(-1, 2)
+            return f.read(1) == b"\n"
+
+    async def _answer(self, question_id: str, question: str) -> Dict[str, Any]:
+        trace = TurnTrace(question)
+        try:
+            answer = await self.rag.achat(question, self.num_results, trace=trace)
+        except Exception as e:
+            answer = None
+            trace.error = str(e)
+            trace.finish()
+
+        result = trace.to_dict()
+        return {
+            "id": question_id,
+            "question": question,
+            "answer": None if trace.error else answer,
+            "error": trace.error,
+            "cached": result["cached"],
+            "timings": result["stages"],
+            "prompt_tokens": result["prompt_tokens"],
+            "completion_tokens": result["completion_tokens"],
+            "context_chars": result["context_chars"],
+        }
+
+    async def run(self, input_path: str, output_path: str) -> Dict[str, Any]:
+        input_file = Path(input_path)
+        output_file = Path(output_path)
+        completed = self.load_completed(output_file)
+
+        loop = asyncio.get_running_loop()
+        # Thread-offloaded retrieval must not be capped below our concurrency
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=self.concurrency))
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        start = time.perf_counter()
+
+        with open(output_file, "a", encoding="utf-8") as out:
+            if out.tell() and not self._ends_with_newline(output_file):
+                # Finish the partial last line of a crashed run, or the first new record joins it
+                out.write("\n")
+
+            def write(result: Dict[str, Any], counter: str):
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+                self.stats[counter] += 1
+                if self.on_result:
+                    self.on_result(result)
+
+            async def worker():
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        return
+                    result = await self._answer(*item)
+                    write(result, "failed" if result["error"] else "answered")
+
+            workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+            for question_id, question, error in self.iter_questions(input_file, completed):
+                if error:
+                    write({"id": question_id, "question": question, "answer": None, "error": error},
+                          "invalid")
+                    continue
+                await queue.put((question_id, question))
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+
+        elapsed = time.perf_counter() - start
+        processed = self.stats["answered"] + self.stats["failed"]
+        self.stats["seconds"] = elapsed
+        self.stats["questions_per_second"] = processed / elapsed if elapsed else 0.0
+        return self.stats
@@ -0,0 +1,83 @@
+"""
+Load benchmark for RAGChat.achat against mock retrieval and LLM backends.
+
+Runs a fixed number of questions at increasing concurrency from a single event
+loop and reports throughput plus p50/p99 latency for each level.
+
+Usage:
+    uv run python -m benchmarks.bench_async_load
+    uv run python -m benchmarks.bench_async_load --concurrency 1 50 500 --native-async
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.mocks import MockRAGSource, ensure_fake_credentials, make_acompletion
+from instrumentation import percentile
+
+
+class _SilentCLI:
+    """achat never touches the CLI, but RAGChat still wants one."""
+
+
+async def _run_level(rag, concurrency: int, num_questions: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def ask(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            await rag.achat(f"Question number {i}?")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(ask(i) for i in range(num_questions)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "questions": num_questions,
+        "throughput": num_questions / elapsed,
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, nargs="+",
+                        default=[1, 10, 50, 100, 200, 500])
+    parser.add_argument("--questions-per-level", type=int, default=1000,
+                        help="Upper bound on questions per level (at least 10x concurrency are used)")
+    parser.add_argument("--retrieval-latency", type=float, default=0.05)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--native-async", action="store_true",
+                        help="Give the mock source a native aretrieve_documents instead of the thread-offload default")
+    args = parser.parse_args()
+
+    ensure_fake_credentials()
+
+    import llm_router
+    import rag_chat
+    llm_router.acompletion = make_acompletion(latency=args.llm_latency)
+
+    source = MockRAGSource(latency=args.retrieval_latency,
+                           native_async=args.native_async)
+    rag = rag_chat.RAGChat(_SilentCLI(), rag_source=source)
+
+    mode = "native async" if args.native_async else "thread offload"
+    print(f"Retrieval: {args.retrieval_latency * 1000:.0f} ms ({mode}), "
+          f"LLM: {args.llm_latency * 1000:.0f} ms")
+    print(f"{'concurrency':>12} {'questions':>10} {'q/s':>10} {'p50 ms':>10} {'p99 ms':>10}")
+
+    for concurrency in args.concurrency:
+        num_questions = min(args.questions_per_level, concurrency * 10)
+        num_questions = max(num_questions, concurrency)
+        result = asyncio.run(_run_level(rag, concurrency, num_questions))
+        print(f"{result['concurrency']:>12} {result['questions']:>10} "
+              f"{result['throughput']:>10.1f} {result['p50'] * 1000:>10.1f} "
+              f"{result['p99'] * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
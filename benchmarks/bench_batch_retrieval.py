@@ -0,0 +1,106 @@
+"""
+Batch retrieval benchmark: retrieve_documents in a loop against retrieve_documents_batch.
+
+Three sources:
+
+    network  a mock source with a fixed round-trip latency, through the
+             thread-pool default of RAGSourceBase
+    vectorize  VectorizeWrapper against benchmarks.fake_vectorize, with
+             as many workers as pooled connections
+    local    LocalIndexWrapper over random vectors (query embedding stubbed
+             out), scoring the whole batch in matrix multiplies
+
+The serial loop is timed on --serial-sample questions and reported as
+throughput, so slow sources do not take minutes.
+
+Usage:
+    uv run python -m benchmarks.bench_batch_retrieval
+    uv run python -m benchmarks.bench_batch_retrieval --questions 1000 --workers 8 32 64 --size 200000
+"""
+import argparse
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+
+from benchmarks.bench_local_index import build_index
+from benchmarks.bench_vectorize import ensure_fake_vectorize_credentials
+from benchmarks.fake_vectorize import FakeVectorizeServer
+from benchmarks.mocks import MockRAGSource
+from rag_source_base import RAGSourceBase, RAGSourceError
+
+
+def serial(source: RAGSourceBase, questions: List[str], num_results: int) -> float:
+    """Questions per second, one retrieve_documents call after another."""
+    start = time.perf_counter()
+    for question in questions:
+        source.retrieve_documents(question, num_results)
+    return len(questions) / (time.perf_counter() - start)
+
+
+def batched(source: RAGSourceBase, questions: List[str], num_results: int, **kwargs) -> tuple:
+    """Questions per second and failed questions, in one retrieve_documents_batch call."""
+    start = time.perf_counter()
+    results = source.retrieve_documents_batch(questions, num_results, **kwargs)
+    elapsed = time.perf_counter() - start
+    return len(questions) / elapsed, sum(1 for result in results if isinstance(result, RAGSourceError))
+
+
+def report(label: str, questions_per_second: float, baseline: float, failed: int = 0):
+    print(f"{label:<36} {questions_per_second:>10.0f} {questions_per_second / baseline:>8.1f}x {failed:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--questions", type=int, default=1000)
+    parser.add_argument("--serial-sample", type=int, default=100)
+    parser.add_argument("--num-results", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.02, help="Network round trip, in seconds")
+    parser.add_argument("--workers", type=int, nargs="+", default=[8, 32, 64])
+    parser.add_argument("--size", type=int, default=100_000, help="Vectors in the local index")
+    parser.add_argument("--dim", type=int, default=384)
+    args = parser.parse_args()
+
+    questions = [f"Question {i}?" for i in range(args.questions)]
+    sample = questions[:args.serial_sample]
+    print(f"{args.questions} questions, {args.latency * 1000:.0f} ms round trip, "
+          f"local index of {args.size} x {args.dim}")
+    print(f"{'source':<36} {'q/s':>10} {'speedup':>9} {'failed':>7}")
+
+    source = MockRAGSource(latency=args.latency)
+    baseline = serial(source, sample, args.num_results)
+    report("network, serial", baseline, baseline)
+    for workers in args.workers:
+        rate, failed = batched(source, questions, args.num_results, max_workers=workers)
+        report(f"network, batch of {workers} workers", rate, baseline, failed)
+
+    ensure_fake_vectorize_credentials()
+    server = FakeVectorizeServer(latency=args.latency).start()
+    try:
+        from vectorize_wrapper import VectorizeWrapper
+        for pool_size in args.workers:
+            vectorize = VectorizeWrapper(host=server.url, pool_size=pool_size)
+            if pool_size == args.workers[0]:
+                baseline = serial(vectorize, sample, args.num_results)
+                report("vectorize, serial", baseline, baseline)
+            rate, failed = batched(vectorize, questions, args.num_results)
+            report(f"vectorize, batch, pool of {pool_size}", rate, baseline, failed)
+    finally:
+        server.stop()
+
+    from local_index_wrapper import LocalIndexWrapper
+    rng = np.random.default_rng(1)
+    vectors = dict(zip(questions, rng.standard_normal((args.questions, args.dim), dtype=np.float32)))
+    with tempfile.TemporaryDirectory() as tmp:
+        build_index(tmp, args.size, args.dim)
+        local = LocalIndexWrapper(tmp, embed_fn=vectors.__getitem__, nprobe=0)
+        local.retrieve_documents(questions[0], args.num_results)
+        baseline = serial(local, sample, args.num_results)
+        report("local, serial", baseline, baseline)
+        rate, failed = batched(local, questions, args.num_results)
+        report("local, batch (matrix multiply)", rate, baseline, failed)
+
+
+if __name__ == "__main__":
+    main()
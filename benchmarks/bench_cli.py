@@ -0,0 +1,181 @@
+"""
+CLI rendering benchmark: the render thread against a spinner thread per stage.
+
+Plays the CLI side of simulated turns (retrieving spinner, document
+previews, generating spinner, a streamed answer, the latency line) into a
+stream that models a line-buffered terminal, once with CLIInterface as it
+is and once as it was: prints on the calling thread, a flush per token
+and a LoadingAnimation thread per spinner whose stop() joins it.
+
+Reports per turn:
+
+    stall ms    time the answering thread spends inside CLI calls
+    syscalls    terminal writes: flushes, and lines in line-buffered output
+    threads     threads started
+
+Usage:
+    uv run python -m benchmarks.bench_cli
+    uv run python -m benchmarks.bench_cli --turns 20 --tokens 600 --token-delay 0.002
+"""
+import argparse
+import contextlib
+import io
+import sys
+import threading
+import time
+
+from benchmarks.mocks import make_documents, filler
+from cli_interface import CLIInterface, Colors, TerminalRenderer
+
+
+class TerminalStream(io.TextIOBase):
+    """Discards text, counting the writes a line-buffered terminal would make."""
+
+    def __init__(self):
+        self.syscalls = 0
+        self._dirty = False
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        if "\n" in text:
+            self.syscalls += 1
+            self._dirty = False
+        elif text:
+            self._dirty = True
+        return len(text)
+
+    def flush(self):
+        if self._dirty:
+            self.syscalls += 1
+            self._dirty = False
+
+
+class LoadingAnimation:
+    """The spinner as it was: its own thread, drawing every 100 ms until stop() joins it."""
+
+    started = 0
+
+    def __init__(self, message: str, color: str = Colors.CYAN):
+        self.message = message
+        self.color = color
+        self.is_running = False
+        self.thread = None
+        self.current_frame = 0
+
+    def _animate(self):
+        while self.is_running:
+            frame = TerminalRenderer.FRAMES[self.current_frame]
+            sys.stdout.write(f'\r{self.color}{frame} {self.message}{Colors.RESET}')
+            sys.stdout.flush()
+            self.current_frame = (self.current_frame + 1) % len(TerminalRenderer.FRAMES)
+            time.sleep(0.1)
+
+    def start(self):
+        LoadingAnimation.started += 1
+        self.is_running = True
+        self.thread = threading.Thread(target=self._animate, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.is_running = False
+        if self.thread:
+            self.thread.join()
+        sys.stdout.write('\r' + ' ' * (len(self.message) + 4) + '\r')
+        sys.stdout.flush()
+
+
+class DirectRenderer:
+    """Writes on the caller's thread, flushing every token, as CLIInterface used to."""
+
+    def __init__(self):
+        self.spinner = None
+
+    def write(self, text: str, stream=None):
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+    def start_spinner(self, message: str, color: str = Colors.CYAN, stream=None):
+        self.spinner = LoadingAnimation(message, color)
+        self.spinner.start()
+
+    def stop_spinner(self):
+        if self.spinner:
+            self.spinner.stop()
+            self.spinner = None
+
+    def flush(self, timeout=None) -> bool:
+        return True
+
+
+class LegacyCLIInterface(CLIInterface):
+    def __init__(self):
+        super().__init__(renderer=DirectRenderer())
+
+    def _print(self, *values, sep: str = ' ', end: str = '\n'):
+        print(*values, sep=sep, end=end)
+
+
+def play_turn(cli: CLIInterface, args: argparse.Namespace, turn: int) -> float:
+    """One turn's CLI calls, with the backends' latency in between. Returns seconds spent in the CLI."""
+    stalled = finished = 0.0
+
+    def timed(call, *call_args):
+        nonlocal stalled
+        start = time.perf_counter()
+        result = call(*call_args)
+        stalled += time.perf_counter() - start
+        return result
+
+    def tokens():
+        # Only the time between handing out a token and being asked for the next counts
+        nonlocal stalled, finished
+        for word in filler(f"answer {turn}", 0, args.tokens * 6).split(" ")[:args.tokens]:
+            time.sleep(args.token_delay)
+            handed_out = time.perf_counter()
+            yield word + " "
+            stalled += time.perf_counter() - handed_out
+        finished = time.perf_counter()
+
+    question = f"Question {turn}?"
+    timed(cli.print_retrieving, question)
+    time.sleep(args.retrieval_latency)
+    timed(cli.stop_loading)
+    timed(cli.print_documents_with_snippets, make_documents(question, 5))
+    timed(cli.print_generating)
+    time.sleep(args.llm_latency)
+
+    cli.print_answer_stream(tokens())
+    stalled += time.perf_counter() - finished
+    timed(cli.print_latency, 0.25, 1.5)
+    return stalled
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--tokens", type=int, default=300, help="Streamed tokens per answer")
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    parser.add_argument("--retrieval-latency", type=float, default=0.15)
+    parser.add_argument("--llm-latency", type=float, default=0.25)
+    args = parser.parse_args()
+
+    print(f"{args.turns} turns, {args.tokens} tokens each, {args.token_delay * 1000:.0f} ms apart")
+    print(f"{'interface':<28} {'stall ms':>10} {'syscalls':>10} {'threads':>8}   (per turn)")
+    for label, make_cli in (("thread per spinner (before)", LegacyCLIInterface),
+                            ("render thread", lambda: CLIInterface(renderer=TerminalRenderer()))):
+        terminal = TerminalStream()
+        threads_before = threading.active_count() + LoadingAnimation.started
+        with contextlib.redirect_stdout(terminal):
+            cli = make_cli()
+            stalls = [play_turn(cli, args, turn) for turn in range(args.turns)]
+            cli.flush()
+        threads = threading.active_count() + LoadingAnimation.started - threads_before
+
+        print(f"{label:<28} {sum(stalls) / len(stalls) * 1000:>10.1f} "
+              f"{terminal.syscalls / args.turns:>10.0f} {threads / args.turns:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
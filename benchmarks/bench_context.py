@@ -0,0 +1,115 @@
+"""
+Context assembly benchmark: the original unbounded format_context against
+the token-budgeted ContextBuilder.
+
+For each num_results, retrieves mock documents (with some near-duplicate
+chunks, as overlapping chunkers produce) and reports prompt tokens, context
+build time and end-to-end chat latency. The mock LLM's latency grows with
+prompt size, like a real model's prefill.
+
+Usage:
+    uv run python -m benchmarks.bench_context
+    uv run python -m benchmarks.bench_context --num-results 5 50 --max-tokens 2000
+"""
+import argparse
+import time
+from typing import List, Any
+
+from benchmarks.mocks import MockRAGSource, ensure_fake_credentials, make_completion, make_documents
+from cli_interface import QuietInterface
+from context_builder import ContextBuilder, TokenCounter
+from instrumentation import percentile
+
+
+def legacy_format_context(documents: List[Any]) -> str:
+    """RAGChat.format_context as it was before the ContextBuilder."""
+    if not documents:
+        return "No relevant documents found."
+
+    context = "Here are the relevant documents:\n\n"
+    for i, doc in enumerate(documents, 1):
+        context += f"Document {i}:\n"
+        context += f"Content: {doc['text']}\n"
+        context += f"Source: {doc['source_display_name']}\n"
+        context += f"Relevance Score: {doc['relevancy']}\n"
+        context += "\n"
+    return context
+
+
+class OverlappingSource(MockRAGSource):
+    """Every fourth document repeats the one before it with a small edit."""
+
+    def retrieve_documents(self, question: str, num_results: int = 5):
+        time.sleep(self.latency)
+        documents = make_documents(question, num_results, self.doc_chars)
+        for i in range(3, num_results, 4):
+            previous = documents[i - 1]
+            documents[i] = dict(documents[i], text=previous['text'].replace("Document", "Doc", 1))
+        return documents
+
+
+def _measure(rag, format_fn, counter: TokenCounter, num_results: int, runs: int) -> dict:
+    rag.format_context = format_fn
+    build_times, latencies, tokens = [], [], []
+    for i in range(runs):
+        question = f"Question number {i}?"
+        documents = rag.rag_source.retrieve_documents(question, num_results)
+
+        start = time.perf_counter()
+        context = format_fn(documents)
+        build_times.append(time.perf_counter() - start)
+        messages = rag.build_messages(question, context)
+        tokens.append(sum(counter.count(message["content"]) for message in messages))
+
+        start = time.perf_counter()
+        rag.chat(question, num_results)
+        latencies.append(time.perf_counter() - start)
+
+    return {
+        "tokens": percentile(tokens, 50),
+        "build_ms": percentile(build_times, 50) * 1000,
+        "p50": percentile(latencies, 50) * 1000,
+        "p99": percentile(latencies, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--num-results", type=int, nargs="+", default=[5, 50])
+    parser.add_argument("--doc-chars", type=int, default=1500)
+    parser.add_argument("--max-tokens", type=int, default=None,
+                        help="Context token budget (default: Config.CONTEXT_MAX_TOKENS)")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--prefill-per-1k-chars", type=float, default=0.01,
+                        help="Extra mock LLM latency per 1000 prompt characters")
+    args = parser.parse_args()
+
+    ensure_fake_credentials()
+
+    import llm_router
+    import rag_chat
+    llm_router.completion = make_completion(latency=args.llm_latency,
+                                            prefill_per_1k_chars=args.prefill_per_1k_chars)
+
+    builder = ContextBuilder(**({"max_tokens": args.max_tokens} if args.max_tokens else {}))
+    rag = rag_chat.RAGChat(QuietInterface(),
+                           rag_source=OverlappingSource(latency=0.01, doc_chars=args.doc_chars),
+                           context_builder=builder)
+    counter = builder.counter
+
+    print(f"Budget: {builder.max_tokens} tokens "
+          f"({'tiktoken' if counter.exact else 'estimated, tiktoken unavailable'}), "
+          f"documents of {args.doc_chars} chars")
+    print(f"{'num_results':>12} {'builder':>10} {'prompt tok':>11} {'build ms':>9} "
+          f"{'p50 ms':>9} {'p99 ms':>9}")
+
+    for num_results in args.num_results:
+        for name, format_fn in (("legacy", legacy_format_context), ("budgeted", builder.build)):
+            result = _measure(rag, format_fn, counter, num_results, args.runs)
+            print(f"{num_results:>12} {name:>10} {result['tokens']:>11.0f} "
+                  f"{result['build_ms']:>9.2f} {result['p50']:>9.1f} {result['p99']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
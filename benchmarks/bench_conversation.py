@@ -0,0 +1,103 @@
+"""
+Conversation benchmark: prompt size per turn over a long chat session.
+
+Plays a scripted multi-turn conversation through RAGChat with a mock LLM,
+once carrying the full history and once with Conversation's token-bounded
+window plus background summary. Reports the prompt tokens of the answer
+request at a few turn numbers: the full history grows with every turn,
+the bounded one levels off.
+
+Usage:
+    uv run python -m benchmarks.bench_conversation
+    uv run python -m benchmarks.bench_conversation --turns 50 --answer-words 150
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import llm_router
+from benchmarks.mocks import MockRAGSource, ensure_fake_credentials, filler
+from cli_interface import QuietInterface, Config
+from context_builder import TokenCounter
+from conversation import ConversationStore, Conversation
+
+
+class ScriptedLLM:
+    """Answers, rewrites and summaries from a mock model, recording the prompt size of each answer request."""
+
+    def __init__(self, answer_words: int, latency: float):
+        self.answer_words = answer_words
+        self.latency = latency
+        self.counter = TokenCounter()
+        self.answer_prompt_tokens = []
+        self.summaries = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, model: str, messages, **kwargs):
+        time.sleep(self.latency)
+        prompt = messages[-1]["content"]
+        if prompt.startswith("Rewrite the follow-up"):
+            content = prompt.rsplit("Follow-up question: ", 1)[1] + " (standalone)"
+        elif prompt.startswith("Update the summary"):
+            with self._lock:
+                self.summaries += 1
+            content = filler("summary", self.summaries, 600)
+        else:
+            tokens = sum(self.counter.count(message["content"]) for message in messages)
+            with self._lock:
+                self.answer_prompt_tokens.append(tokens)
+            content = filler(prompt, len(self.answer_prompt_tokens), self.answer_words * 6)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+                               usage=None)
+
+
+class FullHistory(Conversation):
+    """Keeps every turn verbatim: the prompt grows with the conversation."""
+
+    def add_turn(self, question: str, answer: str):
+        with self._lock:
+            self._turns.append((question, answer, 0))
+
+
+def play(label: str, rag, conversation: Conversation, llm: ScriptedLLM, turns: int, report_at):
+    llm.answer_prompt_tokens = []
+    for turn in range(turns):
+        rag.chat(f"What about point {turn}?", conversation=conversation)
+        # Give the background summarizer a moment, as a user's reading time would
+        conversation.wait_for_summary(timeout=1.0)
+
+    sizes = [llm.answer_prompt_tokens[n - 1] for n in report_at]
+    print(f"{label:<22} " + " ".join(f"{size:>8}" for size in sizes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--answer-words", type=int, default=120)
+    parser.add_argument("--latency", type=float, default=0.0, help="Mock LLM latency")
+    args = parser.parse_args()
+    ensure_fake_credentials()
+
+    llm = ScriptedLLM(args.answer_words, args.latency)
+    llm_router.completion = llm
+
+    import rag_chat
+    rag = rag_chat.RAGChat(QuietInterface(), rag_source=MockRAGSource(latency=0.0))
+    store = ConversationStore(rag.router)
+
+    report_at = sorted({1, 5, 10, 20, args.turns} & set(range(1, args.turns + 1)))
+    print(f"Prompt tokens of the answer request, history budget "
+          f"{Config.CONVERSATION_MAX_HISTORY_TOKENS} + summary {Config.CONVERSATION_SUMMARY_MAX_TOKENS}")
+    print(f"{'turn':<22} " + " ".join(f"{n:>8}" for n in report_at))
+
+    play("full history", rag, FullHistory("full", rag.router, ThreadPoolExecutor(1)), llm,
+         args.turns, report_at)
+    bounded = store.get("bounded")
+    play("window + summary", rag, bounded, llm, args.turns, report_at)
+    print(f"Summaries written: {llm.summaries}, turns kept verbatim: {len(bounded.turns)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Document representation benchmark: dicts with copied text against RetrievedDocument.
+
+Builds a throwaway local index of text chunks and compares, for top-k
+retrieval followed by context assembly:
+
+    open      heap used by an opened index: records holding their text
+              (the format before the chunk store) or text left in the
+              memory-mapped chunk store
+    question  peak traced memory and time per question
+    retained  memory held by --sessions retrieval results kept alive at
+              once, as in a retrieval cache or many concurrent sessions
+
+It also compares the retained memory of Vectorize responses kept as the
+API's pydantic models against the same documents as RetrievedDocument.
+
+Query embedding is stubbed out, so nothing here touches the network.
+
+Usage:
+    uv run python -m benchmarks.bench_documents
+    uv run python -m benchmarks.bench_documents --chunks 50000 --top-k 100 --sessions 1000
+"""
+import argparse
+import json
+import shutil
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.mocks import filler, make_documents
+from context_builder import ContextBuilder
+from local_index import LocalVectorIndex
+from local_index_wrapper import LocalIndexWrapper
+from rag_source_base import RetrievedDocument
+
+
+class DictDocumentsWrapper(LocalIndexWrapper):
+    """LocalIndexWrapper as it was: a dict per document, with its text copied into a str."""
+
+    def _to_document(self, row: int, score: float):
+        record = self.index.get_record(row, with_text=False)
+        return {
+            'id': record.get('id', str(row)),
+            'text': self.index.get_text(row),
+            'source_display_name': record.get('source_display_name', ''),
+            'relevancy': score,
+            'metadata': record.get('metadata', {})
+        }
+
+
+def build(path: Path, chunks: int, chunk_chars: int, dim: int):
+    rng = np.random.default_rng(0)
+    index = LocalVectorIndex.create(str(path), dim, capacity=chunks)
+    for start in range(0, chunks, 10_000):
+        count = min(10_000, chunks - start)
+        records = [{'id': f"chunk-{start + i}", 'text': filler("chunk", start + i, chunk_chars),
+                    'source_display_name': f"file_{(start + i) // 10}.txt"} for i in range(count)]
+        index.add(rng.standard_normal((count, dim), dtype=np.float32), records)
+
+
+def to_legacy_format(path: Path, legacy: Path):
+    """Copy the index with every text moved back into its metadata record."""
+    shutil.copytree(path, legacy)
+    index = LocalVectorIndex(str(path))
+    data = "".join(
+        json.dumps({key: value for key, value in index.get_record(row).items() if key != 'text_span'}) + "\n"
+        for row in range(len(index))).encode("utf-8")
+    (legacy / LocalVectorIndex.METADATA).write_bytes(data)
+    (legacy / LocalVectorIndex.CHUNKS).unlink()
+    manifest = json.loads((legacy / LocalVectorIndex.MANIFEST).read_text())
+    manifest.update(metadata_size=len(data), chunks_size=0)
+    (legacy / LocalVectorIndex.MANIFEST).write_text(json.dumps(manifest))
+
+
+def traced(fn):
+    """Run fn under tracemalloc. Returns its result, the memory it still holds and its peak, in bytes."""
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    result = fn()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current - before, peak - before
+
+
+def vectorize_models(question: str, top_k: int, chunk_chars: int) -> list:
+    """Documents as vectorize_client parses them from a retrieval response."""
+    from vectorize_client import Document
+    return [Document(relevancy=doc['relevancy'], id=doc['id'], text=doc['text'], chunk_id="0",
+                     total_chunks="1", origin="fake", origin_id=doc['id'], similarity=doc['relevancy'],
+                     source=doc['source_display_name'], unique_source=doc['source_display_name'],
+                     source_display_name=doc['source_display_name'])
+            for doc in make_documents(question, top_k, chunk_chars)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunks", type=int, default=20_000)
+    parser.add_argument("--chunk-chars", type=int, default=1500)
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--top-k", type=int, default=50)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--sessions", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    queries = {f"q{i}": vector for i, vector in
+               enumerate(rng.standard_normal((args.questions, args.dim), dtype=np.float32))}
+    questions = list(queries)
+    builder = ContextBuilder()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path, legacy = Path(tmp) / "index", Path(tmp) / "legacy"
+        build(path, args.chunks, args.chunk_chars, args.dim)
+        to_legacy_format(path, legacy)
+
+        print(f"{args.chunks} chunks of {args.chunk_chars} chars, top-k {args.top_k}")
+        print(f"{'representation':<28} {'open MB':>8} {'peak KB/q':>10} {'ms/q':>8} {'retained MB':>12}")
+        for label, wrapper_class, index_path in (
+                ("dicts, text in records", DictDocumentsWrapper, legacy),
+                ("RetrievedDocument, mmap", LocalIndexWrapper, path)):
+            source, opened, _ = traced(lambda: wrapper_class(
+                str(index_path), embed_fn=queries.__getitem__, nprobe=0))
+
+            def answer(question: str):
+                documents = source.retrieve_documents(question, args.top_k)
+                builder.build(documents)
+                return documents
+
+            peaks, start = [], time.perf_counter()
+            for question in questions:
+                _, _, peak = traced(lambda: answer(question))
+                peaks.append(peak)
+            elapsed = time.perf_counter() - start
+
+            sessions = [questions[i % len(questions)] for i in range(args.sessions)]
+            _, retained, _ = traced(lambda: [answer(question) for question in sessions])
+
+            print(f"{label:<28} {opened / 1e6:>8.1f} {sum(peaks) / len(peaks) / 1024:>10.1f} "
+                  f"{elapsed / len(questions) * 1000:>8.2f} {retained / 1e6:>12.1f}")
+
+    # Every held result comes from its own parsed response, as it would over the network
+    print(f"\nVectorize, {args.sessions} results held")
+    for label, convert in (("API models", list),
+                           ("RetrievedDocument", lambda docs: [RetrievedDocument.from_any(d) for d in docs])):
+        _, retained, _ = traced(lambda: [
+            convert(vectorize_models(questions[i % len(questions)], args.top_k, args.chunk_chars))
+            for i in range(args.sessions)])
+        print(f"{label:<28} {retained / 1e6:>8.1f} MB")
+
+if __name__ == "__main__":
+    main()
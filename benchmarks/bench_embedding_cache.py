@@ -0,0 +1,201 @@
+"""
+Embedding cache benchmark: query and ingestion latency with and without the cache, storage and concurrency.
+
+The embedding API is replaced by a mock with a round trip of --latency
+seconds plus --per-text-latency per text, returning a deterministic
+vector per text. Everything runs in a temporary directory.
+
+    queries     LocalIndexWrapper.retrieve_documents on questions asked
+                --repeats times each, in varying case and punctuation:
+                the first ask and the repeats, without and with the cache
+    ingestion   ingesting a corpus, then ingesting it again into a fresh
+                index, as a rebuild or a second index over the same files
+    storage     bytes per vector and recall@10 of searches over vectors
+                read back from float32 and int8 cache files
+    readers     --readers processes looking up keys while two others
+                append the same vectors to the same files, checking every
+                vector read and that no entry was stored twice
+
+Usage:
+    uv run python -m benchmarks.bench_embedding_cache
+    uv run python -m benchmarks.bench_embedding_cache --questions 100 --files 100 --latency 0.2 --readers 8
+"""
+import argparse
+import hashlib
+import multiprocessing
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+import embeddings
+from benchmarks.mocks import filler
+from cli_interface import Config
+from embedding_cache import EmbeddingCache
+from ingest import IngestPipeline
+from local_index_wrapper import LocalIndexWrapper
+
+MODEL = "mock/embedding"
+
+
+def vector_of(text: str, dim: int) -> np.ndarray:
+    """The mock embedding: random, but always the same for the same text."""
+    seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+    return np.random.default_rng(seed).standard_normal(dim, dtype=np.float32)
+
+
+class MockEmbeddings:
+    def __init__(self, dim: int, latency: float, per_text_latency: float):
+        self.dim = dim
+        self.latency = latency
+        self.per_text_latency = per_text_latency
+        self.calls = 0
+        self.texts = 0
+
+    def __call__(self, texts: List[str], model: str = MODEL) -> List[List[float]]:
+        if not texts:
+            return []
+        self.calls += 1
+        self.texts += len(texts)
+        time.sleep(self.latency + self.per_text_latency * len(texts))
+        return [vector_of(text, self.dim).tolist() for text in texts]
+
+
+def use_cache(path: Path, enabled: bool, quantize: bool = False):
+    """Point embeddings' cache at path, or turn it off."""
+    Config.EMBEDDING_CACHE_ENABLED = enabled
+    embeddings._cache = EmbeddingCache(str(path), quantize=quantize) if enabled else None
+
+
+def build_corpus(root: Path, files: int, chunk_chars: int):
+    root.mkdir()
+    for i in range(files):
+        (root / f"doc_{i}.txt").write_text(filler("corpus", i, chunk_chars * 4))
+
+
+def bench_queries(args: argparse.Namespace, tmp: Path, mock: MockEmbeddings):
+    corpus, index = tmp / "query-corpus", tmp / "query-index"
+    build_corpus(corpus, 20, Config.INGEST_CHUNK_SIZE)
+    use_cache(tmp / "query-setup", enabled=False)
+    IngestPipeline(str(index), model=MODEL).run(str(corpus))
+
+    variants = (str, lambda q: q + "?", lambda q: q.upper() + " ?", lambda q: f"  {q.capitalize()}.  ")
+    print(f"\nQueries: {args.questions} questions asked {args.repeats} times each, "
+          f"{args.latency * 1000:.0f} ms embedding round trip")
+    print(f"{'':<14} {'first ask ms':>12} {'repeat ms':>10} {'embed calls':>12}")
+    for label, enabled in (("no cache", False), ("cache", True)):
+        use_cache(tmp / "query-cache", enabled)
+        source = LocalIndexWrapper(str(index), nprobe=0)
+        first, repeats, calls_before = [], [], mock.calls
+        for repeat in range(args.repeats):
+            for q in range(args.questions):
+                question = variants[repeat % len(variants)](f"how does part {q} of the system work")
+                start = time.perf_counter()
+                source.retrieve_documents(question, 5)
+                (repeats if repeat else first).append(time.perf_counter() - start)
+        print(f"{label:<14} {statistics.median(first) * 1000:>12.2f} {statistics.median(repeats) * 1000:>10.2f} "
+              f"{mock.calls - calls_before:>12}")
+
+
+def bench_ingestion(args: argparse.Namespace, tmp: Path, mock: MockEmbeddings):
+    corpus = tmp / "corpus"
+    build_corpus(corpus, args.files, Config.INGEST_CHUNK_SIZE)
+    print(f"\nIngestion: {args.files} files, then again into a fresh index")
+    print(f"{'':<14} {'first s':>8} {'again s':>8} {'texts embedded':>15}")
+    for label, enabled in (("no cache", False), ("cache", True)):
+        use_cache(tmp / "ingest-cache", enabled)
+        texts_before, seconds = mock.texts, []
+        for run in ("first", "again"):
+            stats = IngestPipeline(str(tmp / f"index-{label}-{run}"), model=MODEL).run(str(corpus))
+            seconds.append(stats["seconds"])
+        print(f"{label:<14} {seconds[0]:>8.2f} {seconds[1]:>8.2f} {mock.texts - texts_before:>15}")
+
+
+def bench_storage(args: argparse.Namespace, tmp: Path):
+    texts = [f"chunk {i}" for i in range(args.entries)]
+    exact = np.stack([vector_of(text, args.dim) for text in texts])
+    exact /= np.linalg.norm(exact, axis=1, keepdims=True)
+    queries = exact[:100] + np.random.default_rng(0).standard_normal((100, args.dim), dtype=np.float32) * 0.05
+    truth = np.argsort(-(queries @ exact.T), axis=1)[:, :10]
+
+    print(f"\nStorage: {args.entries} vectors of {args.dim} dimensions")
+    print(f"{'':<14} {'bytes/vector':>12} {'recall@10':>10}")
+    for quantize in (False, True):
+        cache = EmbeddingCache(str(tmp / "storage"), quantize=quantize)
+        cache.put(MODEL, texts, exact)
+        stored = np.stack(EmbeddingCache(str(tmp / "storage"), quantize=quantize).get(MODEL, texts))
+        found = np.argsort(-(queries @ stored.T), axis=1)[:, :10]
+        recall = np.mean([len(set(a) & set(b)) / 10 for a, b in zip(found, truth)])
+        size = sum(f.stat().st_size for f in (tmp / "storage").glob(f"*.{cache.storage}.*"))
+        print(f"{cache.storage:<14} {size / len(texts):>12.0f} {recall:>10.3f}")
+
+
+def read(path: str, dim: int, entries: int, seconds: float) -> tuple:
+    """One reader process: look up random keys until time is up. Returns (lookups, found, wrong)."""
+    cache = EmbeddingCache(path)
+    rng = np.random.default_rng()
+    lookups = found = wrong = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        texts = [f"entry {i}" for i in rng.integers(0, entries, 16)]
+        for text, vector in zip(texts, cache.get(MODEL, texts)):
+            lookups += 1
+            if vector is not None:
+                found += 1
+                wrong += not np.array_equal(vector, vector_of(text, dim))
+    return lookups, found, wrong
+
+
+def write(path: str, dim: int, entries: int):
+    cache = EmbeddingCache(path)
+    for start in range(0, entries, 64):
+        texts = [f"entry {i}" for i in range(start, min(start + 64, entries))]
+        cache.put(MODEL, texts, np.stack([vector_of(text, dim) for text in texts]))
+
+
+def bench_readers(args: argparse.Namespace, tmp: Path):
+    path, entries = str(tmp / "shared"), args.entries
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(args.readers + 2) as pool:
+        writers = [pool.apply_async(write, (path, args.dim, entries)) for _ in range(2)]
+        readers = [pool.apply_async(read, (path, args.dim, entries, args.read_seconds))
+                   for _ in range(args.readers)]
+        results = [reader.get() for reader in readers]
+        for writer in writers:
+            writer.get()
+
+    lookups, found, wrong = (sum(column) for column in zip(*results))
+    cache = EmbeddingCache(path)
+    cache.get(MODEL, ["entry 0"])
+    print(f"\nReaders: {args.readers} processes for {args.read_seconds:.0f} s while two append {entries} vectors")
+    print(f"{lookups / args.read_seconds:,.0f} lookups/s, {found / lookups:.0%} found, {wrong} wrong vectors, "
+          f"{cache.stats()['entries']} entries stored")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=4, help="Times each question is asked")
+    parser.add_argument("--files", type=int, default=50, help="Files in the ingested corpus")
+    parser.add_argument("--entries", type=int, default=20_000, help="Vectors in the storage and readers tests")
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--latency", type=float, default=0.1, help="Embedding round trip, in seconds")
+    parser.add_argument("--per-text-latency", type=float, default=0.0005)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--read-seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    mock = MockEmbeddings(args.dim, args.latency, args.per_text_latency)
+    embeddings.embed_texts = mock
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_queries(args, Path(tmp), mock)
+        bench_ingestion(args, Path(tmp), mock)
+        bench_storage(args, Path(tmp))
+        bench_readers(args, Path(tmp))
+
+
+if __name__ == "__main__":
+    main()
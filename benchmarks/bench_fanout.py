@@ -0,0 +1,86 @@
+"""
+Fan-out benchmark: tail latency with and without per-source deadlines.
+
+Three mock sources answer in tens of milliseconds, but each occasionally
+stalls for much longer, as a real backend does under GC pauses or
+retries. Without deadlines every stall lands in the fan-out's latency;
+with them, latency is capped and the stalled source is simply left out.
+
+Usage:
+    uv run python -m benchmarks.bench_fanout
+    uv run python -m benchmarks.bench_fanout --deadline 0.2 --stall-probability 0.05
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.mocks import MockRAGSource, make_documents
+from fanout_rag_source import FanoutRAGSource
+from instrumentation import percentile
+from rag_source_base import RAGSourceError
+
+
+class StallingSource(MockRAGSource):
+    def __init__(self, latency: float, stall_latency: float, stall_probability: float, seed: int):
+        super().__init__(latency=latency)
+        self.stall_latency = stall_latency
+        self.stall_probability = stall_probability
+        self.rng = random.Random(seed)
+
+    def retrieve_documents(self, question: str, num_results: int = 5):
+        stalled = self.rng.random() < self.stall_probability
+        time.sleep(self.stall_latency if stalled else self.latency * (0.5 + self.rng.random()))
+        return make_documents(f"{question} {id(self)}", num_results, self.doc_chars)
+
+
+def run(label: str, fanout: FanoutRAGSource, queries: int, concurrency: int):
+    latencies, partial, documents = [], 0, 0
+
+    def query(i: int):
+        start = time.perf_counter()
+        try:
+            docs, report = fanout.retrieve_with_report(f"Question {i}?", 5)
+        except RAGSourceError:
+            # Every source missed its deadline
+            return time.perf_counter() - start, True, 0
+        return time.perf_counter() - start, report.partial, len(docs)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for latency, was_partial, count in executor.map(query, range(queries)):
+            latencies.append(latency)
+            partial += was_partial
+            documents += count
+
+    print(f"{label:<22} {percentile(latencies, 50) * 1000:>8.1f} {percentile(latencies, 99) * 1000:>8.1f} "
+          f"{max(latencies) * 1000:>8.1f} {partial / queries:>9.1%} {documents / queries:>6.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sources", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.05, help="Typical source latency")
+    parser.add_argument("--stall-latency", type=float, default=1.0)
+    parser.add_argument("--stall-probability", type=float, default=0.03)
+    parser.add_argument("--deadline", type=float, default=0.15)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    def sources():
+        return [StallingSource(args.latency, args.stall_latency, args.stall_probability, seed=i)
+                for i in range(args.sources)]
+
+    print(f"{args.sources} sources, {args.latency * 1000:.0f} ms typical, "
+          f"{args.stall_probability:.0%} stall for {args.stall_latency * 1000:.0f} ms")
+    print(f"{'configuration':<22} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'partial':>9} {'docs':>6}")
+
+    run("no deadline", FanoutRAGSource(sources(), default_deadline=None),
+        args.queries, args.concurrency)
+    deadline = FanoutRAGSource(sources(), default_deadline=args.deadline)
+    run(f"deadline {args.deadline * 1000:.0f} ms", deadline, args.queries, args.concurrency)
+    print(f"Timeouts per source: {deadline.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Import-time benchmark: cold-start cost of the entry points, as a regression metric.
+
+Imports each module in a fresh interpreter under `python -X importtime`
+and reports the median import time over several runs. It also lists the
+slowest top-level dependencies and flags heavy packages (litellm,
+vectorize_client, numpy, urllib3) that should only load on first use.
+
+With --baseline, times are compared to a stored baseline (by default the
+one committed in benchmarks/baselines/). The exit status
+is 1 if any module got slower by more than --threshold, or if a heavy
+package is imported eagerly again. --save-baseline records the current
+times instead.
+
+Usage:
+    uv run python -m benchmarks.bench_import_time
+    uv run python -m benchmarks.bench_import_time --save-baseline
+    uv run python -m benchmarks.bench_import_time --baseline benchmarks/baselines/import_time.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE = ROOT / "benchmarks" / "baselines" / "import_time.json"
+MODULES = ["main", "server"]
+# Each takes from a hundred milliseconds to seconds to import; none is needed before the first question
+LAZY_PACKAGES = ["litellm", "vectorize_client", "numpy", "urllib3"]
+
+
+def import_profile(module: str) -> Tuple[float, Dict[str, float]]:
+    """
+    Returns:
+        Microseconds to import the module, and the cumulative microseconds
+        of every package it imported directly or transitively, by name
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, env=os.environ.copy())
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    cumulative: Dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, _, cumulative_us, name = (part.strip() for part in line.replace(":", "|", 1).split("|"))
+        cumulative[name] = float(cumulative_us)
+    return cumulative[module], cumulative
+
+
+def top_level_heavy(cumulative: Dict[str, float], count: int) -> List[Tuple[str, float]]:
+    # site and encodings load with the interpreter, before the module itself
+    packages = {name: us for name, us in cumulative.items()
+                if "." not in name and name not in MODULES and name not in ("site", "encodings")}
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8, help="Slowest dependencies to list")
+    parser.add_argument("--baseline", nargs="?", const=str(DEFAULT_BASELINE),
+                        help="Compare with this baseline file")
+    parser.add_argument("--save-baseline", nargs="?", const=str(DEFAULT_BASELINE),
+                        help="Write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed slowdown over the baseline, as a fraction")
+    args = parser.parse_args()
+    if args.baseline and not Path(args.baseline).exists():
+        parser.error(f"no baseline at {args.baseline}; record one with --save-baseline")
+
+    results: Dict[str, float] = {}
+    failures: List[str] = []
+    for module in args.modules:
+        runs = [import_profile(module) for _ in range(args.runs)]
+        median_ms = statistics.median(total for total, _ in runs) / 1000
+        results[module] = round(median_ms, 1)
+
+        print(f"import {module}: {median_ms:.1f} ms (median of {args.runs})")
+        for name, us in top_level_heavy(runs[-1][1], args.top):
+            print(f"    {name:<28} {us / 1000:>8.1f} ms")
+
+        eager = [package for package in LAZY_PACKAGES if package in runs[-1][1]]
+        if eager:
+            failures.append(f"import {module} eagerly imports {', '.join(eager)}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        print(f"\nAgainst {args.baseline} (threshold +{args.threshold:.0%}):")
+        for module, ms in results.items():
+            if module not in baseline:
+                continue
+            change = ms / baseline[module] - 1
+            print(f"    {module:<10} {baseline[module]:>8.1f} -> {ms:>8.1f} ms ({change:+.0%})")
+            if change > args.threshold:
+                failures.append(f"import {module} regressed {change:+.0%}")
+
+    if args.save_baseline:
+        path = Path(args.save_baseline)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"\nBaseline written to {path}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Recall@k versus QPS for the IVF index compared with exact search.
+
+Builds a throwaway local index of clustered synthetic vectors (uniformly
+random vectors have no neighbourhood structure and would understate IVF
+recall), builds an IVF index over it, and sweeps nprobe.
+
+Usage:
+    uv run python -m benchmarks.bench_ivf
+    uv run python -m benchmarks.bench_ivf --size 5000000 --dim 384 --nprobe 8 16 32
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from instrumentation import percentile
+from local_index import LocalVectorIndex
+
+
+def build_clustered_index(path: str, size: int, dim: int, clusters: int,
+                          batch_size: int = 100_000) -> LocalVectorIndex:
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((clusters, dim), dtype=np.float32)
+    index = LocalVectorIndex.create(path, dim, capacity=size)
+    for start in range(0, size, batch_size):
+        count = min(batch_size, size - start)
+        labels = rng.integers(0, clusters, size=count)
+        vectors = centers[labels] + 0.6 * rng.standard_normal((count, dim), dtype=np.float32)
+        index.add(vectors, [{'id': str(start + i)} for i in range(count)])
+    return index, centers
+
+
+def time_queries(index: LocalVectorIndex, queries: np.ndarray, k: int, nprobe):
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append({row for row, _ in index.search(query, k, nprobe=nprobe)})
+        latencies.append(time.perf_counter() - start)
+    return results, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=500_000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--clusters", type=int, default=1000,
+                        help="Number of synthetic topic clusters in the data")
+    parser.add_argument("--lists", type=int, default=None)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        index, centers = build_clustered_index(tmp, args.size, args.dim, args.clusters)
+        print(f"Built {args.size} x {args.dim} index in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        ivf = index.build_ivf(n_lists=args.lists)
+        print(f"Built IVF with {ivf.n_lists} lists in {time.perf_counter() - start:.1f}s\n")
+
+        rng = np.random.default_rng(1)
+        labels = rng.integers(0, args.clusters, size=args.queries)
+        queries = centers[labels] + 0.6 * rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+
+        truth, exact_latencies = time_queries(index, queries, args.k, nprobe=None)
+
+        print(f"{'search':>12} {'recall@' + str(args.k):>10} {'q/s':>10} {'p50 ms':>10} {'p99 ms':>10}")
+        print(f"{'exact':>12} {1.0:>10.3f} {len(queries) / sum(exact_latencies):>10.0f} "
+              f"{percentile(exact_latencies, 50) * 1000:>10.2f} {percentile(exact_latencies, 99) * 1000:>10.2f}")
+
+        for nprobe in args.nprobe:
+            found, latencies = time_queries(index, queries, args.k, nprobe=nprobe)
+            recall = np.mean([len(f & t) / len(t) for f, t in zip(found, truth)])
+            print(f"{'nprobe=' + str(nprobe):>12} {recall:>10.3f} {len(queries) / sum(latencies):>10.0f} "
+                  f"{percentile(latencies, 50) * 1000:>10.2f} {percentile(latencies, 99) * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+LLM router benchmark: time to first token during a provider brownout.
+
+The mock primary model usually starts answering in ~100 ms but sometimes
+stalls for seconds; the mock fallback model is a little slower but steady.
+Compares the primary alone, hedged requests and an outright primary outage
+(every request fails, so each is answered by the fallback).
+
+Usage:
+    uv run python -m benchmarks.bench_llm_router
+    uv run python -m benchmarks.bench_llm_router --stall-probability 0.1 --hedge-after 0.3
+"""
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import llm_router
+from benchmarks.mocks import make_completion
+from instrumentation import percentile, TurnTrace
+from llm_router import LLMRouter, LLMRouterError
+
+PRIMARY = "mock/primary"
+FALLBACK = "mock/fallback"
+
+
+class BrownoutBackend:
+    """Dispatches mock completions by model; the primary stalls or fails on demand."""
+
+    def __init__(self, latency: float, stall_latency: float, stall_probability: float, seed: int = 0):
+        self.steady = make_completion(latency=latency, token_delay=0.005)
+        self.fallback = make_completion(latency=latency * 1.5, token_delay=0.005)
+        self.stalled = make_completion(latency=stall_latency, token_delay=0.005)
+        self.stall_probability = stall_probability
+        self.down = False
+        self.calls = {PRIMARY: 0, FALLBACK: 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __call__(self, model: str, messages, **kwargs):
+        with self._lock:
+            self.calls[model] += 1
+            stall = self._rng.random() < self.stall_probability
+        if model == FALLBACK:
+            return self.fallback(model, messages, **kwargs)
+        if self.down:
+            raise ConnectionError("primary is down")
+        return (self.stalled if stall else self.steady)(model, messages, **kwargs)
+
+
+def run(label: str, backend: BrownoutBackend, router: LLMRouter, queries: int, concurrency: int):
+    backend.calls = dict.fromkeys(backend.calls, 0)
+    messages = [{"role": "user", "content": "Question?"}]
+
+    def query(i: int):
+        trace = TurnTrace()
+        start = time.perf_counter()
+        try:
+            for _ in router.stream(messages, trace):
+                return time.perf_counter() - start, trace.hedged, False
+        except LLMRouterError:
+            pass
+        return time.perf_counter() - start, trace.hedged, True
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(query, range(queries)))
+
+    ttft = [latency for latency, _, _ in results]
+    hedged = sum(1 for _, was_hedged, _ in results if was_hedged)
+    failed = sum(1 for _, _, was_failed in results if was_failed)
+    extra = sum(backend.calls.values()) / queries - 1
+    print(f"{label:<26} {percentile(ttft, 50) * 1000:>8.1f} {percentile(ttft, 99) * 1000:>8.1f} "
+          f"{hedged / queries:>8.1%} {extra:>+9.1%} {failed:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.1, help="Primary time to first token")
+    parser.add_argument("--stall-latency", type=float, default=2.0)
+    parser.add_argument("--stall-probability", type=float, default=0.05)
+    parser.add_argument("--hedge-after", type=float, default=0.25)
+    parser.add_argument("--timeout", type=float, default=5.0, help="Per-model timeout")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    backend = BrownoutBackend(args.latency, args.stall_latency, args.stall_probability)
+    llm_router.completion = backend
+
+    def router(hedge_after=None):
+        return LLMRouter([PRIMARY, FALLBACK], default_timeout=args.timeout, hedge_after=hedge_after)
+
+    print(f"Primary: {args.latency * 1000:.0f} ms, {args.stall_probability:.0%} stall for "
+          f"{args.stall_latency * 1000:.0f} ms; fallback: {args.latency * 1500:.0f} ms")
+    print(f"{'configuration':<26} {'p50 ms':>8} {'p99 ms':>8} {'hedged':>8} {'requests':>9} {'failed':>7}")
+
+    run("primary only", backend, router(), args.queries, args.concurrency)
+    hedging = router(args.hedge_after)
+    run(f"hedge after {args.hedge_after * 1000:.0f} ms", backend, hedging,
+        args.queries, args.concurrency)
+    print(f"Router: {hedging.stats()}")
+
+    backend.down = True
+    run("primary down, fallback", backend, router(), args.queries, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Query latency of the local vector index as the corpus grows.
+
+Builds throwaway indexes of random unit vectors and times exact top-k search
+through LocalIndexWrapper (query embedding is stubbed out, so the numbers are
+pure search cost).
+
+Usage:
+    uv run python -m benchmarks.bench_local_index
+    uv run python -m benchmarks.bench_local_index --sizes 10000 100000 --dim 1536
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from instrumentation import percentile
+from local_index import LocalVectorIndex
+from local_index_wrapper import LocalIndexWrapper
+
+
+def build_index(path: str, size: int, dim: int, batch_size: int = 50_000) -> LocalVectorIndex:
+    rng = np.random.default_rng(0)
+    index = LocalVectorIndex.create(path, dim, capacity=size)
+    for start in range(0, size, batch_size):
+        count = min(batch_size, size - start)
+        vectors = rng.standard_normal((count, dim), dtype=np.float32)
+        records = [
+            {'id': f"chunk-{start + i}", 'text': f"chunk {start + i}",
+             'source_display_name': "synthetic.txt"}
+            for i in range(count)
+        ]
+        index.add(vectors, records)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+
+    print(f"dim={args.dim} k={args.k} queries={args.queries}")
+    print(f"{'vectors':>10} {'build s':>10} {'p50 ms':>10} {'p99 ms':>10} {'q/s':>10}")
+
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            build_index(tmp, size, args.dim)
+            build_time = time.perf_counter() - start
+
+            query_iter = iter(queries)
+            source = LocalIndexWrapper(tmp, embed_fn=lambda _: next(query_iter))
+            source.retrieve_documents("warm-up", args.k)
+            query_iter = iter(queries)
+
+            latencies = []
+            for _ in range(args.queries):
+                start = time.perf_counter()
+                source.retrieve_documents("q", args.k)
+                latencies.append(time.perf_counter() - start)
+
+            print(f"{size:>10} {build_time:>10.1f} {percentile(latencies, 50) * 1000:>10.2f} "
+                  f"{percentile(latencies, 99) * 1000:>10.2f} {len(latencies) / sum(latencies):>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Prefetch benchmark: retrieval latency on follow-up turns, with and without speculation.
+
+Plays simulated chat sessions through RAGChat over a mock source with a
+Vectorize-like round trip, behind the retrieval cache. Every answer ends
+by suggesting follow-up questions. With probability --follow-rate the
+user asks one of them, verbatim; otherwise the user asks something that
+needs the conversation to make sense ("and the second one?"), which the
+query rewriter turns into a query nobody predicted. Between turns the
+user spends --think-time reading and typing.
+
+Reports the retrieve stage and time to first token, for follow-up turns
+and the other turns, then the prefetcher's stats: how many speculative
+retrievals were used, cancelled before starting or wasted, and the waste
+ratio (wasted / (used + wasted)).
+
+Usage:
+    uv run python -m benchmarks.bench_prefetch
+    uv run python -m benchmarks.bench_prefetch --sessions 4 --turns 10 --follow-rate 0.3 --latency 0.3
+"""
+import argparse
+import random
+import statistics
+import time
+from types import SimpleNamespace
+from typing import List, Dict
+
+import llm_router
+from benchmarks.mocks import MockRAGSource, ensure_fake_credentials, filler
+from caching_rag_source import CachingRAGSource
+from cli_interface import QuietInterface
+from conversation import ConversationStore
+from prefetcher import RetrievalPrefetcher
+
+
+class ScriptedLLM:
+    """Rewrites and answers; every answer closes with suggested follow-up questions."""
+
+    def __init__(self, latency: float, token_delay: float, answer_words: int, follow_ups: int):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.answer_words = answer_words
+        self.follow_ups = follow_ups
+        self.answers = 0
+
+    def suggestions(self, answer_number: int) -> List[str]:
+        return [f"What is the role of component {answer_number}-{i} in the system?"
+                for i in range(self.follow_ups)]
+
+    def _content(self, messages: List[Dict[str, str]]) -> str:
+        prompt = messages[-1]["content"]
+        if prompt.startswith("Rewrite the follow-up"):
+            question = prompt.rsplit("Follow-up question: ", 1)[1]
+            # Questions that need the conversation come back rewritten, the others as they are
+            return f"{question} (about the previous answer)" if question.startswith("And ") else question
+        self.answers += 1
+        suggestions = " ".join(f"{n}. {q}" for n, q in enumerate(self.suggestions(self.answers), 1))
+        return f"{filler(prompt, self.answers, self.answer_words * 6)}.\n\nYou could also ask: {suggestions}"
+
+    def _stream(self, content: str):
+        words = content.split(" ")
+        for i, word in enumerate(words):
+            time.sleep(self.token_delay)
+            token = word if i == len(words) - 1 else word + " "
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))], usage=None)
+
+    def __call__(self, model: str, messages: List[Dict[str, str]], stream: bool = False, **kwargs):
+        time.sleep(self.latency)
+        content = self._content(messages)
+        if stream:
+            return self._stream(content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+
+def play(rag, llm: ScriptedLLM, args: argparse.Namespace) -> Dict[str, List[float]]:
+    """Retrieve and time-to-first-token latencies, in seconds, split by whether the turn asked a suggestion."""
+    rng = random.Random(0)
+    timings = {"follow_retrieve": [], "other_retrieve": [], "follow_ttft": [], "other_ttft": []}
+    conversations = ConversationStore(rag.router)
+    for session in range(args.sessions):
+        conversation = conversations.get(f"session-{session}")
+        question, kind = f"How does system {session} work?", "other"
+        for _ in range(args.turns):
+            for _ in rag.chat_stream(question, conversation=conversation):
+                pass
+            trace = rag.last_trace
+            timings[f"{kind}_retrieve"].append(trace.stages["retrieve"])
+            timings[f"{kind}_ttft"].append(trace.time_to_first_token)
+
+            time.sleep(args.think_time)
+            if rng.random() < args.follow_rate:
+                question, kind = rng.choice(llm.suggestions(llm.answers)), "follow"
+            else:
+                question, kind = f"And what about part {rng.randrange(1000)}?", "other"
+    return timings
+
+
+def describe(values: List[float]) -> str:
+    if not values:
+        return f"{'-':>8} {'-':>8}"
+    values = sorted(values)
+    p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+    return f"{statistics.median(values) * 1000:>8.1f} {p95 * 1000:>8.1f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=3)
+    parser.add_argument("--turns", type=int, default=8)
+    parser.add_argument("--follow-rate", type=float, default=0.5,
+                        help="Chance that the next question is one the answer suggested")
+    parser.add_argument("--latency", type=float, default=0.15, help="Retrieval round trip, in seconds")
+    parser.add_argument("--llm-latency", type=float, default=0.1, help="Seconds to the first token")
+    parser.add_argument("--token-delay", type=float, default=0.002)
+    parser.add_argument("--answer-words", type=int, default=80)
+    parser.add_argument("--follow-ups", type=int, default=3, help="Questions suggested per answer")
+    parser.add_argument("--think-time", type=float, default=0.3, help="Seconds between turns")
+    args = parser.parse_args()
+
+    ensure_fake_credentials()
+    from rag_chat import RAGChat
+
+    print(f"{args.sessions} sessions x {args.turns} turns, {args.latency * 1000:.0f} ms retrieval, "
+          f"{args.follow_rate:.0%} of questions suggested by the previous answer")
+    print(f"{'':<26} {'follow-up turns (ms)':^35} {'other turns (ms)':^35}")
+    print(f"{'':<26} " + " ".join(f"{'retrieve':^17} {'first token':^17}" for _ in range(2)))
+    print(f"{'':<26} " + " ".join(f"{'p50':>8} {'p95':>8}" for _ in range(4)))
+    for label, speculate in (("no prefetch", False), ("prefetch", True)):
+        llm = ScriptedLLM(args.llm_latency, args.token_delay, args.answer_words, args.follow_ups)
+        llm_router.completion = llm
+        source = CachingRAGSource(MockRAGSource(latency=args.latency))
+        prefetcher = RetrievalPrefetcher(source) if speculate else None
+        rag = RAGChat(QuietInterface(), rag_source=source, prefetcher=prefetcher)
+
+        timings = play(rag, llm, args)
+        print(f"{label:<26} {describe(timings['follow_retrieve'])} {describe(timings['follow_ttft'])} "
+              f"{describe(timings['other_retrieve'])} {describe(timings['other_ttft'])}")
+        if prefetcher:
+            prefetcher.close()
+            stats = prefetcher.stats()
+            print(f"\nPrefetch: {', '.join(f'{name} {value}' for name, value in stats.items() if name != 'waste_ratio')}")
+            print(f"Waste ratio: {stats['waste_ratio']:.0%} of speculative retrievals went unused")
+            print(f"Source calls: {source.upstream_calls} asked for, {source.prefetched} prefetched")
+
+
+if __name__ == "__main__":
+    main()
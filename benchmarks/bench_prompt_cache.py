@@ -0,0 +1,116 @@
+"""
+Prompt cache benchmark: cached prompt tokens and latency by prompt layout.
+
+A mock LLM imitates provider-side prefix caching: the longest prefix a
+prompt shares with a recent prompt is cached in 128-token blocks once it
+reaches 1024 tokens, and only the uncached tokens cost prefill time. A
+session asks several questions over the same documents, which the source
+returns in a different order each time. The "classic" layout puts context
+and question in one message; "prefix_cache" puts the documents, sorted by
+ID, before the question.
+
+Usage:
+    uv run python -m benchmarks.bench_prompt_cache
+    uv run python -m benchmarks.bench_prompt_cache --questions 20 --prefill-per-1k 0.2
+"""
+import argparse
+import random
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+
+import llm_router
+from benchmarks.mocks import MockRAGSource, ensure_fake_credentials, make_documents
+from cli_interface import QuietInterface
+from context_builder import TokenCounter
+from instrumentation import TurnTrace, percentile
+
+BLOCK_TOKENS = 128
+MIN_CACHED_TOKENS = 1024
+
+
+class PrefixCachingLLM:
+    def __init__(self, prefill_per_1k: float, latency: float):
+        self.prefill_per_1k = prefill_per_1k
+        self.latency = latency
+        self.counter = TokenCounter()
+        self._recent = deque(maxlen=64)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _common_prefix(a: str, b: str) -> int:
+        n = 0
+        for x, y in zip(a, b):
+            if x != y:
+                break
+            n += 1
+        return n
+
+    def __call__(self, model: str, messages, **kwargs):
+        prompt = "".join(message["role"] + ":" + message["content"] + "\n" for message in messages)
+        with self._lock:
+            shared = max((self._common_prefix(prompt, seen) for seen in self._recent), default=0)
+            self._recent.append(prompt)
+
+        prompt_tokens = self.counter.count(prompt)
+        shared_tokens = self.counter.count(prompt[:shared])
+        cached = shared_tokens // BLOCK_TOKENS * BLOCK_TOKENS if shared_tokens >= MIN_CACHED_TOKENS else 0
+        time.sleep(self.latency + self.prefill_per_1k * (prompt_tokens - cached) / 1000)
+
+        usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=20,
+                                prompt_tokens_details=SimpleNamespace(cached_tokens=cached))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="An answer."))],
+                               usage=usage)
+
+
+class FixedDocumentsSource(MockRAGSource):
+    """Always the same documents, ranked differently for every question."""
+
+    def __init__(self, num_documents: int, doc_chars: int):
+        super().__init__(latency=0.0, doc_chars=doc_chars)
+        self.documents = make_documents("the handbook", num_documents, doc_chars)
+
+    def retrieve_documents(self, question: str, num_results: int = 5):
+        rng = random.Random(question)
+        documents = [dict(doc, relevancy=round(rng.random(), 4)) for doc in self.documents]
+        documents.sort(key=lambda doc: doc['relevancy'], reverse=True)
+        return documents[:num_results]
+
+
+def run(layout: str, source: FixedDocumentsSource, questions: int, num_results: int):
+    import rag_chat
+    rag = rag_chat.RAGChat(QuietInterface(), rag_source=source, prompt_layout=layout)
+    prompt_tokens, cached_tokens, completion = [], [], []
+    for i in range(questions):
+        trace = TurnTrace()
+        rag.chat(f"Question {i} about the handbook?", num_results, trace=trace)
+        prompt_tokens.append(trace.prompt_tokens)
+        cached_tokens.append(trace.cached_tokens or 0)
+        completion.append(trace.stages["completion"])
+
+    print(f"{layout:<14} {sum(prompt_tokens) / questions:>8.0f} {sum(cached_tokens) / sum(prompt_tokens):>8.1%} "
+          f"{percentile(completion, 50) * 1000:>8.1f} {percentile(completion, 99) * 1000:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--documents", type=int, default=5)
+    parser.add_argument("--doc-chars", type=int, default=2000)
+    parser.add_argument("--prefill-per-1k", type=float, default=0.1,
+                        help="Mock prefill seconds per 1000 uncached prompt tokens")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock fixed LLM latency")
+    args = parser.parse_args()
+    ensure_fake_credentials()
+
+    source = FixedDocumentsSource(args.documents, args.doc_chars)
+    print(f"{args.questions} questions over the same {args.documents} documents")
+    print(f"{'layout':<14} {'prompt':>8} {'cached':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for layout in ("classic", "prefix_cache"):
+        llm_router.completion = PrefixCachingLLM(args.prefill_per_1k, args.latency)
+        run(layout, source, args.questions, args.documents)
+
+
+if __name__ == "__main__":
+    main()
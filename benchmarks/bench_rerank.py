@@ -0,0 +1,119 @@
+"""
+Reranking benchmark: rerank cost against prompt tokens saved.
+
+A mock source returns candidates in a noisy order (a weak first-stage
+retriever); a mock scorer knows each document's true relevance and takes a
+fixed time per batch. Without reranking, reaching the same recall of the
+truly relevant documents means sending many more documents to the LLM.
+
+For each configuration this reports how many documents reach the prompt,
+the prompt tokens they cost, recall of the true top documents and the rerank
+latency, plus a run with a scorer slower than the budget to show the
+fallback to source order.
+
+Usage:
+    uv run python -m benchmarks.bench_rerank
+    uv run python -m benchmarks.bench_rerank --candidates 20 50 100 --batch-latency 0.05
+"""
+import argparse
+import random
+import time
+from typing import List, Dict, Any
+
+from benchmarks.mocks import make_documents
+from context_builder import ContextBuilder
+from instrumentation import percentile
+from reranker import Reranker, RelevanceScorer
+
+
+def make_candidates(question: str, count: int, doc_chars: int, seed: int) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    documents = make_documents(question, count, doc_chars)
+    for doc in documents:
+        gold = rng.random()
+        doc['metadata'] = {'gold': gold}
+        # The first stage only weakly agrees with the true relevance
+        doc['relevancy'] = 0.3 * gold + 0.7 * rng.random()
+    documents.sort(key=lambda doc: doc['relevancy'], reverse=True)
+    return documents
+
+
+class OracleScorer(RelevanceScorer):
+    """Scores close to the true relevance, after a simulated model latency per batch."""
+
+    def __init__(self, batch_latency: float):
+        self.batch_latency = batch_latency
+        self.gold: Dict[str, float] = {}
+
+    def score(self, question: str, passages: List[str]) -> List[float]:
+        time.sleep(self.batch_latency)
+        return [self.gold[passage] + random.gauss(0, 0.05) for passage in passages]
+
+
+def recall(selected: List[Dict[str, Any]], candidates: List[Dict[str, Any]], k: int) -> float:
+    best = sorted(candidates, key=lambda doc: doc['metadata']['gold'], reverse=True)[:k]
+    best_ids = {doc['id'] for doc in best}
+    return len(best_ids & {doc['id'] for doc in selected}) / k
+
+
+def run(label: str, runs: int, top_k: int, sent: int, candidates: int, doc_chars: int,
+        builder: ContextBuilder, scorer: OracleScorer, reranker: Reranker = None):
+    tokens, recalls, latencies = [], [], []
+    for i in range(runs):
+        pool = make_candidates(f"Question {i}?", candidates, doc_chars, seed=i)
+        scorer.gold = {doc['text']: doc['metadata']['gold'] for doc in pool}
+
+        start = time.perf_counter()
+        if reranker:
+            selected = reranker.rerank(f"Question {i}?", pool, sent)
+        else:
+            selected = pool[:sent]
+        latencies.append(time.perf_counter() - start)
+
+        # Map back to the originals to read the gold labels
+        by_id = {doc['id']: doc for doc in pool}
+        selected = [by_id[doc['id']] for doc in selected]
+        tokens.append(builder.counter.count(builder.build(selected)))
+        recalls.append(recall(selected, pool, top_k))
+
+    print(f"{label:<34} {sent:>5} {percentile(tokens, 50):>8.0f} "
+          f"{sum(recalls) / len(recalls):>9.2f} {percentile(latencies, 50) * 1000:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--candidates", type=int, nargs="+", default=[20, 50])
+    parser.add_argument("--top-k", type=int, default=5, help="Documents kept after reranking")
+    parser.add_argument("--doc-chars", type=int, default=1500)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--batch-latency", type=float, default=0.03,
+                        help="Simulated scorer latency per batch")
+    parser.add_argument("--budget", type=float, default=1.0, help="Rerank time budget in seconds")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    # Measure the documents themselves, not the context budget
+    builder = ContextBuilder(max_tokens=10 ** 9)
+    scorer = OracleScorer(args.batch_latency)
+
+    print(f"{'configuration':<34} {'docs':>5} {'tokens':>8} {'recall@' + str(args.top_k):>9} "
+          f"{'rerank ms':>10}")
+    for candidates in args.candidates:
+        for sent in (args.top_k, candidates):
+            run(f"source order, {candidates} candidates", args.runs, args.top_k, sent,
+                candidates, args.doc_chars, builder, scorer)
+        reranker = Reranker(scorer, candidates=candidates, batch_size=args.batch_size,
+                            time_budget=args.budget)
+        run(f"reranked, {candidates} candidates", args.runs, args.top_k, args.top_k,
+            candidates, args.doc_chars, builder, scorer, reranker)
+
+    slow = OracleScorer(args.budget * 2)
+    reranker = Reranker(slow, candidates=max(args.candidates), batch_size=args.batch_size,
+                        time_budget=args.budget)
+    run("scorer slower than budget", 3, args.top_k, args.top_k,
+        max(args.candidates), args.doc_chars, builder, slow, reranker)
+    print(f"Fallbacks: {reranker.stats()['fallbacks']} of 3")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Load benchmark for the HTTP server against mock retrieval and LLM backends.
+
+Starts a RAGServer on a free local port, then drives /chat from a number of
+client threads, each reusing one keep-alive connection (or opening a new one
+per request with --no-keepalive). Reports throughput, latency percentiles and
+how many requests were turned away with 429, then fetches /metrics and one
+streamed answer.
+
+Usage:
+    uv run python -m benchmarks.bench_server
+    uv run python -m benchmarks.bench_server --clients 64 --max-concurrency 16
+"""
+import argparse
+import http.client
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.mocks import MockRAGSource, ensure_fake_credentials, make_completion
+from cli_interface import QuietInterface
+from instrumentation import HistogramAggregator, percentile
+
+
+def _client(port: int, requests: int, keepalive: bool) -> dict:
+    latencies, statuses = [], {}
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    for i in range(requests):
+        body = json.dumps({"question": f"Question number {i}?"})
+        start = time.perf_counter()
+        connection.request("POST", "/chat", body=body,
+                           headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start)
+        statuses[response.status] = statuses.get(response.status, 0) + 1
+        if not keepalive:
+            connection.close()
+            connection = http.client.HTTPConnection("127.0.0.1", port)
+    connection.close()
+    return {"latencies": latencies, "statuses": statuses}
+
+
+def _stream_once(port: int) -> str:
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    connection.request("POST", "/chat/stream", body=json.dumps({"question": "Stream this?"}))
+    response = connection.getresponse()
+    text = b"".join(iter(lambda: response.read1(), b"")).decode("utf-8")
+    connection.close()
+    return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests-per-client", type=int, default=20)
+    parser.add_argument("--max-concurrency", type=int, default=32)
+    parser.add_argument("--retrieval-latency", type=float, default=0.05)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--no-keepalive", action="store_true",
+                        help="Open a new connection for every request")
+    args = parser.parse_args()
+
+    ensure_fake_credentials()
+
+    import llm_router
+    import rag_chat
+    from server import RAGServer
+    llm_router.completion = make_completion(latency=args.llm_latency)
+
+    aggregator = HistogramAggregator()
+    rag = rag_chat.RAGChat(QuietInterface(),
+                           rag_source=MockRAGSource(latency=args.retrieval_latency),
+                           hook=aggregator)
+    server = RAGServer(("127.0.0.1", 0), rag, aggregator,
+                       max_concurrency=args.max_concurrency)
+    port = server.server_port
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    keepalive = not args.no_keepalive
+    print(f"Clients: {args.clients}, server concurrency: {args.max_concurrency}, "
+          f"keep-alive: {'on' if keepalive else 'off'}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as executor:
+        results = list(executor.map(
+            lambda _: _client(port, args.requests_per_client, keepalive),
+            range(args.clients)))
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for result in results for latency in result["latencies"]]
+    statuses = {}
+    for result in results:
+        for status, count in result["statuses"].items():
+            statuses[status] = statuses.get(status, 0) + count
+
+    print(f"Requests: {len(latencies)} in {elapsed:.2f}s ({len(latencies) / elapsed:.1f} req/s)")
+    print(f"Latency p50: {percentile(latencies, 50) * 1000:.1f} ms, "
+          f"p99: {percentile(latencies, 99) * 1000:.1f} ms")
+    print(f"Status codes: {dict(sorted(statuses.items()))}")
+
+    print(f"Streamed answer: {_stream_once(port)!r}")
+
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    connection.request("GET", "/metrics")
+    metrics = json.loads(connection.getresponse().read())
+    connection.close()
+    print(f"Server counters: requests={metrics['requests']} rejected={metrics['rejected']} "
+          f"errors={metrics['errors']}")
+
+    server.shutdown()
+    print(f"Drained cleanly: {server.drain(timeout=5)}")
+    server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Vectorize client benchmark: retries, timeouts and the circuit breaker against a fake API.
+
+Runs VectorizeWrapper against benchmarks.fake_vectorize in three scenarios:
+
+    flaky    a fraction of requests fail with 503; compares success rate
+             and latency with and without retries
+    slow     some requests take longer than the read timeout
+    outage   every request fails; compares how long each question takes
+             to fail with and without the circuit breaker
+
+Connections opened are reported next to requests sent, to show that the
+pool reuses them.
+
+Usage:
+    uv run python -m benchmarks.bench_vectorize
+    uv run python -m benchmarks.bench_vectorize --failure-rate 0.3 --queries 400
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_vectorize import FakeVectorizeServer
+from instrumentation import percentile
+from rag_source_base import RAGSourceError
+from resilience import RetryPolicy, CircuitBreaker
+from vectorize_wrapper import VectorizeWrapper
+
+
+def ensure_fake_vectorize_credentials():
+    for var in ("VECTORIZE_PIPELINE_ACCESS_TOKEN", "VECTORIZE_ORGANIZATION_ID", "VECTORIZE_PIPELINE_ID"):
+        os.environ.setdefault(var, "benchmark")
+
+
+def run(label: str, server: FakeVectorizeServer, client: VectorizeWrapper, queries: int, concurrency: int):
+    server.reset_counters()
+
+    def query(i: int):
+        start = time.perf_counter()
+        try:
+            client.retrieve_documents(f"Question {i}?", 5)
+            error = None
+        except RAGSourceError as e:
+            error = type(e).__name__
+        return time.perf_counter() - start, error
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(query, range(queries)))
+
+    latencies = [latency for latency, _ in results]
+    failed = sum(1 for _, error in results if error)
+    print(f"{label:<28} {1 - failed / queries:>8.1%} {percentile(latencies, 50) * 1000:>8.1f} "
+          f"{percentile(latencies, 99) * 1000:>8.1f} {server.counters['requests']:>9} "
+          f"{server.counters['connections']:>6}")
+    return client
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--failure-rate", type=float, default=0.2)
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--read-timeout", type=float, default=0.2)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    ensure_fake_vectorize_credentials()
+
+    server = FakeVectorizeServer(latency=args.latency).start()
+
+    def client(retries: int = args.retries, failure_threshold: int = 10 ** 9):
+        return VectorizeWrapper(host=server.url, pool_size=args.concurrency,
+                                read_timeout=args.read_timeout,
+                                retry_policy=RetryPolicy(retries, base_delay=0.01, max_delay=0.1),
+                                breaker=CircuitBreaker(failure_threshold, reset_timeout=5.0))
+
+    print(f"{'scenario':<28} {'success':>8} {'p50 ms':>8} {'p99 ms':>8} {'requests':>9} {'conns':>6}")
+    try:
+        server.failure_rate = args.failure_rate
+        run(f"flaky {args.failure_rate:.0%}, no retries", server, client(retries=0),
+            args.queries, args.concurrency)
+        run(f"flaky {args.failure_rate:.0%}, {args.retries} retries", server, client(),
+            args.queries, args.concurrency)
+
+        server.failure_rate = 0.0
+        server.jitter = args.read_timeout * 1.5
+        run(f"slow, {args.read_timeout * 1000:.0f} ms read timeout", server, client(),
+            args.queries, args.concurrency)
+
+        server.jitter = 0.0
+        server.down = True
+        run("outage, no breaker", server, client(), args.queries, args.concurrency)
+        with_breaker = run("outage, breaker", server, client(failure_threshold=5),
+                           args.queries, args.concurrency)
+        print(f"Breaker: {with_breaker.stats()}")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+Workload benchmark: the whole RAG path, offline, compared against a stored baseline.
+
+Plays a JSONL workload (the batch mode format: a "question" per line, with
+an optional "id" or "request_id") through RAGChat and the CLI, with
+retrieval and the LLM replayed from recorded fixtures (see
+benchmarks.replay), benchmarks/fixtures/sample.jsonl by default. With
+--synthetic, generated documents and answers are used instead. The run
+has two passes:
+
+  timed        throughput, per-stage percentiles and peak RSS
+  allocations  the same questions under tracemalloc with no injected
+               latency: peak and retained memory per question
+
+Modes: "stream" renders streamed answers like interactive mode, "chat"
+renders whole answers, and "async" runs BatchRunner with --concurrency.
+CLI output goes to /dev/null, but it is still rendered, and each pass
+waits for the render thread to catch up, so the cost of cli_interface.py
+is part of the measurement.
+
+With --baseline, results are compared to a stored run, by default the one
+committed in benchmarks/baselines/. The exit status is
+1 if any metric is worse by more than --threshold. Timing metrics must
+also be worse by more than --min-delta-ms, so microsecond jitter in fast
+stages is ignored. --save-baseline records the current run instead.
+
+--record runs the workload against the configured RAG source and LLM
+(credentials from .env) and writes the fixture file.
+
+Usage:
+    uv run python -m benchmarks.bench_workload
+    uv run python -m benchmarks.bench_workload --baseline
+    uv run python -m benchmarks.bench_workload --save-baseline
+    uv run python -m benchmarks.bench_workload --record --fixtures benchmarks/fixtures/recorded.jsonl
+    uv run python -m benchmarks.bench_workload --mode async --concurrency 16 --llm-latency 0.5
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import List, Dict, Any, Tuple
+
+import llm_router
+from batch_runner import BatchRunner
+from benchmarks.mocks import ensure_fake_credentials
+from benchmarks.replay import (FixtureStore, RecordingCompletion, RecordingRAGSource,
+                               ReplayCompletion, ReplayRAGSource)
+from cli_interface import CLIInterface, QuietInterface, Config
+from instrumentation import HistogramAggregator, InstrumentationHook, STAGES
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_WORKLOAD = ROOT / "benchmarks" / "workloads" / "sample.jsonl"
+DEFAULT_FIXTURES = ROOT / "benchmarks" / "fixtures" / "sample.jsonl"
+DEFAULT_BASELINE = ROOT / "benchmarks" / "baselines" / "workload.json"
+# Every metric is worse when higher, except these
+HIGHER_IS_BETTER = {"questions_per_second"}
+
+
+def load_workload(path: str, question_field: str) -> List[Tuple[str, str]]:
+    """(id, question) pairs, with ids assigned as BatchRunner does."""
+    workload = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            question_id = str(record.get("id", record.get("request_id", line_number)))
+            workload.append((question_id, record[question_field]))
+    return workload
+
+
+def build_rag(args: argparse.Namespace, store: FixtureStore):
+    """A RAGChat over recording or replaying backends, without answer or retrieval caches."""
+    from rag_chat import RAGChat
+
+    if args.record:
+        import main
+        main.load_environment()
+        source = None
+        if main.RAG_SOURCE.value != "none":
+            source = RecordingRAGSource(main.create_source(main.RAG_SOURCE), store)
+        recorder = RecordingCompletion(llm_router.completion, llm_router.acompletion, store)
+        llm_router.completion, llm_router.acompletion = recorder, recorder.acall
+    else:
+        ensure_fake_credentials()
+        source = ReplayRAGSource(store, args.retrieval_latency)
+        replay = ReplayCompletion(store, args.llm_latency, args.token_delay)
+        llm_router.completion, llm_router.acompletion = replay, replay.acall
+
+    cli = QuietInterface() if args.mode == "async" else CLIInterface()
+    return RAGChat(cli, rag_source=source), cli
+
+
+def ask(rag, cli, mode: str, question: str, num_results: int):
+    if mode == "stream":
+        cli.print_answer_stream(rag.chat_stream(question, num_results))
+    elif mode == "chat":
+        cli.print_answer(rag.chat(question, num_results))
+    else:
+        asyncio.run(rag.achat(question, num_results))
+        return
+    cli.print_latency(**rag.last_latency)
+
+
+def run_timed(rag, cli, args: argparse.Namespace, workload: List[Tuple[str, str]]) -> float:
+    """Play the workload --repeat times. Returns the elapsed seconds."""
+    start = time.perf_counter()
+    if args.mode == "async":
+        with tempfile.TemporaryDirectory() as directory:
+            for run in range(args.repeat):
+                output = Path(directory) / f"answers-{run}.jsonl"
+                runner = BatchRunner(rag, args.concurrency, args.num_results, args.question_field)
+                asyncio.run(runner.run(args.workload, str(output)))
+        return time.perf_counter() - start
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(args.repeat):
+            for _, question in workload:
+                ask(rag, cli, args.mode, question, args.num_results)
+        cli.flush()
+    return time.perf_counter() - start
+
+
+def measure_allocations(rag, cli, args: argparse.Namespace,
+                        workload: List[Tuple[str, str]]) -> Dict[str, float]:
+    """Peak and retained traced memory per question, in KiB, with the backends' latency turned off."""
+    rag.rag_source.latency = 0.0
+    replay = llm_router.completion
+    replay.latency, replay.token_delay = 0.0, 0.0
+
+    peaks = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        tracemalloc.start()
+        start_size, _ = tracemalloc.get_traced_memory()
+        for _, question in workload:
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            ask(rag, cli, args.mode, question, args.num_results)
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        cli.flush()
+        end_size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        "alloc_peak_kib": sum(peaks) / len(peaks) / 1024,
+        "alloc_retained_kib": (end_size - start_size) / len(peaks) / 1024,
+    }
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def collect_metrics(summary: Dict[str, Dict[str, float]], questions: int, elapsed: float) -> Dict[str, float]:
+    metrics = {"questions_per_second": questions / elapsed}
+    for metric in STAGES + ["time_to_first_token"]:
+        if metric in summary:
+            for p in ("p50", "p95"):
+                metrics[f"{metric}_{p}_ms"] = summary[metric][p] * 1000
+    metrics["peak_rss_mb"] = peak_rss_mb()
+    return metrics
+
+
+def run_params(args: argparse.Namespace) -> Dict[str, Any]:
+    """What a baseline must share with a run to be comparable."""
+    fixtures = Path(args.fixtures).name if args.fixtures else None
+    return {"workload": Path(args.workload).name, "fixtures": fixtures, "mode": args.mode,
+            "num_results": args.num_results,
+            "concurrency": args.concurrency if args.mode == "async" else None}
+
+
+def compare(metrics: Dict[str, float], baseline: Dict[str, Any],
+            threshold: float, min_delta_ms: float) -> List[str]:
+    """Print the change of every metric against the baseline. Returns the regressions."""
+    failures = []
+    for name, value in metrics.items():
+        if name not in baseline["metrics"]:
+            continue
+        before = baseline["metrics"][name]
+        if name in HIGHER_IS_BETTER:
+            worse_by = before / value - 1 if value else float("inf")
+        else:
+            worse_by = value / before - 1 if before else 0.0
+        regressed = worse_by > threshold and not (
+            name.endswith("_ms") and value - before <= min_delta_ms)
+        print(f"    {name:<28} {before:>10.2f} -> {value:>10.2f} "
+              f"{worse_by:>+6.0%}{'  REGRESSION' if regressed else ''}")
+        if regressed:
+            failures.append(f"{name} is {worse_by:.0%} worse than the baseline")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workload", default=str(DEFAULT_WORKLOAD), help="JSONL file of questions")
+    parser.add_argument("--question-field", default="question")
+    parser.add_argument("--fixtures", help=f"Recorded fixture file (default: {DEFAULT_FIXTURES.relative_to(ROOT)})")
+    parser.add_argument("--synthetic", action="store_true",
+                        help="Generate documents and answers instead of replaying fixtures")
+    parser.add_argument("--record", action="store_true",
+                        help="Run against the real source and LLM and write --fixtures")
+    parser.add_argument("--mode", choices=["stream", "chat", "async"], default="stream")
+    parser.add_argument("--concurrency", type=int, default=Config.BATCH_CONCURRENCY,
+                        help="Questions in flight in async mode")
+    parser.add_argument("--num-results", type=int, default=Config.DEFAULT_NUM_RESULTS)
+    parser.add_argument("--repeat", type=int, default=3, help="Times the workload is played")
+    parser.add_argument("--warmup", type=int, default=3, help="Questions asked before measuring")
+    parser.add_argument("--retrieval-latency", type=float,
+                        help="Seconds per retrieval (default: as recorded)")
+    parser.add_argument("--llm-latency", type=float,
+                        help="Seconds to the first token (default: as recorded)")
+    parser.add_argument("--token-delay", type=float,
+                        help="Seconds between streamed words (default: as recorded)")
+    parser.add_argument("--baseline", nargs="?", const=str(DEFAULT_BASELINE),
+                        help="Compare with this baseline file")
+    parser.add_argument("--save-baseline", nargs="?", const=str(DEFAULT_BASELINE),
+                        help="Write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Allowed regression over the baseline, as a fraction")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0,
+                        help="Timing changes smaller than this never count as regressions")
+    args = parser.parse_args()
+    if args.record and not args.fixtures:
+        parser.error("--record needs --fixtures")
+    if args.synthetic:
+        args.fixtures = None
+    elif args.fixtures is None:
+        args.fixtures = str(DEFAULT_FIXTURES)
+    if args.fixtures and not args.record and not Path(args.fixtures).exists():
+        parser.error(f"no fixture file at {args.fixtures}; record one with --record, or pass --synthetic")
+    if args.baseline and not Path(args.baseline).exists():
+        parser.error(f"no baseline at {args.baseline}; record one with --save-baseline")
+
+    workload = load_workload(args.workload, args.question_field)
+    store = FixtureStore(args.fixtures)
+    rag, cli = build_rag(args, store)
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _, question in workload[:args.warmup]:
+            ask(rag, cli, args.mode, question, args.num_results)
+        cli.flush()
+
+    aggregator = HistogramAggregator(window=len(workload) * args.repeat)
+    rag.hook = aggregator
+    elapsed = run_timed(rag, cli, args, workload)
+    summary = aggregator.summary()
+    metrics = collect_metrics(summary, aggregator.turns, elapsed)
+    if not args.record:
+        rag.hook = InstrumentationHook()
+        metrics.update(measure_allocations(rag, cli, args, workload))
+
+    source = args.fixtures or "synthetic backends"
+    print(f"{len(workload)} questions x {args.repeat}, mode {args.mode}, {source} ({store.stats()})")
+    cli.print_percentiles("Stage latency", summary)
+    cli.flush()
+    print()
+    for name, value in metrics.items():
+        if not name.endswith("_ms"):
+            print(f"{name:<28} {value:>10.2f}")
+
+    failures = []
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        print(f"\nAgainst {args.baseline} (change for the worse, threshold +{args.threshold:.0%}):")
+        if baseline.get("params") != run_params(args):
+            print(f"    Warning: the baseline was run with {baseline.get('params')}")
+        failures = compare(metrics, baseline, args.threshold, args.min_delta_ms)
+
+    if args.save_baseline:
+        path = Path(args.save_baseline)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({"params": run_params(args), "metrics": metrics}, indent=2) + "\n")
+        print(f"\nBaseline written to {path}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+A local stand-in for the Vectorize retrieval API, with injectable latency and failures.
+
+Point VectorizeWrapper at it with host=server.url to exercise timeouts,
+retries and the circuit breaker without touching the real service. It
+counts requests and TCP connections, so connection reuse is visible too.
+
+Usage:
+    uv run python -m benchmarks.fake_vectorize --port 8765 --failure-rate 0.2
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from benchmarks.mocks import make_documents
+
+RETRIEVAL_PATH = re.compile(r"^/v1/org/[^/]+/pipelines/[^/]+/retrieval$")
+
+
+class FakeVectorizeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; don't let Nagle hold the body back
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.count("connections")
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up waiting (a read timeout); expected in these tests
+            self.close_connection = True
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not RETRIEVAL_PATH.match(self.path):
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": f"Unknown path {self.path}"})
+            return
+
+        self.server.count("requests")
+        latency, failure = self.server.next_outcome()
+        time.sleep(latency)
+        if failure:
+            self.server.count("failures")
+            self._send_json(failure, {"error": "injected failure"},
+                            {"Retry-After": "0"} if failure == HTTPStatus.TOO_MANY_REQUESTS else None)
+            return
+
+        question = request.get("question", "")
+        documents = make_documents(question, request.get("numResults", 5), self.server.doc_chars)
+        self._send_json(HTTPStatus.OK, {
+            "question": question,
+            "documents": [
+                {
+                    "relevancy": doc["relevancy"],
+                    "id": doc["id"],
+                    "text": doc["text"],
+                    "chunk_id": "0",
+                    "total_chunks": "1",
+                    "origin": "fake",
+                    "origin_id": doc["id"],
+                    "similarity": doc["relevancy"],
+                    "source": doc["source_display_name"],
+                    "unique_source": doc["source_display_name"],
+                    "source_display_name": doc["source_display_name"],
+                }
+                for doc in documents
+            ],
+            "average_relevancy": 0.5,
+            "ndcg": 0.0,
+        })
+
+
+class FakeVectorizeServer(ThreadingHTTPServer):
+    """
+    Answers retrieval requests after `latency` seconds (plus up to `jitter`).
+
+    Each request fails with `failure_status` with probability
+    `failure_rate`; set `down` to fail every request, as during an outage.
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, port: int = 0, latency: float = 0.02, jitter: float = 0.0,
+                 failure_rate: float = 0.0, failure_status: int = HTTPStatus.SERVICE_UNAVAILABLE,
+                 doc_chars: int = 500, seed: int = 0):
+        super().__init__(("127.0.0.1", port), FakeVectorizeHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.doc_chars = doc_chars
+        self.down = False
+        self.counters = {"connections": 0, "requests": 0, "failures": 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def next_outcome(self):
+        with self._lock:
+            latency = self.latency + self._rng.random() * self.jitter
+            failed = self.down or self._rng.random() < self.failure_rate
+        return latency, self.failure_status if failed else None
+
+    def count(self, counter: str):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def reset_counters(self):
+        with self._lock:
+            self.counters = dict.fromkeys(self.counters, 0)
+
+    def start(self) -> "FakeVectorizeServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--failure-status", type=int, default=503)
+    args = parser.parse_args()
+
+    server = FakeVectorizeServer(args.port, args.latency, args.jitter,
+                                 args.failure_rate, args.failure_status)
+    print(f"Fake Vectorize API on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
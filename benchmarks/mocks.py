@@ -0,0 +1,116 @@
+"""
+Mock retrieval and LLM backends for running benchmarks offline.
+
+Nothing here talks to the network: latencies are simulated with sleeps so the
+numbers reflect our own overhead and concurrency behaviour.
+"""
+import asyncio
+import os
+import random
+import time
+from types import SimpleNamespace
+from typing import List, Dict, Any, Iterator
+
+from rag_source_base import RAGSourceBase
+
+
+def ensure_fake_credentials():
+    """RAGChat refuses to start without an API key, even when the LLM is mocked."""
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+
+WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua enim ad minim veniam quis nostrud "
+    "exercitation ullamco laboris nisi aliquip ex ea commodo consequat duis aute irure"
+).split()
+
+
+def filler(question: str, number: int, chars: int) -> str:
+    """Deterministic pseudo-text, different for every document so none look like duplicates."""
+    rng = random.Random(f"{question}:{number}")
+    words = []
+    length = 0
+    while length < chars:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)[:chars]
+
+
+def make_documents(question: str, num_results: int, doc_chars: int = 600) -> List[Dict[str, Any]]:
+    return [
+        {
+            'id': f"doc-{i}",
+            'text': f"Document {i} about {question}. {filler(question, i, doc_chars)}",
+            'source_display_name': f"mock_{i}.txt",
+            'relevancy': round(1.0 - i * 0.01, 4),
+        }
+        for i in range(num_results)
+    ]
+
+
+class MockRAGSource(RAGSourceBase):
+    """Returns synthetic documents after a fixed simulated retrieval latency."""
+
+    def __init__(self, latency: float = 0.05, doc_chars: int = 600, native_async: bool = False):
+        self.latency = latency
+        self.doc_chars = doc_chars
+        self.native_async = native_async
+
+    def retrieve_documents(self, question: str, num_results: int = 5) -> List[Dict[str, Any]]:
+        time.sleep(self.latency)
+        return make_documents(question, num_results, self.doc_chars)
+
+    async def aretrieve_documents(self, question: str, num_results: int = 5) -> List[Dict[str, Any]]:
+        if not self.native_async:
+            return await super().aretrieve_documents(question, num_results)
+        await asyncio.sleep(self.latency)
+        return make_documents(question, num_results, self.doc_chars)
+
+    def get_required_env_vars(self) -> List[str]:
+        return []
+
+
+def _response(content: str):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))]
+    )
+
+
+def _stream(content: str, token_delay: float) -> Iterator[Any]:
+    for token in content.split(" "):
+        time.sleep(token_delay)
+        yield SimpleNamespace(
+            choices=[SimpleNamespace(delta=SimpleNamespace(content=token + " "))]
+        )
+
+
+def _prompt_chars(messages: List[Dict[str, str]]) -> int:
+    return sum(len(message["content"]) for message in messages)
+
+
+def make_completion(latency: float = 0.2, answer: str = "This is a mocked answer.", token_delay: float = 0.01,
+                    prefill_per_1k_chars: float = 0.0):
+    """
+    Build a drop-in replacement for litellm.completion.
+
+    prefill_per_1k_chars adds latency proportional to the prompt size, like
+    a real model's prefill.
+    """
+    def completion(model: str, messages: List[Dict[str, str]], stream: bool = False, **kwargs):
+        time.sleep(latency + prefill_per_1k_chars * _prompt_chars(messages) / 1000)
+        if stream:
+            return _stream(answer, token_delay)
+        return _response(answer)
+
+    return completion
+
+
+def make_acompletion(latency: float = 0.2, answer: str = "This is a mocked answer."):
+    """Build a drop-in replacement for litellm.acompletion."""
+    async def acompletion(model: str, messages: List[Dict[str, str]], **kwargs):
+        await asyncio.sleep(latency)
+        return _response(answer)
+
+    return acompletion
@@ -0,0 +1,266 @@
+"""
+Record and replay retrieval and LLM calls, so the RAG path can be benchmarked offline.
+
+Recording wraps a real RAG source and llm_router.completion/acompletion
+and writes every response, with its observed latency, to a JSONL fixture
+file. Replaying serves those responses back, sleeping for the recorded
+latency or one given on the command line.
+
+A replayed request that was never recorded, e.g. because a change to
+rag_chat.py altered the prompt, still gets a recorded response: one
+picked deterministically from the same kind. Such misses are counted,
+since they no longer replay the exact conversation. With no fixture file
+at all, responses are synthesized from benchmarks.mocks.
+"""
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import List, Dict, Any, Optional, Iterator, Callable
+
+from benchmarks.mocks import make_documents, filler
+from rag_source_base import RAGSourceBase, RetrievedDocument, to_document_dict
+
+
+def _key(*parts: Any) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()[:32]
+
+
+def _usage(record: Dict[str, Any]) -> Optional[Any]:
+    usage = record.get("usage")
+    if not usage:
+        return None
+    return SimpleNamespace(prompt_tokens=usage.get("prompt_tokens"),
+                           completion_tokens=usage.get("completion_tokens"),
+                           prompt_tokens_details=SimpleNamespace(cached_tokens=usage.get("cached_tokens")))
+
+
+def _record_usage(usage: Any) -> Optional[Dict[str, Any]]:
+    if usage is None:
+        return None
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "completion_tokens": getattr(usage, "completion_tokens", None),
+        "cached_tokens": getattr(details, "cached_tokens", None),
+    }
+
+
+class FixtureStore:
+    """Recorded responses by kind ("retrieval" or "completion") and request key, in a JSONL file."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path) if path else None
+        self._records: Dict[str, Dict[str, Dict[str, Any]]] = {"retrieval": {}, "completion": {}}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if self.path and self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self._records[record["kind"]][record["key"]] = record
+
+    def __len__(self) -> int:
+        return sum(len(records) for records in self._records.values())
+
+    def get(self, kind: str, key: str) -> Optional[Dict[str, Any]]:
+        """The recording for key; on a miss, a recording of the same kind picked by key, or None if there are none."""
+        records = self._records[kind]
+        with self._lock:
+            record = records.get(key)
+            if record is not None:
+                self.hits += 1
+                return record
+            self.misses += 1
+        if not records:
+            return None
+        keys = sorted(records)
+        return records[keys[int(key, 16) % len(keys)]]
+
+    def put(self, kind: str, key: str, record: Dict[str, Any]):
+        record = dict(record, kind=kind, key=key)
+        with self._lock:
+            self._records[kind][key] = record
+            if self.path:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def stats(self) -> Dict[str, int]:
+        return {"recorded": len(self), "hits": self.hits, "misses": self.misses}
+
+
+class RecordingRAGSource(RAGSourceBase):
+    """Passes retrievals through to a real source and records them."""
+
+    def __init__(self, source: RAGSourceBase, store: FixtureStore):
+        self.source = source
+        self.store = store
+
+    def retrieve_documents(self, question: str, num_results: int = 5) -> List[RetrievedDocument]:
+        start = time.perf_counter()
+        documents = [RetrievedDocument.from_any(doc) for doc in self.source.retrieve_documents(question, num_results)]
+        self.store.put("retrieval", _key(question, num_results), {
+            "latency": time.perf_counter() - start,
+            "documents": [to_document_dict(doc) for doc in documents],
+        })
+        return documents
+
+    def warm_up(self):
+        self.source.warm_up()
+
+    def get_required_env_vars(self) -> List[str]:
+        return self.source.get_required_env_vars()
+
+
+class ReplayRAGSource(RAGSourceBase):
+    """
+    Serves recorded retrievals.
+
+    latency: seconds to sleep per retrieval instead of the recorded latency
+    """
+
+    def __init__(self, store: FixtureStore, latency: Optional[float] = None, doc_chars: int = 600):
+        self.store = store
+        self.latency = latency
+        self.doc_chars = doc_chars
+
+    def _replay(self, question: str, num_results: int) -> Dict[str, Any]:
+        record = self.store.get("retrieval", _key(question, num_results))
+        if record is None:
+            return {"latency": 0.0, "documents": make_documents(question, num_results, self.doc_chars)}
+        return record
+
+    def _delay(self, record: Dict[str, Any]) -> float:
+        return record["latency"] if self.latency is None else self.latency
+
+    def retrieve_documents(self, question: str, num_results: int = 5) -> List[RetrievedDocument]:
+        record = self._replay(question, num_results)
+        time.sleep(self._delay(record))
+        # As the built-in sources return them
+        return [RetrievedDocument.from_any(doc) for doc in record["documents"][:num_results]]
+
+    async def aretrieve_documents(self, question: str, num_results: int = 5) -> List[RetrievedDocument]:
+        record = self._replay(question, num_results)
+        await asyncio.sleep(self._delay(record))
+        return [RetrievedDocument.from_any(doc) for doc in record["documents"][:num_results]]
+
+    def get_required_env_vars(self) -> List[str]:
+        return []
+
+
+def _completion_key(messages: List[Dict[str, str]]) -> str:
+    return _key([(message["role"], message["content"]) for message in messages])
+
+
+class RecordingCompletion:
+    """Wraps litellm's completion/acompletion and records every answer, streamed or not."""
+
+    def __init__(self, completion: Callable, acompletion: Callable, store: FixtureStore):
+        self.completion = completion
+        self.acompletion = acompletion
+        self.store = store
+
+    def _put(self, messages: List[Dict[str, str]], content: str, first_token: float,
+             total: float, usage: Any):
+        # Replay streams word by word, so the delay is spread over words rather than provider tokens
+        self.store.put("completion", _completion_key(messages), {
+            "latency": first_token,
+            "token_delay": (total - first_token) / max(1, content.count(" ")),
+            "content": content,
+            "usage": _record_usage(usage),
+        })
+
+    def _stream(self, messages: List[Dict[str, str]], response: Iterator[Any], start: float) -> Iterator[Any]:
+        parts, usage, first_token = [], None, None
+        for chunk in response:
+            usage = getattr(chunk, "usage", None) or usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                parts.append(chunk.choices[0].delta.content)
+            yield chunk
+        total = time.perf_counter() - start
+        self._put(messages, "".join(parts), first_token or total, total, usage)
+
+    def __call__(self, model: str, messages: List[Dict[str, str]], stream: bool = False, **kwargs):
+        start = time.perf_counter()
+        response = self.completion(model=model, messages=messages, stream=stream, **kwargs)
+        if stream:
+            return self._stream(messages, response, start)
+        total = time.perf_counter() - start
+        self._put(messages, response.choices[0].message.content or "", total, total,
+                  getattr(response, "usage", None))
+        return response
+
+    async def acall(self, model: str, messages: List[Dict[str, str]], **kwargs):
+        start = time.perf_counter()
+        response = await self.acompletion(model=model, messages=messages, **kwargs)
+        total = time.perf_counter() - start
+        self._put(messages, response.choices[0].message.content or "", total, total,
+                  getattr(response, "usage", None))
+        return response
+
+
+class ReplayCompletion:
+    """
+    Serves recorded answers in place of litellm's completion/acompletion.
+
+    latency: seconds to the first token instead of the recorded latency
+    token_delay: seconds between streamed tokens instead of the recorded delay
+    """
+
+    def __init__(self, store: FixtureStore, latency: Optional[float] = None,
+                 token_delay: Optional[float] = None, answer_words: int = 120):
+        self.store = store
+        self.latency = latency
+        self.token_delay = token_delay
+        self.answer_words = answer_words
+
+    def _replay(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        key = _completion_key(messages)
+        record = self.store.get("completion", key)
+        if record is None:
+            return {"latency": 0.0, "token_delay": 0.0, "usage": None,
+                    "content": filler(key, 0, self.answer_words * 6)}
+        return record
+
+    def _stream(self, record: Dict[str, Any]) -> Iterator[Any]:
+        token_delay = record["token_delay"] if self.token_delay is None else self.token_delay
+        words = record["content"].split(" ")
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(token_delay)
+            token = word if i == len(words) - 1 else word + " "
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))],
+                                  usage=None)
+        # As with stream_options={"include_usage": True}: a last chunk with usage and no choices
+        yield SimpleNamespace(choices=[], usage=_usage(record))
+
+    def _response(self, record: Dict[str, Any]) -> Any:
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=record["content"]))],
+                               usage=_usage(record))
+
+    def _delay(self, record: Dict[str, Any], stream: bool) -> float:
+        """Seconds to the first token when streaming, to the whole answer otherwise."""
+        latency = record["latency"] if self.latency is None else self.latency
+        if stream:
+            return latency
+        token_delay = record["token_delay"] if self.token_delay is None else self.token_delay
+        return latency + token_delay * record["content"].count(" ")
+
+    def __call__(self, model: str, messages: List[Dict[str, str]], stream: bool = False, **kwargs):
+        record = self._replay(messages)
+        time.sleep(self._delay(record, stream))
+        return self._stream(record) if stream else self._response(record)
+
+    async def acall(self, model: str, messages: List[Dict[str, str]], **kwargs):
+        record = self._replay(messages)
+        await asyncio.sleep(self._delay(record, False))
+        return self._response(record)
@@ -0,0 +1,194 @@
+import argparse
+import json
+import math
+import re
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import List, Dict, Iterable, Tuple, Any
+
+import numpy as np
+
+# Identifiers are kept whole (ERR_CONN_RESET, SKU-1234-AB, os.path.join) so
+# that a verbatim paste matches exactly; their parts are indexed as well.
+TOKEN_PATTERN = re.compile(r"\w+(?:[-.:/]\w+)*")
+PART_PATTERN = re.compile(r"[-.:/]")
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group()
+        tokens.append(token)
+        if PART_PATTERN.search(token):
+            tokens.extend(part for part in PART_PATTERN.split(token) if part)
+    return tokens
+
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index over the chunks of a LocalVectorIndex.
+
+    Postings are compact: while building, each term's row numbers and term
+    frequencies are appended to typed arrays; on disk (and once loaded) all
+    postings live in three flat arrays, sliced per term through an offsets
+    array. Rows match the vector index, so both return the same documents.
+
+    Files, next to the vector index:
+        bm25.json          parameters, document count and the vector index
+                           version the postings were built from
+        bm25_vocab.json    terms, in postings order
+        bm25_offsets.npy   where each term's postings start
+        bm25_rows.npy      row numbers of all postings
+        bm25_tfs.npy       term frequencies of all postings
+        bm25_lengths.npy   length in tokens of every row
+    """
+
+    META = "bm25.json"
+    VOCAB = "bm25_vocab.json"
+    OFFSETS = "bm25_offsets.npy"
+    ROWS = "bm25_rows.npy"
+    TFS = "bm25_tfs.npy"
+    LENGTHS = "bm25_lengths.npy"
+
+    def __init__(self, vocabulary: List[str], offsets: np.ndarray, rows: np.ndarray,
+                 tfs: np.ndarray, lengths: np.ndarray, n_docs: int,
+                 source_version: str = "", k1: float = 1.2, b: float = 0.75):
+        self.vocabulary = vocabulary
+        self.term_ids: Dict[str, int] = {term: i for i, term in enumerate(vocabulary)}
+        self.offsets = offsets
+        self.rows = rows
+        self.tfs = tfs
+        self.lengths = lengths
+        self.n_docs = n_docs
+        self.source_version = source_version
+        self.k1 = k1
+        self.b = b
+        live = lengths[lengths > 0]
+        self.avg_length = float(live.mean()) if len(live) else 0.0
+        # Per-row length normalization, the only part of BM25 that needs all rows
+        self._norms = (k1 * (1 - b + b * lengths / (self.avg_length or 1.0))).astype(np.float32)
+
+    @classmethod
+    def build(cls, records: Iterable[Tuple[int, Dict[str, Any]]], n_rows: int,
+              source_version: str = "", k1: float = 1.2, b: float = 0.75) -> "BM25Index":
+        """
+        Index (row, record) pairs, e.g. LocalVectorIndex.iter_live_records().
+
+        Args:
+            records: Rows to index; each record's 'text' is tokenized
+            n_rows: Total rows in the vector index, including deleted ones
+            source_version: Version of the vector index, to detect staleness
+        """
+        postings: Dict[str, Tuple[array, array]] = {}
+        lengths = np.zeros(n_rows, dtype=np.uint32)
+        n_docs = 0
+
+        for row, record in records:
+            counts = Counter(tokenize(record.get('text', '')))
+            lengths[row] = sum(counts.values())
+            n_docs += 1
+            for term, tf in counts.items():
+                if term not in postings:
+                    postings[term] = (array('I'), array('H'))
+                term_rows, term_tfs = postings[term]
+                term_rows.append(row)
+                term_tfs.append(min(tf, 0xFFFF))
+
+        vocabulary = sorted(postings)
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum([len(postings[term][0]) for term in vocabulary], out=offsets[1:])
+        rows = np.empty(offsets[-1], dtype=np.uint32)
+        tfs = np.empty(offsets[-1], dtype=np.uint16)
+        for i, term in enumerate(vocabulary):
+            term_rows, term_tfs = postings.pop(term)
+            rows[offsets[i]:offsets[i + 1]] = np.frombuffer(term_rows, dtype=np.uint32)
+            tfs[offsets[i]:offsets[i + 1]] = np.frombuffer(term_tfs, dtype=np.uint16)
+
+        return cls(vocabulary, offsets, rows, tfs, lengths, n_docs, source_version, k1, b)
+
+    @classmethod
+    def exists(cls, path: str) -> bool:
+        return (Path(path) / cls.META).exists()
+
+    def save(self, path: str):
+        index_path = Path(path)
+        np.save(index_path / self.OFFSETS, self.offsets)
+        np.save(index_path / self.ROWS, self.rows)
+        np.save(index_path / self.TFS, self.tfs)
+        np.save(index_path / self.LENGTHS, self.lengths)
+        (index_path / self.VOCAB).write_text(json.dumps(self.vocabulary, ensure_ascii=False))
+        # Written last: its presence means the other files are complete
+        (index_path / self.META).write_text(json.dumps({
+            "n_docs": self.n_docs,
+            "source_version": self.source_version,
+            "k1": self.k1,
+            "b": self.b,
+        }, indent=2))
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        index_path = Path(path)
+        meta = json.loads((index_path / cls.META).read_text())
+        return cls(
+            vocabulary=json.loads((index_path / cls.VOCAB).read_text()),
+            offsets=np.load(index_path / cls.OFFSETS),
+            rows=np.load(index_path / cls.ROWS, mmap_mode="r"),
+            tfs=np.load(index_path / cls.TFS, mmap_mode="r"),
+            lengths=np.load(index_path / cls.LENGTHS),
+            n_docs=meta["n_docs"],
+            source_version=meta["source_version"],
+            k1=meta["k1"],
+            b=meta["b"],
+        )
+
+    def idf(self, df: int) -> float:
+        return math.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """
+        Top-k rows by BM25 score.
+
+        Returns:
+            (row, score) pairs, best first; rows sharing no term with the
+            query are never returned
+        """
+        if k <= 0 or not self.n_docs:
+            return []
+
+        scores = np.zeros(len(self.lengths), dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            rows = self.rows[start:end]
+            tfs = self.tfs[start:end].astype(np.float32)
+            # Rows are unique within a posting list, so fancy-index += is safe
+            scores[rows] += self.idf(end - start) * tfs * (self.k1 + 1) / (tfs + self._norms[rows])
+
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+        k = min(k, len(matched))
+        top = matched[np.argpartition(scores[matched], -k)[-k:]]
+        top = top[np.argsort(-scores[top])]
+        return [(int(row), float(scores[row])) for row in top]
+
+
+def main():
+    from cli_interface import CLIInterface
+    from local_index import LocalVectorIndex
+
+    parser = argparse.ArgumentParser(description="Build a BM25 keyword index for a local vector index")
+    parser.add_argument("index_path", help="Directory of the local vector index")
+    args = parser.parse_args()
+
+    index = LocalVectorIndex(args.index_path)
+    bm25 = BM25Index.build(index.iter_live_records(), len(index), index.version)
+    bm25.save(args.index_path)
+    CLIInterface().print_success(f"Built BM25 index with {len(bm25.vocabulary)} terms over {bm25.n_docs} chunks")
+
+
+if __name__ == "__main__":
+    main()
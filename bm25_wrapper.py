@@ -0,0 +1,57 @@
+import os
+from typing import List, Optional
+from rag_source_base import RAGSourceBase, RetrievedDocument
+from local_index import LocalVectorIndex
+from local_index_wrapper import index_document
+from bm25_index import BM25Index
+
+
+class BM25Wrapper(RAGSourceBase):
+    """
+    Keyword retrieval over the chunks of a local index.
+
+    Finds exact identifiers (error codes, SKUs, function names) that vector
+    search tends to miss. The BM25 index is rebuilt on open whenever the
+    vector index has changed since it was last built.
+    """
+
+    def __init__(self, index_path: Optional[str] = None,
+                 index: Optional[LocalVectorIndex] = None):
+        if index is None:
+            index_path = index_path or os.environ.get("LOCAL_INDEX_PATH")
+            if not index_path:
+                raise ValueError("Missing required local index environment variables")
+            index = LocalVectorIndex(index_path)
+
+        # Share the vector index's records when both sources use the same index
+        self.index = index
+        self.bm25 = self._load_or_build()
+
+    def _load_or_build(self) -> BM25Index:
+        path = str(self.index.path)
+        if BM25Index.exists(path):
+            bm25 = BM25Index.load(path)
+            if bm25.source_version == self.index.version:
+                return bm25
+
+        bm25 = BM25Index.build(self.index.iter_live_records(), len(self.index),
+                               self.index.version)
+        bm25.save(path)
+        return bm25
+
+    def retrieve_documents(self, question: str, num_results: int = 5) -> List[RetrievedDocument]:
+        return [
+            self._to_document(row, score)
+            for row, score in self.bm25.search(question, num_results)
+        ]
+
+    def _to_document(self, row: int, score: float) -> RetrievedDocument:
+        return index_document(self.index, row, score)
+
+    def get_document_set_version(self) -> Optional[str]:
+        return self.index.version
+
+    def get_required_env_vars(self) -> List[str]:
+        return [
+            "LOCAL_INDEX_PATH"
+        ]
@@ -0,0 +1,312 @@
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+from cli_interface import Config
+from rag_source_base import RAGSourceBase, RAGSourceError, RetrievalResult
+from fanout_rag_source import FanoutRAGSource
+
+
+class LRUCacheBackend:
+    """Bounded in-memory store that evicts the least recently used entry."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, value: Any, expires_at: float):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SqliteCacheBackend:
+    """On-disk store that survives restarts. Values are pickled."""
+
+    def __init__(self, path: str, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS retrievals (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS retrievals_last_access ON retrievals (last_access);
+        """)
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM retrievals WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE retrievals SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+
+        try:
+            return row[1], pickle.loads(row[0])
+        except Exception:
+            self.delete(key)
+            return None
+
+    def set(self, key: str, value: Any, expires_at: float):
+        blob = pickle.dumps(value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO retrievals (key, value, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, blob, expires_at, time.time())
+            )
+            self._conn.execute(
+                "DELETE FROM retrievals WHERE expires_at < ?", (time.time(),))
+            self._conn.execute(
+                "DELETE FROM retrievals WHERE key NOT IN "
+                "(SELECT key FROM retrievals ORDER BY last_access DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM retrievals WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM retrievals")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM retrievals").fetchone()[0]
+
+
+class CachingRAGSource(RAGSourceBase):
+    """
+    Memoizes another source's results by (question, num_results).
+
+    Concurrent identical queries are coalesced so that only one of them
+    reaches the wrapped source; the others wait for and share its result.
+    Failed retrievals raise and are never cached. Empty results are not
+    cached either: a source that cannot report a document set version gives
+    no signal when documents are added, so "nothing relevant" would
+    otherwise stick for the whole TTL. Nor are partial results from a
+    FanoutRAGSource in which some source timed out or failed.
+    """
+
+    def __init__(self, source: RAGSourceBase, backend=None, ttl_seconds: float = 300):
+        self.source = source
+        self.backend = backend if backend is not None else LRUCacheBackend()
+        self.ttl_seconds = ttl_seconds
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.upstream_calls = 0
+        self.prefetched = 0
+
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._source_version = source.get_document_set_version()
+
+    @staticmethod
+    def _key(question: str, num_results: int) -> str:
+        return f"{num_results}\0{question}"
+
+    def _check_source_version(self):
+        version = self.source.get_document_set_version()
+        if version != self._source_version:
+            self._source_version = version
+            self.backend.clear()
+
+    def _fetch(self, question: str, num_results: int) -> Tuple[List[Dict[str, Any]], bool]:
+        """Query the wrapped source. The flag says whether every part of the result arrived."""
+        if isinstance(self.source, FanoutRAGSource):
+            documents, report = self.source.retrieve_with_report(question, num_results)
+            return documents, not report.partial
+        return self.source.retrieve_documents(question, num_results), True
+
+    def _cached(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        entry = self.backend.get(key)
+        if entry is not None:
+            expires_at, documents = entry
+            if expires_at > time.time():
+                return documents
+            self.backend.delete(key)
+        return None
+
+    def _load(self, key: str, question: str, num_results: int, future: Future) -> List[Dict[str, Any]]:
+        """Fetch as the leader of an in-flight key, resolving the future its followers wait on."""
+        try:
+            documents, complete = self._fetch(question, num_results)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(documents)
+            if documents and complete:
+                self.backend.set(key, documents, time.time() + self.ttl_seconds)
+            return documents
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def retrieve_documents(self, question: str, num_results: int = 5) -> List[Dict[str, Any]]:
+        self._check_source_version()
+        key = self._key(question, num_results)
+
+        documents = self._cached(key)
+        if documents is not None:
+            with self._lock:
+                self.hits += 1
+            return list(documents)
+
+        with self._lock:
+            self.misses += 1
+            future = self._inflight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._inflight[key] = future
+                self.upstream_calls += 1
+            else:
+                self.coalesced += 1
+
+        if not is_leader:
+            try:
+                return list(future.result())
+            except Exception:
+                # A failed prefetch is not this query's error: try again
+                if not getattr(future, "prefetch", False):
+                    raise
+                return self.retrieve_documents(question, num_results)
+        return list(self._load(key, question, num_results, future))
+
+    def prefetch(self, question: str, num_results: int = 5) -> bool:
+        """
+        Fetch and cache a result before anyone asks for it, e.g. for a likely follow-up question.
+
+        Prefetches count as neither hits nor misses. A query that arrives
+        while one is in flight waits for it rather than calling the source
+        again; if the prefetch fails, that query retries on its own.
+
+        Returns:
+            False if the result was already cached or in flight, so nothing was fetched
+        """
+        self._check_source_version()
+        key = self._key(question, num_results)
+        if self._cached(key) is not None:
+            return False
+
+        with self._lock:
+            if key in self._inflight:
+                return False
+            future = Future()
+            future.prefetch = True
+            self._inflight[key] = future
+            self.prefetched += 1
+
+        try:
+            self._load(key, question, num_results, future)
+        except Exception:
+            pass
+        return True
+
+    def retrieve_documents_batch(self, questions: List[str], num_results: int = 5,
+                                 max_workers: int = Config.RETRIEVAL_BATCH_MAX_WORKERS) -> List[RetrievalResult]:
+        """
+        Serves cached questions from the cache and sends the rest, each
+        distinct question once, to the wrapped source as a single batch.
+        """
+        if isinstance(self.source, FanoutRAGSource):
+            # Only retrieve_documents can tell a partial fan-out result, which must not be cached
+            return super().retrieve_documents_batch(questions, num_results, max_workers)
+
+        self._check_source_version()
+        results: List[Optional[RetrievalResult]] = [None] * len(questions)
+        missed: Dict[str, List[int]] = {}
+        now = time.time()
+        for i, question in enumerate(questions):
+            entry = self.backend.get(self._key(question, num_results))
+            if entry is not None and entry[0] > now:
+                results[i] = list(entry[1])
+            else:
+                missed.setdefault(question, []).append(i)
+
+        misses = sum(len(positions) for positions in missed.values())
+        with self._lock:
+            self.hits += len(questions) - misses
+            self.misses += misses
+            self.coalesced += misses - len(missed)
+            self.upstream_calls += len(missed)
+
+        if missed:
+            unique = list(missed)
+            for question, result in zip(unique, self.source.retrieve_documents_batch(
+                    unique, num_results, max_workers)):
+                if result and not isinstance(result, RAGSourceError):
+                    self.backend.set(self._key(question, num_results), result,
+                                     time.time() + self.ttl_seconds)
+                for i in missed[question]:
+                    results[i] = result if isinstance(result, RAGSourceError) else list(result)
+        return results
+
+    def invalidate(self):
+        """Drop every cached result."""
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.backend),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "upstream_calls": self.upstream_calls,
+                "upstream_calls_saved": self.hits + self.coalesced,
+                "prefetched": self.prefetched,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def warm_up(self):
+        self.source.warm_up()
+
+    def get_document_set_version(self) -> Optional[str]:
+        return self.source.get_document_set_version()
+
+    def get_required_env_vars(self) -> List[str]:
+        return self.source.get_required_env_vars()
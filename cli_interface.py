@@ -1,8 +1,10 @@
+import atexit
 import os
+import queue
 import sys
 import time
 import threading
-from typing import Optional, List, Any
+from typing import Optional, List, Any, Iterable, TextIO, Tuple
 from pathlib import Path
 
 
@@ -32,43 +34,181 @@ class Icons:
     STAR = '✭'
 
 
-class LoadingAnimation:
-    def __init__(self, message: str, color: str = Colors.CYAN):
-        self.message = message
-        self.color = color
-        self.is_running = False
-        self.thread = None
-        self.frames = ['⠋', '⠙', '⠹', '⠸', '⠼', '⠴', '⠦', '⠧', '⠇', '⠏']
-        self.current_frame = 0
-
-    def _animate(self):
-        while self.is_running:
-            frame = self.frames[self.current_frame]
-            sys.stdout.write(
-                f'\r{self.color}{frame} {self.message}{Colors.RESET}')
-            sys.stdout.flush()
-            self.current_frame = (self.current_frame + 1) % len(self.frames)
-            time.sleep(0.1)
-
-    def start(self):
-        self.is_running = True
-        self.thread = threading.Thread(target=self._animate)
-        self.thread.daemon = True
-        self.thread.start()
-
-    def stop(self):
-        self.is_running = False
-        if self.thread:
-            self.thread.join()
-        sys.stdout.write('\r' + ' ' * (len(self.message) + 4) + '\r')
-        sys.stdout.flush()
+class TerminalRenderer:
+    """
+    The one thread that writes to the terminal.
+
+    CLIInterface queues its output here instead of printing it, so callers
+    never block on the terminal and a spinner never races a print. Text is
+    coalesced: what arrives within FLUSH_INTERVAL of the last write goes out
+    in one write and one flush, so a streamed answer costs a syscall per
+    batch of tokens rather than per token. Starting or stopping a spinner
+    takes effect as soon as the event is dequeued.
+
+    Output is written to the sys.stdout of the thread that queued it, as
+    it was at that moment, so contextlib.redirect_stdout still works.
+    """
+
+    FRAMES = ['⠋', '⠙', '⠹', '⠸', '⠼', '⠴', '⠦', '⠧', '⠇', '⠏']
+    FRAME_INTERVAL = 0.1
+    FLUSH_INTERVAL = 0.025
+    FLUSH_TIMEOUT = 2.0
+
+    WRITE, SPIN, STOP, FLUSH = range(4)
+
+    def __init__(self):
+        self._events: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.writes = 0
+
+        # Owned by the render thread
+        self._pending: List[str] = []
+        self._pending_stream: Optional[TextIO] = None
+        self._deadline = 0.0
+        self._last_write = 0.0
+        self._spinner: Optional[Tuple[str, str, TextIO]] = None
+        self._spinner_shown = False
+        self._frame = 0
+        self._next_frame = 0.0
+
+    def _put(self, kind: int, payload: Any = None, stream: Optional[TextIO] = None):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="cli-render", daemon=True)
+                    self._thread.start()
+                    atexit.register(self.flush, 1.0)
+        self._events.put((kind, payload, stream or sys.stdout))
+
+    def write(self, text: str, stream: Optional[TextIO] = None):
+        self._put(self.WRITE, text, stream)
+
+    def start_spinner(self, message: str, color: str = Colors.CYAN, stream: Optional[TextIO] = None):
+        self._put(self.SPIN, (message, color), stream)
+
+    def stop_spinner(self):
+        self._put(self.STOP)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything queued so far is written. Returns False on timeout."""
+        if self._thread is None or threading.current_thread() is self._thread:
+            return True
+        if not self._thread.is_alive():
+            return False
+        done = threading.Event()
+        self._put(self.FLUSH, done)
+        return done.wait(timeout)
+
+    def _emit(self, stream: TextIO, text: str):
+        try:
+            stream.write(text)
+            stream.flush()
+        except (OSError, ValueError):
+            # The stream was closed or redirected away; there is no one to show it to
+            pass
+        self.writes += 1
+        self._last_write = time.monotonic()
+
+    def _write_pending(self):
+        if self._pending:
+            self._emit(self._pending_stream, "".join(self._pending))
+            self._pending = []
+
+    def _add_text(self, text: str, stream: TextIO):
+        if self._pending and stream is not self._pending_stream:
+            self._write_pending()
+        if not self._pending:
+            self._deadline = self._last_write + self.FLUSH_INTERVAL
+        self._pending.append(text)
+        self._pending_stream = stream
+
+    def _clear_spinner(self):
+        if self._spinner_shown:
+            message, _, stream = self._spinner
+            self._add_text('\r' + ' ' * (len(message) + 4) + '\r', stream)
+            self._spinner_shown = False
+
+    def _draw_spinner(self):
+        message, color, stream = self._spinner
+        self._emit(stream, f'\r{color}{self.FRAMES[self._frame]} {message}{Colors.RESET}')
+        self._spinner_shown = True
+        self._frame = (self._frame + 1) % len(self.FRAMES)
+        self._next_frame = time.monotonic() + self.FRAME_INTERVAL
+
+    def _timeout(self) -> Optional[float]:
+        if self._pending:
+            return max(0.0, self._deadline - time.monotonic())
+        if self._spinner:
+            return max(0.0, self._next_frame - time.monotonic())
+        return None
+
+    def _run(self):
+        while True:
+            try:
+                kind, payload, stream = self._events.get(timeout=self._timeout())
+            except queue.Empty:
+                kind, payload, stream = None, None, None
+
+            try:
+                self._handle(kind, payload, stream)
+            except Exception:
+                # Drop what could not be written rather than the thread: every
+                # later write, and every flush() before input(), depends on it
+                self._pending, self._spinner, self._spinner_shown = [], None, False
+                if kind == self.FLUSH:
+                    payload.set()
+
+    def _handle(self, kind: Optional[int], payload: Any, stream: Optional[TextIO]):
+        if kind == self.WRITE:
+            self._clear_spinner()
+            self._add_text(payload, stream)
+        elif kind == self.SPIN:
+            self._clear_spinner()
+            self._write_pending()
+            message, color = payload
+            self._spinner, self._frame = (message, color, stream), 0
+            self._draw_spinner()
+        elif kind == self.STOP:
+            self._clear_spinner()
+            self._spinner = None
+            self._write_pending()
+        elif kind == self.FLUSH:
+            self._write_pending()
+            payload.set()
+
+        now = time.monotonic()
+        if self._pending and now >= self._deadline:
+            self._write_pending()
+        if self._spinner and not self._pending and now >= self._next_frame:
+            self._draw_spinner()
+
+
+_renderer: Optional[TerminalRenderer] = None
+_renderer_lock = threading.Lock()
+
+
+def terminal_renderer() -> TerminalRenderer:
+    """The process's renderer, shared by every CLIInterface so their output stays in order."""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = TerminalRenderer()
+        return _renderer
 
 
 class CLIInterface:
-    def __init__(self, app_name: str = "RAG Chat"):
+    def __init__(self, app_name: str = "RAG Chat", renderer: Optional[TerminalRenderer] = None):
         self.app_name = app_name
         self.terminal_width = self._get_terminal_width()
-        self.current_loading = None
+        self.renderer = renderer or terminal_renderer()
+
+    def _print(self, *values: Any, sep: str = ' ', end: str = '\n'):
+        self.renderer.write(sep.join(str(value) for value in values) + end)
+
+    def flush(self):
+        """Wait until everything printed so far is on the terminal, or FLUSH_TIMEOUT at most."""
+        self.renderer.flush(TerminalRenderer.FLUSH_TIMEOUT)
 
     def _get_terminal_width(self) -> int:
         try:
@@ -77,6 +217,7 @@ class CLIInterface:
             return 80
 
     def clear_screen(self):
+        self.flush()
         os.system('cls' if os.name == 'nt' else 'clear')
 
     def print_welcome_banner(self):
@@ -84,163 +225,332 @@ class CLIInterface:
         padding = 4
         box_width = len(banner_text) + (padding * 2)
 
-        print(f"\n{Colors.CYAN}{'═' * box_width}{Colors.RESET}")
-        print(f"{Colors.CYAN}║{Colors.RESET}{Colors.YELLOW}{' ' * padding}{banner_text}{' ' * padding}{Colors.CYAN}║{Colors.RESET}")
-        print(f"{Colors.CYAN}{'═' * box_width}{Colors.RESET}\n")
+        self._print(f"\n{Colors.CYAN}{'═' * box_width}{Colors.RESET}")
+        self._print(f"{Colors.CYAN}║{Colors.RESET}{Colors.YELLOW}{' ' * padding}{banner_text}{' ' * padding}{Colors.CYAN}║{Colors.RESET}")
+        self._print(f"{Colors.CYAN}{'═' * box_width}{Colors.RESET}\n")
 
     def print_success(self, message: str):
-        print(f"{Colors.GREEN}{Icons.CHECK}{Colors.RESET} {message}")
+        self._print(f"{Colors.GREEN}{Icons.CHECK}{Colors.RESET} {message}")
 
     def print_error(self, message: str):
-        print(f"{Colors.RED}{Icons.CROSS}{Colors.RESET} {message}")
+        self._print(f"{Colors.RED}{Icons.CROSS}{Colors.RESET} {message}")
 
     def print_info(self, message: str):
-        print(f"{Colors.CYAN}{Icons.DOT}{Colors.RESET} {message}")
+        self._print(f"{Colors.CYAN}{Icons.DOT}{Colors.RESET} {message}")
 
     def print_warning(self, message: str):
-        print(f"{Colors.YELLOW}⚠{Colors.RESET}  {message}")
+        self._print(f"{Colors.YELLOW}⚠{Colors.RESET}  {message}")
 
     def print_section_header(self, title: str):
-        print(f"\n{Colors.BLUE}{Colors.BOLD}{title}{Colors.RESET}")
-        print(f"{Colors.GRAY}{'─' * len(title)}{Colors.RESET}")
+        self._print(f"\n{Colors.BLUE}{Colors.BOLD}{title}{Colors.RESET}")
+        self._print(f"{Colors.GRAY}{'─' * len(title)}{Colors.RESET}")
 
     def print_box(self, title: str, items: List[str], color: str = Colors.CYAN):
         max_length = max(len(title), max(len(item)
                          for item in items if items)) + 4
 
-        print(f"\n{color}╭{'─' * (max_length + 2)}╮{Colors.RESET}")
-        print(f"{color}│{Colors.RESET} {Colors.BOLD}{title.ljust(max_length)}{Colors.RESET} {color}│{Colors.RESET}")
-        print(f"{color}├{'─' * (max_length + 2)}┤{Colors.RESET}")
+        self._print(f"\n{color}╭{'─' * (max_length + 2)}╮{Colors.RESET}")
+        self._print(f"{color}│{Colors.RESET} {Colors.BOLD}{title.ljust(max_length)}{Colors.RESET} {color}│{Colors.RESET}")
+        self._print(f"{color}├{'─' * (max_length + 2)}┤{Colors.RESET}")
 
         for item in items:
-            print(
+            self._print(
                 f"{color}│{Colors.RESET} {item.ljust(max_length)} {color}│{Colors.RESET}")
 
-        print(f"{color}╰{'─' * (max_length + 2)}╯{Colors.RESET}")
+        self._print(f"{color}╰{'─' * (max_length + 2)}╯{Colors.RESET}")
 
     def print_status_box(self, statuses: List[tuple]):
         max_length = max(len(status[1]) for status in statuses) + 10
 
-        print(f"\n{Colors.GRAY}┌{'─' * (max_length + 2)}┐{Colors.RESET}")
+        self._print(f"\n{Colors.GRAY}┌{'─' * (max_length + 2)}┐{Colors.RESET}")
 
         for success, message in statuses:
             icon = f"{Colors.GREEN}{Icons.CHECK}{Colors.RESET}" if success else f"{Colors.RED}{Icons.CROSS}{Colors.RESET}"
-            print(
+            self._print(
                 f"{Colors.GRAY}│{Colors.RESET} {icon} {message.ljust(max_length - 2)} {Colors.GRAY}│{Colors.RESET}")
 
-        print(f"{Colors.GRAY}└{'─' * (max_length + 2)}┘{Colors.RESET}")
+        self._print(f"{Colors.GRAY}└{'─' * (max_length + 2)}┘{Colors.RESET}")
 
     def get_user_input(self, prompt: str = "Your question") -> str:
-        print(
+        self._print(
             f"\n{Colors.CYAN}{Icons.ARROW}{Colors.RESET} {Colors.BOLD}{prompt}:{Colors.RESET} ", end='')
+        self.flush()
         return input().strip()
 
     def print_separator(self, char: str = "─", color: str = Colors.GRAY):
-        print(f"{color}{char * self.terminal_width}{Colors.RESET}")
+        self._print(f"{color}{char * self.terminal_width}{Colors.RESET}")
 
     def print_thinking(self):
-        print(f"\n{Colors.YELLOW}{Icons.DOT} Thinking...{Colors.RESET}")
+        self._print(f"\n{Colors.YELLOW}{Icons.DOT} Thinking...{Colors.RESET}")
 
     def start_loading(self, message: str):
-        self.current_loading = LoadingAnimation(message)
-        self.current_loading.start()
+        self.renderer.start_spinner(message)
 
     def stop_loading(self):
-        if self.current_loading:
-            self.current_loading.stop()
-            self.current_loading = None
+        self.renderer.stop_spinner()
 
     def print_retrieving(self, query: str):
-        print(
+        self._print(
             f"\n{Colors.CYAN}{Icons.DOT} Retrieving documents for: {Colors.WHITE}\"{query}\"{Colors.RESET}")
         self.start_loading("Searching knowledge base...")
 
     def print_documents_with_snippets(self, documents: List[Any]):
+        # Imported here: rag_source_base reads Config from this module
+        from rag_source_base import RetrievedDocument
         self.stop_loading()
 
         if not documents:
-            print(f"{Colors.YELLOW}{Icons.DOT} No documents found{Colors.RESET}")
+            self._print(f"{Colors.YELLOW}{Icons.DOT} No documents found{Colors.RESET}")
             return
 
         count = len(documents)
-        print(f"\n{Colors.GREEN}{Icons.CHECK} Found {count} relevant document{'s' if count != 1 else ''}{Colors.RESET}")
+        self._print(f"\n{Colors.GREEN}{Icons.CHECK} Found {count} relevant document{'s' if count != 1 else ''}{Colors.RESET}")
 
-        print(f"\n{Colors.GRAY}{'─' * 60}{Colors.RESET}")
+        self._print(f"\n{Colors.GRAY}{'─' * 60}{Colors.RESET}")
 
         for i, doc in enumerate(documents[:5], 1):
-            snippet = ""
-            source = ""
-            score = ""
-
-            if hasattr(doc, 'text') and doc.text:
-                snippet = doc.text[:120].strip()
-                if len(doc.text) > 120:
-                    snippet += "..."
-            elif isinstance(doc, dict) and 'text' in doc:
-                snippet = doc['text'][:120].strip()
-                if len(doc['text']) > 120:
-                    snippet += "..."
-
-            if hasattr(doc, 'source_display_name') and doc.source_display_name:
-                source = doc.source_display_name
-            elif isinstance(doc, dict) and 'source_display_name' in doc:
-                source = doc['source_display_name']
-
-            if hasattr(doc, 'relevancy') and doc.relevancy:
-                score = f"{doc.relevancy:.2f}"
-            elif isinstance(doc, dict) and 'relevancy' in doc:
-                score = f"{doc['relevancy']:.2f}"
-
-            print(f"{Colors.BLUE}{Colors.BOLD}[{i}]{Colors.RESET} ", end='')
+            doc = RetrievedDocument.from_any(doc)
+            # The snippet only needs the start of the text
+            text = doc.text_prefix(121)
+            snippet = text[:120].strip()
+            if len(text) > 120:
+                snippet += "..."
+            source = doc.source_display_name
+            score = f"{doc.relevancy:.2f}" if doc.relevancy is not None else ""
+
+            self._print(f"{Colors.BLUE}{Colors.BOLD}[{i}]{Colors.RESET} ", end='')
 
             if source:
-                print(f"{Colors.GREEN}{source}{Colors.RESET}", end='')
+                self._print(f"{Colors.GREEN}{source}{Colors.RESET}", end='')
 
             if score:
-                print(f" {Colors.GRAY}(relevance: {score}){Colors.RESET}")
+                self._print(f" {Colors.GRAY}(relevance: {score}){Colors.RESET}")
             else:
-                print()
+                self._print()
 
             if snippet:
-                print(f"    {Colors.DIM}{snippet}{Colors.RESET}")
+                self._print(f"    {Colors.DIM}{snippet}{Colors.RESET}")
 
             if i < min(5, count):
-                print(f"{Colors.GRAY}{'─' * 60}{Colors.RESET}")
+                self._print(f"{Colors.GRAY}{'─' * 60}{Colors.RESET}")
 
-        print()
+        self._print()
 
     def print_generating(self):
         self.start_loading("Generating answer...")
 
-    def print_answer(self, answer: str):
+    def _print_answer_header(self):
         self.stop_loading()
-        print(f"\n{Colors.GREEN}{Colors.BOLD}Answer:{Colors.RESET}")
-        print(f"{Colors.GRAY}{'─' * 50}{Colors.RESET}")
-        print(f"{answer}")
-        print(f"{Colors.GRAY}{'─' * 50}{Colors.RESET}")
+        self._print(f"\n{Colors.GREEN}{Colors.BOLD}Answer:{Colors.RESET}")
+        self._print(f"{Colors.GRAY}{'─' * 50}{Colors.RESET}")
+
+    def print_answer(self, answer: str):
+        self._print_answer_header()
+        self._print(f"{answer}")
+        self._print(f"{Colors.GRAY}{'─' * 50}{Colors.RESET}")
+
+    def print_answer_stream(self, tokens: Iterable[str]) -> str:
+        """Render answer tokens as they arrive and return the full answer."""
+        parts = []
+
+        for token in tokens:
+            if not parts:
+                self._print_answer_header()
+            parts.append(token)
+            self.renderer.write(token)
+
+        if not parts:
+            self._print_answer_header()
+
+        self._print()
+        self._print(f"{Colors.GRAY}{'─' * 50}{Colors.RESET}")
+        return "".join(parts)
+
+    def print_latency(self, time_to_first_token: float, total: float):
+        self._print(
+            f"{Colors.GRAY}First token: {time_to_first_token:.2f}s {Icons.DOT} Total: {total:.2f}s{Colors.RESET}")
+
+    def print_stats(self, title: str, stats: dict):
+        items = []
+        for name, value in stats.items():
+            label = name.replace('_', ' ').capitalize()
+            if isinstance(value, float):
+                value = f"{value:.1%}" if name.endswith('rate') else f"{value:.2f}"
+            items.append(f"{label}: {value}")
+        self.print_box(title, items, color=Colors.GRAY)
+
+    def print_percentiles(self, title: str, summary: dict):
+        if not summary:
+            self.print_info("No turns recorded yet")
+            return
+
+        self.print_section_header(title)
+        self._print(f"{Colors.GRAY}{'metric':<22}{'count':>8}{'p50':>12}{'p95':>12}{'p99':>12}{Colors.RESET}")
+        for metric, values in summary.items():
+            is_size = metric.endswith('tokens') or metric.endswith('chars')
+            cells = [
+                f"{values[p]:.0f}" if is_size else f"{values[p] * 1000:.1f} ms"
+                for p in ('p50', 'p95', 'p99')
+            ]
+            self._print(f"{metric:<22}{values['count']:>8}{cells[0]:>12}{cells[1]:>12}{cells[2]:>12}")
+
+    def print_batch_progress(self, answered: int, failed: int):
+        self.renderer.write(
+            f"\r{Colors.CYAN}{Icons.DOT}{Colors.RESET} Answered {answered}"
+            f"{f' {Colors.RED}({failed} failed){Colors.RESET}' if failed else ''}")
+
+    def end_batch_progress(self):
+        self._print()
 
     def print_exit_instructions(self):
-        print(
+        self._print(
             f"\n{Colors.GRAY}Type 'quit' or 'exit' to end the session{Colors.RESET}")
-        print(f"{Colors.GRAY}Press Ctrl+C to cancel current operation{Colors.RESET}")
+        self._print(f"{Colors.GRAY}Press Ctrl+C to cancel current operation{Colors.RESET}")
 
     def print_goodbye(self):
-        print(
+        self._print(
             f"\n{Colors.CYAN}{Icons.STAR} Thank you for using {self.app_name}!{Colors.RESET}")
-        print(f"{Colors.GRAY}Goodbye!{Colors.RESET}\n")
+        self._print(f"{Colors.GRAY}Goodbye!{Colors.RESET}\n")
 
     def print_environment_error(self, missing_vars: List[str]):
         self.print_error("Missing required environment variables")
         self.print_box("Required Environment Variables", [
             f"{Colors.RED}{Icons.CROSS}{Colors.RESET} {var}" for var in missing_vars
         ], color=Colors.RED)
-        print(
+        self._print(
             f"\n{Colors.YELLOW}Please set these variables in your .env file{Colors.RESET}")
 
 
+class QuietInterface(CLIInterface):
+    """
+    A CLIInterface that prints nothing during a turn.
+
+    Used when RAGChat answers many questions at once, e.g. behind the HTTP
+    server, where spinners and document previews would interleave.
+    """
+
+    def start_loading(self, message: str):
+        pass
+
+    def stop_loading(self):
+        pass
+
+    def print_info(self, message: str):
+        pass
+
+    def print_retrieving(self, query: str):
+        pass
+
+    def print_documents_with_snippets(self, documents: List[Any]):
+        pass
+
+    def print_generating(self):
+        pass
+
+
 class Config:
     APP_NAME = "RAG Chat"
     DEFAULT_NUM_RESULTS = 5
+    LLM_MODEL = "openai/gpt-4o-mini"
+    LLM_FALLBACK_MODELS = []  # tried in order when LLM_MODEL fails, e.g. ["anthropic/claude-3-5-haiku-latest"]
+    LLM_TIMEOUT_SECONDS = 30  # to the first token when streaming, to the whole answer otherwise
+    LLM_MODEL_TIMEOUTS = {}  # per-model overrides of LLM_TIMEOUT_SECONDS
+    LLM_HEDGE_AFTER_SECONDS = None  # e.g. 2.0 sends a second request if nothing has arrived by then
+    LLM_ROUTER_MAX_WORKERS = 64
+    STREAM_ANSWERS = True
+    WARM_UP_IN_BACKGROUND = True  # load litellm and the source client while the banner shows
+    EMBEDDING_MODEL = "openai/text-embedding-3-small"
+    EMBEDDING_CACHE_ENABLED = True  # shared by ingestion and local retrieval, across processes
+    EMBEDDING_CACHE_PATH = ".rag_cache/embeddings"
+    EMBEDDING_CACHE_QUANTIZE = False  # int8 vectors: a quarter of the size, slightly less precise
+    EMBEDDING_CACHE_INDEX_ENTRIES = 100_000  # keys whose entry is remembered in memory
+
+    LOCAL_INDEX_NPROBE = 16
+
+    VECTORIZE_HOST = os.environ.get("VECTORIZE_HOST", "https://api.vectorize.io/v1")
+    VECTORIZE_POOL_SIZE = 32  # connections kept alive to the API
+    VECTORIZE_CONNECT_TIMEOUT = 3.0
+    VECTORIZE_READ_TIMEOUT = 10.0
+    VECTORIZE_MAX_RETRIES = 2
+    VECTORIZE_BACKOFF_BASE_SECONDS = 0.2
+    VECTORIZE_BACKOFF_MAX_SECONDS = 2.0
+    CIRCUIT_FAILURE_THRESHOLD = 5  # consecutive failed requests before failing fast
+    CIRCUIT_RESET_SECONDS = 30
+
+    RETRIEVAL_BATCH_MAX_WORKERS = 32  # questions of a retrieve_documents_batch() call in flight at once
+    RETRIEVAL_BATCH_EMBED_SIZE = 256  # questions per embedding request when a local source retrieves a batch
+
+    FANOUT_SOURCES = ["vectorize", "local"]
+    FANOUT_DEADLINE_SECONDS = 1.0
+    FANOUT_SOURCE_DEADLINES = {}  # e.g. {"local": 0.2} overrides the default per source
+    FANOUT_RRF_K = 60
+    FANOUT_MAX_WORKERS = 32
+
+    HYBRID_VECTOR_SOURCE = "vectorize"  # "vectorize" or "local"
+    HYBRID_RRF_K = 60
+    HYBRID_CANDIDATES_PER_SOURCE = 20
+    HYBRID_MAX_WORKERS = 32
+
+    RERANK_ENABLED = False
+    RERANK_SCORER = "cross-encoder"  # "cross-encoder" or "llm"
+    RERANK_CROSS_ENCODER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_LLM_MODEL = LLM_MODEL
+    RERANK_CANDIDATES = 50
+    RERANK_BATCH_SIZE = 16
+    RERANK_MAX_PASSAGE_CHARS = 1000
+    RERANK_TIME_BUDGET_SECONDS = 1.5
+    RERANK_MAX_WORKERS = 4
+
+    # "prefix_cache": system prompt, then documents sorted by ID, then history, question last,
+    # so providers can reuse the cached prompt prefix. "classic": context and question together.
+    PROMPT_LAYOUT = "prefix_cache"
+
+    CONTEXT_MAX_TOKENS = 3000
+    CONTEXT_MIN_CHUNK_TOKENS = 64
+    CONTEXT_DEDUPE_THRESHOLD = 0.85
+
+    CONVERSATION_MAX_HISTORY_TOKENS = 1500  # recent turns kept verbatim
+    CONVERSATION_SUMMARY_MAX_TOKENS = 300  # older turns, summarized
+    CONVERSATION_REWRITE_TURNS = 3  # turns shown to the query rewriter
+    CONVERSATION_MAX_SESSIONS = 1000
+    CONVERSATION_TTL_SECONDS = 60 * 60
+    CONVERSATION_SUMMARY_WORKERS = 2
+
+    PREFETCH_ENABLED = False  # retrieve likely next queries in the background; needs the retrieval cache
+    PREFETCH_MAX_CANDIDATES = 4  # speculative retrievals pending per session
+    PREFETCH_MAX_FOLLOW_UPS = 3  # follow-up questions taken from each answer
+    PREFETCH_MAX_WORKERS = 4
+
+    BATCH_CONCURRENCY = 16
+
+    SERVER_HOST = "127.0.0.1"
+    SERVER_PORT = 8000
+    SERVER_MAX_CONCURRENCY = 32
+    SERVER_KEEPALIVE_TIMEOUT = 30
+    SERVER_SHUTDOWN_TIMEOUT = 30
+
+    TRACE_LOG_ENABLED = True
+    TRACE_LOG_PATH = ".rag_cache/traces.jsonl"
+    STATS_WINDOW = 1000
+
+    INGEST_CHUNK_SIZE = 1500
+    INGEST_CHUNK_OVERLAP = 200
+    INGEST_BATCH_SIZE = 256
+    INGEST_CONCURRENCY = 4
+    INGEST_EXTENSIONS = [".txt", ".md", ".rst", ".html", ".csv", ".json", ".py"]
+
+    RETRIEVAL_CACHE_ENABLED = True
+    RETRIEVAL_CACHE_BACKEND = "memory"  # "memory" or "sqlite"
+    RETRIEVAL_CACHE_PATH = ".rag_cache/retrievals.sqlite"
+    RETRIEVAL_CACHE_MAX_ENTRIES = 1024
+    RETRIEVAL_CACHE_TTL_SECONDS = 5 * 60
+
+    ANSWER_CACHE_ENABLED = False  # Opt-in: generated answers are written to disk
+    ANSWER_CACHE_PATH = ".rag_cache/answers.sqlite"
+    ANSWER_CACHE_MAX_ENTRIES = 1000
+    ANSWER_CACHE_TTL_SECONDS = 24 * 60 * 60
+    ANSWER_CACHE_SEMANTIC = False
+    ANSWER_CACHE_SIMILARITY_THRESHOLD = 0.95
     ENV_VARS = [
         "OPENAI_API_KEY",
         "VECTORIZE_PIPELINE_ACCESS_TOKEN",
@@ -255,8 +565,20 @@ class Config:
         "If the context doesn't contain relevant information, say so."
     )
 
+    NO_SOURCE_CONTEXT = (
+        "No external knowledge base available. "
+        "Please answer based on your general knowledge."
+    )
+
     USER_PROMPT_TEMPLATE = (
         "Context:\n{context}\n\n"
         "Question: {question}\n\n"
         "Please provide a comprehensive answer based on the context above."
     )
+
+    # Used by the "prefix_cache" layout: context in the system message, question alone at the end
+    SYSTEM_CONTEXT_TEMPLATE = "{system_prompt}\n\nContext:\n{context}"
+    QUESTION_PROMPT_TEMPLATE = (
+        "Question: {question}\n\n"
+        "Please provide a comprehensive answer based on the context above."
+    )
@@ -0,0 +1,204 @@
+import math
+import re
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Set
+
+from rag_source_base import RetrievedDocument
+from cli_interface import Config
+
+CONTEXT_HEADER = "Here are the relevant documents:\n\n"
+NO_DOCUMENTS = "No relevant documents found."
+TRUNCATION_MARKER = " [...]"
+
+
+@lru_cache(maxsize=None)
+def _load_encoding(model: str):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+
+    try:
+        try:
+            return tiktoken.encoding_for_model(model.split("/")[-1])
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # tiktoken fetches its vocabularies on first use, which fails offline
+        return None
+
+
+class TokenCounter:
+    """
+    Counts tokens the way the model will.
+
+    Uses tiktoken when it is installed and its vocabulary can be loaded, and
+    otherwise estimates about four characters per token.
+    """
+
+    CHARS_PER_TOKEN = 4
+
+    def __init__(self, model: str = Config.LLM_MODEL):
+        self.model = model
+        self._encoding = _load_encoding(model)
+
+    @property
+    def exact(self) -> bool:
+        return self._encoding is not None
+
+    def count(self, text: str) -> int:
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return math.ceil(len(text) / self.CHARS_PER_TOKEN)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cut text down to at most max_tokens tokens."""
+        if max_tokens <= 0:
+            return ""
+        if self._encoding is not None:
+            tokens = self._encoding.encode(text, disallowed_special=())
+            if len(tokens) <= max_tokens:
+                return text
+            return self._encoding.decode(tokens[:max_tokens])
+
+        max_chars = max_tokens * self.CHARS_PER_TOKEN
+        if len(text) <= max_chars:
+            return text
+        cut = text.rfind(" ", 0, max_chars)
+        return text[:cut if cut > max_chars // 2 else max_chars]
+
+
+def _shingles(text: str, size: int = 3) -> Set[int]:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < size:
+        return {hash(tuple(words))}
+    return {hash(tuple(words[i:i + size])) for i in range(len(words) - size + 1)}
+
+
+def _jaccard(a: Set[int], b: Set[int]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class ContextBuilder:
+    """
+    Turns retrieved documents into prompt context under a token budget.
+
+    Documents are packed greedily in order of relevancy. One that does not
+    fit is truncated if at least `min_chunk_tokens` of its content still
+    fits, and dropped otherwise. Near-identical passages (word 3-gram
+    Jaccard similarity of `dedupe_threshold` or more to a passage already
+    packed) and repeated document IDs are skipped.
+    """
+
+    def __init__(self, max_tokens: int = Config.CONTEXT_MAX_TOKENS,
+                 model: str = Config.LLM_MODEL,
+                 min_chunk_tokens: int = Config.CONTEXT_MIN_CHUNK_TOKENS,
+                 dedupe_threshold: Optional[float] = Config.CONTEXT_DEDUPE_THRESHOLD,
+                 counter: Optional[TokenCounter] = None):
+        self.max_tokens = max_tokens
+        self.min_chunk_tokens = min_chunk_tokens
+        self.dedupe_threshold = dedupe_threshold
+        self.counter = counter or TokenCounter(model)
+
+    @staticmethod
+    def _format_block(number: int, text: Optional[str], source: Optional[str],
+                      score: Optional[float]) -> str:
+        lines = [f"Document {number}:"]
+        if text is not None:
+            lines.append(f"Content: {text}")
+        if source is not None:
+            lines.append(f"Source: {source}")
+        if score is not None:
+            lines.append(f"Relevance Score: {score}")
+        return "\n".join(lines) + "\n\n"
+
+    def _is_duplicate(self, doc_id: Any, shingles: Set[int], seen_ids: Set[Any],
+                      packed_shingles: List[Set[int]]) -> bool:
+        if doc_id is not None and doc_id in seen_ids:
+            return True
+        if self.dedupe_threshold is None:
+            return False
+        return any(_jaccard(shingles, other) >= self.dedupe_threshold
+                   for other in packed_shingles)
+
+    def pack(self, documents: List[Any]) -> List[Dict[str, Any]]:
+        """
+        Choose which documents go into the context, and how much of each.
+
+        Returns:
+            The packed documents, best first, as dicts with the (possibly
+            truncated) text, source, relevancy, token count and whether the
+            text was truncated
+        """
+        ranked = sorted(
+            (RetrievedDocument.from_any(doc) for doc in documents),
+            key=lambda doc: -(doc.relevancy or 0.0))
+
+        budget = self.max_tokens - self.counter.count(CONTEXT_HEADER)
+        packed: List[Dict[str, Any]] = []
+        packed_shingles: List[Set[int]] = []
+        seen_ids: Set[Any] = set()
+
+        for doc in ranked:
+            if budget <= 0:
+                break
+
+            source, score, doc_id = doc.source_display_name or None, doc.relevancy, doc.id
+
+            # Check the budget before deduplicating: shingling is the expensive part
+            overhead = self.counter.count(
+                self._format_block(len(packed) + 1, "", source, score))
+            # The first read decodes the text; documents past the budget are never decoded
+            text = doc.text
+            tokens = overhead + self.counter.count(text)
+            room = budget - overhead - self.counter.count(TRUNCATION_MARKER)
+            if tokens > budget and room < self.min_chunk_tokens:
+                continue
+
+            shingles = _shingles(text)
+            if self._is_duplicate(doc_id, shingles, seen_ids, packed_shingles):
+                continue
+
+            truncated = False
+            if tokens > budget:
+                text = self.counter.truncate(text, room) + TRUNCATION_MARKER
+                tokens = overhead + self.counter.count(text)
+                truncated = True
+
+            packed.append({
+                'id': doc_id,
+                'text': text,
+                'source_display_name': source,
+                'relevancy': score,
+                'tokens': tokens,
+                'truncated': truncated,
+            })
+            packed_shingles.append(shingles)
+            if doc_id is not None:
+                seen_ids.add(doc_id)
+            budget -= tokens
+
+        return packed
+
+    def build(self, documents: List[Any], stable: bool = False) -> str:
+        """
+        Format the packed documents as prompt context.
+
+        With stable=True the documents are ordered by ID and their relevance
+        scores left out, so the same documents always give the same text
+        whichever question retrieved them. That keeps the prompt prefix
+        cacheable by the LLM provider.
+        """
+        packed = self.pack(documents)
+        if not packed:
+            return NO_DOCUMENTS
+
+        if stable:
+            packed.sort(key=lambda doc: str(doc['id']))
+        return CONTEXT_HEADER + "".join(
+            self._format_block(number, doc['text'], doc['source_display_name'],
+                               None if stable else doc['relevancy'])
+            for number, doc in enumerate(packed, 1)
+        )
@@ -0,0 +1,208 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+from context_builder import TokenCounter
+from llm_router import LLMRouter
+from cli_interface import Config
+
+
+REWRITE_PROMPT = (
+    "Rewrite the follow-up question so it can be understood without the conversation: "
+    "resolve pronouns and references like \"the second one\" from the conversation. "
+    "If it already stands alone, return it unchanged. Reply with only the question.\n\n"
+    "Conversation:\n{conversation}\n\nFollow-up question: {question}"
+)
+
+SUMMARY_PROMPT = (
+    "Update the summary of a conversation with the new turns below. Keep names, "
+    "numbers and anything the user may refer back to; drop pleasantries. Reply "
+    "with only the summary, in at most {max_words} words.\n\n"
+    "Current summary:\n{summary}\n\nNew turns:\n{turns}"
+)
+
+
+def _content(response: Any) -> str:
+    return (response.choices[0].message.content or "").strip()
+
+
+class Conversation:
+    """
+    The state of one chat session.
+
+    Recent turns are kept verbatim while they fit in `max_history_tokens`.
+    Older turns are folded into a running summary by a background task, so
+    the history sent with each prompt stays a fixed size however long the
+    conversation gets. Until the summarizer catches up, the turns it is
+    working on are in neither the window nor the summary.
+    """
+
+    def __init__(self, session_id: str, router: LLMRouter, executor: Executor,
+                 counter: Optional[TokenCounter] = None,
+                 max_history_tokens: int = Config.CONVERSATION_MAX_HISTORY_TOKENS,
+                 max_summary_tokens: int = Config.CONVERSATION_SUMMARY_MAX_TOKENS,
+                 rewrite_turns: int = Config.CONVERSATION_REWRITE_TURNS):
+        self.session_id = session_id
+        self.router = router
+        self.counter = counter or TokenCounter()
+        self.max_history_tokens = max_history_tokens
+        self.max_summary_tokens = max_summary_tokens
+        self.rewrite_turns = rewrite_turns
+        self.summary = ""
+        self.last_active = time.monotonic()
+        # (question, answer, tokens), oldest first
+        self._turns: List[Tuple[str, str, int]] = []
+        self._to_summarize: List[Tuple[str, str]] = []
+        self._summarizing = False
+        self._idle = threading.Event()
+        self._idle.set()
+        self._executor = executor
+        self._lock = threading.Lock()
+
+    @property
+    def turns(self) -> List[Tuple[str, str]]:
+        with self._lock:
+            return [(question, answer) for question, answer, _ in self._turns]
+
+    def messages(self) -> List[Dict[str, str]]:
+        """The summary and recent turns, as chat messages to put before the new question."""
+        with self._lock:
+            summary, turns = self.summary, list(self._turns)
+
+        messages = []
+        if summary:
+            messages.append({"role": "system",
+                             "content": f"Summary of the earlier conversation:\n{summary}"})
+        for question, answer, _ in turns:
+            messages.append({"role": "user", "content": question})
+            messages.append({"role": "assistant", "content": answer})
+        return messages
+
+    def standalone_query(self, question: str) -> str:
+        """
+        Rewrite a follow-up question into one that retrieval can use on its own.
+
+        The first question of a session is returned as is. If the rewrite
+        fails, so is the question: a poor query beats no answer.
+        """
+        with self._lock:
+            summary = self.summary
+            recent = self._turns[-self.rewrite_turns:] if self.rewrite_turns else []
+        if not summary and not recent:
+            return question
+
+        lines = [f"(Earlier: {summary})"] if summary else []
+        for previous, answer, _ in recent:
+            lines.append(f"User: {previous}")
+            lines.append(f"Assistant: {self.counter.truncate(answer, 200)}")
+        try:
+            response = self.router.complete([{"role": "user", "content": REWRITE_PROMPT.format(
+                conversation="\n".join(lines), question=question)}])
+        except Exception:
+            return question
+        return _content(response) or question
+
+    def add_turn(self, question: str, answer: str):
+        """Record a finished turn, moving the oldest turns out to the summarizer if the window is full."""
+        tokens = self.counter.count(question) + self.counter.count(answer)
+        with self._lock:
+            self.last_active = time.monotonic()
+            self._turns.append((question, answer, tokens))
+            total = sum(turn[2] for turn in self._turns)
+            # The latest turn always stays, even if it alone is over the budget
+            while total > self.max_history_tokens and len(self._turns) > 1:
+                old_question, old_answer, old_tokens = self._turns.pop(0)
+                self._to_summarize.append((old_question, old_answer))
+                total -= old_tokens
+
+            if self._to_summarize and not self._summarizing:
+                self._summarizing = True
+                self._idle.clear()
+                self._executor.submit(self._summarize)
+
+    def _summarize(self):
+        while True:
+            with self._lock:
+                if not self._to_summarize:
+                    self._summarizing = False
+                    self._idle.set()
+                    return
+                batch, self._to_summarize = self._to_summarize, []
+                summary = self.summary
+
+            turns = "\n".join(f"User: {question}\nAssistant: {answer}" for question, answer in batch)
+            try:
+                response = self.router.complete([{"role": "user", "content": SUMMARY_PROMPT.format(
+                    max_words=int(self.max_summary_tokens * 0.75),
+                    summary=summary or "(none yet)", turns=turns)}])
+                summary = self.counter.truncate(_content(response), self.max_summary_tokens)
+            except Exception:
+                # Keep the turns for the next attempt, after the next turn
+                with self._lock:
+                    self._to_summarize = batch + self._to_summarize
+                    self._summarizing = False
+                    self._idle.set()
+                return
+
+            with self._lock:
+                self.summary = summary
+
+    def wait_for_summary(self, timeout: Optional[float] = None) -> bool:
+        """Block until background summarization is idle. Returns False on timeout."""
+        return self._idle.wait(timeout)
+
+    def prompt_tokens(self) -> int:
+        """Tokens the history adds to each prompt."""
+        return sum(self.counter.count(message["content"]) for message in self.messages())
+
+
+class ConversationStore:
+    """
+    Conversations by session ID.
+
+    Holds at most `max_sessions`, evicting the least recently used, and
+    drops sessions idle for longer than `ttl` seconds. All conversations
+    share one small pool for background summarization.
+    """
+
+    def __init__(self, router: LLMRouter,
+                 max_sessions: int = Config.CONVERSATION_MAX_SESSIONS,
+                 ttl: float = Config.CONVERSATION_TTL_SECONDS,
+                 max_workers: int = Config.CONVERSATION_SUMMARY_WORKERS):
+        self.router = router
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.counter = TokenCounter()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="summarize")
+        self._sessions: "OrderedDict[str, Conversation]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _sweep(self, now: float):
+        """Drop the sessions idle for longer than ttl. They are kept oldest first."""
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.last_active <= self.ttl:
+                break
+            self._sessions.popitem(last=False)
+
+    def get(self, session_id: str) -> Conversation:
+        """The conversation for session_id, started if it does not exist yet."""
+        with self._lock:
+            now = time.monotonic()
+            self._sweep(now)
+            conversation = self._sessions.get(session_id)
+            if conversation is None:
+                conversation = Conversation(session_id, self.router, self._executor, self.counter)
+                self._sessions[session_id] = conversation
+            conversation.last_active = now
+            self._sessions.move_to_end(session_id)
+
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return conversation
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._sweep(time.monotonic())
+            return {"sessions": len(self._sessions)}
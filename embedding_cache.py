@@ -0,0 +1,291 @@
+import hashlib
+import os
+import re
+import struct
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Callable
+
+import numpy as np
+
+from cli_interface import Config
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: appends are still serialized within a process, but not across processes
+    fcntl = None
+
+
+def _digests(model: str, texts: List[str]) -> np.ndarray:
+    """16-byte BLAKE2 digests of the model and each text, as an (n, 2) uint64 array."""
+    data = b"".join(
+        hashlib.blake2b(f"{model}\0{text}".encode("utf-8"), digest_size=16).digest() for text in texts)
+    return np.frombuffer(data, dtype="<u8").reshape(len(texts), 2)
+
+
+class VectorFile:
+    """
+    One model's vectors in one storage type: an append-only pair of files.
+
+        <name>.keys     a 16-byte header (magic, storage type, dimension),
+                        then a 16-byte digest per entry
+        <name>.vectors  the entries' vectors, in the same order; int8
+                        entries are a float32 scale followed by the
+                        vector quantized to [-127, 127]
+
+    Appends hold an exclusive flock on the keys file, write the vectors
+    first and the keys last, and first cut off anything an interrupted
+    append left behind. Readers take no lock: they count entries by whole
+    keys, so an entry is only ever seen once its vector is complete.
+    """
+
+    MAGIC = b"EMBC"
+    HEADER = struct.Struct("<4sB3xII")
+    STORAGE = {"float32": 0, "int8": 1}
+
+    def __init__(self, path: Path, storage: str):
+        self.keys_path = path.with_name(path.name + ".keys")
+        self.vectors_path = path.with_name(path.name + ".vectors")
+        self.storage = storage
+        self.dim: Optional[int] = None
+        self.count = 0
+        self._keys: Optional[np.ndarray] = None
+        self._vectors: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._keys_size = 0
+
+    def _record_dtype(self) -> np.dtype:
+        if self.storage == "int8":
+            return np.dtype([("scale", "<f4"), ("vector", "i1", (self.dim,))])
+        return np.dtype([("vector", "<f4", (self.dim,))])
+
+    def _read_header(self) -> bool:
+        try:
+            with open(self.keys_path, "rb") as f:
+                header = f.read(self.HEADER.size)
+        except FileNotFoundError:
+            return False
+        if len(header) < self.HEADER.size:
+            return False
+        magic, storage, dim, _ = self.HEADER.unpack(header)
+        if magic != self.MAGIC or storage != self.STORAGE[self.storage]:
+            raise ValueError(f"{self.keys_path} is not a {self.storage} embedding cache file")
+        self.dim = dim
+        return True
+
+    def refresh(self):
+        """Map entries appended since the last call, by this or any other process."""
+        try:
+            # Keys are written last, so sizing them first never counts a vector that is not there yet
+            keys_size = os.path.getsize(self.keys_path)
+            vectors_size = os.path.getsize(self.vectors_path)
+        except FileNotFoundError:
+            return
+        if keys_size == self._keys_size or (self.dim is None and not self._read_header()):
+            return
+
+        record = self._record_dtype()
+        count = min((keys_size - self.HEADER.size) // 16, vectors_size // record.itemsize)
+        if count > 0:
+            self._keys = np.memmap(self.keys_path, dtype="<u8", mode="r",
+                                   offset=self.HEADER.size, shape=(count, 2))
+            records = np.memmap(self.vectors_path, dtype=record, mode="r", shape=(count,))
+            self._vectors = records["vector"]
+            self._scales = records["scale"] if self.storage == "int8" else None
+        self.count = count
+        self._keys_size = keys_size
+
+    def find(self, digests: np.ndarray) -> np.ndarray:
+        """The entry of each digest, or -1. Scans the key column once for the whole batch."""
+        rows = np.full(len(digests), -1, dtype=np.int64)
+        if not self.count or not len(digests):
+            return rows
+        positions: Dict[int, List[int]] = {}
+        for i, high in enumerate(digests[:, 0].tolist()):
+            positions.setdefault(high, []).append(i)
+        if len(digests) == 1:
+            candidates = np.flatnonzero(self._keys[:, 0] == digests[0, 0])
+        else:
+            candidates = np.flatnonzero(np.isin(self._keys[:, 0], digests[:, 0]))
+        for row in candidates.tolist():
+            key = self._keys[row]
+            for i in positions[int(key[0])]:
+                if digests[i, 1] == key[1]:
+                    rows[i] = row
+        return rows
+
+    def vectors(self, rows: np.ndarray) -> np.ndarray:
+        if self.storage == "int8":
+            return self._vectors[rows].astype(np.float32) * self._scales[rows, None]
+        return np.asarray(self._vectors[rows], dtype=np.float32)
+
+    def _encode(self, vectors: np.ndarray) -> bytes:
+        records = np.zeros(len(vectors), dtype=self._record_dtype())
+        if self.storage == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127
+            scales[scales == 0] = 1.0
+            records["scale"] = scales
+            records["vector"] = np.clip(np.rint(vectors / scales[:, None]), -127, 127)
+        else:
+            records["vector"] = vectors
+        return records.tobytes()
+
+    def append(self, digests: np.ndarray, vectors: np.ndarray):
+        """Append the entries that no process has added yet."""
+        self.keys_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.keys_path, "a+b") as keys_file:
+            if fcntl:
+                fcntl.flock(keys_file, fcntl.LOCK_EX)
+            keys_file.seek(0, os.SEEK_END)
+            if keys_file.tell() < self.HEADER.size:
+                keys_file.truncate(0)
+                keys_file.write(self.HEADER.pack(self.MAGIC, self.STORAGE[self.storage], vectors.shape[1], 0))
+                keys_file.flush()
+            if self.dim is None:
+                self._read_header()
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional vectors for {self.keys_path.name}, "
+                                 f"got {vectors.shape[1]}")
+
+            self._keys_size = -1
+            self.refresh()
+            new = self.find(digests) < 0
+            if not new.any():
+                return
+            with open(self.vectors_path, "ab") as vectors_file:
+                # Drop anything left behind by an interrupted append
+                vectors_file.truncate(self.count * self._record_dtype().itemsize)
+                vectors_file.write(self._encode(vectors[new]))
+            keys_file.truncate(self.HEADER.size + self.count * 16)
+            keys_file.write(np.ascontiguousarray(digests[new]).tobytes())
+            keys_file.flush()
+        self.refresh()
+
+
+class EmbeddingCache:
+    """
+    Embeddings by model and text, on disk, shared by ingestion and queries.
+
+    Vectors are kept as float32 or, with quantize=True, as int8 with a
+    per-vector scale (a quarter of the size, at a small cost in
+    precision), in one append-only VectorFile per model. The files are
+    memory-mapped and safe to read and append from any number of
+    processes at once.
+
+    An LRU of the `index_entries` most recently used keys remembers their
+    entry, so a repeated text is found without touching the key column;
+    other lookups scan it, one vectorized pass per batch, which keeps the
+    memory held bounded however large the files grow.
+    """
+
+    def __init__(self, path: str, quantize: bool = Config.EMBEDDING_CACHE_QUANTIZE,
+                 index_entries: int = Config.EMBEDDING_CACHE_INDEX_ENTRIES):
+        self.path = Path(path)
+        self.storage = "int8" if quantize else "float32"
+        self.index_entries = index_entries
+        self._files: Dict[str, VectorFile] = {}
+        self._index: "OrderedDict[bytes, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.index_hits = 0
+
+    def _file(self, model: str) -> VectorFile:
+        vector_file = self._files.get(model)
+        if vector_file is None:
+            slug = re.sub(r"[^A-Za-z0-9]+", "_", model).strip("_")
+            suffix = hashlib.sha256(model.encode("utf-8")).hexdigest()[:8]
+            vector_file = VectorFile(self.path / f"{slug}-{suffix}.{self.storage}", self.storage)
+            self._files[model] = vector_file
+        return vector_file
+
+    def _remember(self, key: bytes, row: int):
+        self._index[key] = row
+        self._index.move_to_end(key)
+        while len(self._index) > self.index_entries:
+            self._index.popitem(last=False)
+
+    def get(self, model: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """The cached vector of each text, or None."""
+        digests = _digests(model, texts)
+        keys = [digest.tobytes() for digest in digests]
+        with self._lock:
+            vector_file = self._file(model)
+            rows = np.full(len(texts), -1, dtype=np.int64)
+            unknown = []
+            for i, key in enumerate(keys):
+                row = self._index.get(key)
+                if row is None:
+                    unknown.append(i)
+                else:
+                    self._index.move_to_end(key)
+                    rows[i] = row
+            self.index_hits += len(texts) - len(unknown)
+
+            if unknown:
+                vector_file.refresh()
+                rows[unknown] = vector_file.find(digests[unknown])
+                for i in unknown:
+                    if rows[i] >= 0:
+                        self._remember(keys[i], int(rows[i]))
+
+            found = rows >= 0
+            self.hits += int(found.sum())
+            self.misses += len(texts) - int(found.sum())
+            vectors = vector_file.vectors(rows[found]) if found.any() else []
+
+        results: List[Optional[np.ndarray]] = [None] * len(texts)
+        for i, vector in zip(np.flatnonzero(found).tolist(), vectors):
+            results[i] = vector
+        return results
+
+    def put(self, model: str, texts: List[str], vectors: Any):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(texts):
+            return
+        with self._lock:
+            self._file(model).append(_digests(model, texts), vectors)
+
+    def embed(self, model: str, texts: List[str], embed_fn: Callable[[List[str]], Any],
+              normalize: Optional[Callable[[str], str]] = None) -> np.ndarray:
+        """
+        Vectors for texts, calling embed_fn once for those not cached yet.
+
+        normalize maps texts that should share a vector (e.g. a question
+        asked again with different casing) to one key. The vector stored
+        is that of the first text embedded under the key.
+        """
+        keys = [normalize(text) for text in texts] if normalize else list(texts)
+        results = self.get(model, keys)
+
+        missing: Dict[str, List[int]] = {}
+        for i, vector in enumerate(results):
+            if vector is None:
+                missing.setdefault(keys[i], []).append(i)
+        if missing:
+            # One request per distinct key, with the text of its first occurrence
+            firsts = [positions[0] for positions in missing.values()]
+            vectors = np.asarray(embed_fn([texts[i] for i in firsts]), dtype=np.float32)
+            try:
+                self.put(model, list(missing), vectors)
+            except OSError:
+                # A read-only or full disk costs the cache, not the request
+                pass
+            for positions, vector in zip(missing.values(), vectors):
+                for i in positions:
+                    results[i] = vector
+        return np.stack(results) if results else np.zeros((0, 0), dtype=np.float32)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": sum(vector_file.count for vector_file in self._files.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "index_hits": self.index_hits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,60 @@
+import threading
+from pathlib import Path
+from typing import List, Optional, Callable
+from cli_interface import Config
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def embed_texts(texts: List[str], model: str = Config.EMBEDDING_MODEL) -> List[List[float]]:
+    """Embed a batch of texts in a single request, preserving input order."""
+    if not texts:
+        return []
+
+    # Imported here: litellm takes seconds to import and most runs never embed
+    from litellm import embedding
+    response = embedding(model=model, input=texts)
+    data = sorted(response.data, key=lambda item: item["index"])
+    return [item["embedding"] for item in data]
+
+
+def embed_text(text: str, model: str = Config.EMBEDDING_MODEL) -> List[float]:
+    return embed_texts([text], model)[0]
+
+
+def get_embedding_cache():
+    """The process's EmbeddingCache, or None if it is disabled."""
+    global _cache
+    if not Config.EMBEDDING_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            # Imported here: it needs numpy, which most runs never load
+            from embedding_cache import EmbeddingCache
+            _cache = EmbeddingCache(str(Path(__file__).parent / Config.EMBEDDING_CACHE_PATH))
+        return _cache
+
+
+def embed_texts_cached(texts: List[str], model: str = Config.EMBEDDING_MODEL,
+                       normalize: Optional[Callable[[str], str]] = None) -> List[List[float]]:
+    """embed_texts, requesting only the texts the embedding cache does not have yet."""
+    cache = get_embedding_cache()
+    if cache is None or not texts:
+        return embed_texts(texts, model)
+    return list(cache.embed(model, texts, lambda missing: embed_texts(missing, model), normalize))
+
+
+def embed_queries(questions: List[str], model: str = Config.EMBEDDING_MODEL) -> List[List[float]]:
+    """Embed questions through the cache; questions differing only in case or punctuation share a vector."""
+    from answer_cache import normalize_question
+    return embed_texts_cached(questions, model, normalize=normalize_question)
+
+
+def embed_query(question: str, model: str = Config.EMBEDDING_MODEL) -> List[float]:
+    return embed_queries([question], model)[0]
+
+
+def embedding_cache_stats() -> Optional[dict]:
+    """The embedding cache's stats, or None if nothing has used it."""
+    return _cache.stats() if _cache is not None else None
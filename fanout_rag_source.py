@@ -0,0 +1,242 @@
+import asyncio
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import List, Dict, Any, Optional, Tuple
+from rag_source_base import RAGSourceBase, RAGSourceError, RAGSourceTimeout, RetrievedDocument
+from cli_interface import Config, terminal_renderer
+
+
+def _fusion_key(doc: RetrievedDocument) -> str:
+    """Documents with the same text are the same passage, whichever source found them."""
+    text = doc.text_bytes()
+    if text:
+        return hashlib.sha1(text).hexdigest()
+    return str(doc.id if doc.id is not None else id(doc))
+
+
+def reciprocal_rank_fusion(rankings: List[List[Any]], k: int = 60,
+                           weights: Optional[List[float]] = None) -> List[RetrievedDocument]:
+    """
+    Merge ranked lists by summing weight / (k + rank) for every list a document appears in.
+
+    RRF only looks at ranks, so it needs no calibration between scores from
+    different retrievers (cosine similarity vs BM25). The fused score becomes
+    the document's relevancy.
+    """
+    weights = weights or [1.0] * len(rankings)
+    scores: Dict[str, float] = {}
+    documents: Dict[str, RetrievedDocument] = {}
+
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc in enumerate(ranking, 1):
+            doc = RetrievedDocument.from_any(doc)
+            key = _fusion_key(doc)
+            scores[key] = scores.get(key, 0.0) + weight / (k + rank)
+            documents.setdefault(key, doc)
+
+    return [
+        documents[key].rescored(scores[key])
+        for key in sorted(scores, key=scores.get, reverse=True)
+    ]
+
+
+class FanoutReport:
+    """What happened to each source during one fan-out retrieval."""
+
+    def __init__(self):
+        self.latencies: Dict[str, float] = {}
+        self.timed_out: List[str] = []
+        self.failed: Dict[str, str] = {}
+
+    @property
+    def partial(self) -> bool:
+        return bool(self.timed_out or self.failed)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "latencies": self.latencies,
+            "timed_out": self.timed_out,
+            "failed": self.failed,
+        }
+
+
+class FanoutRAGSource(RAGSourceBase):
+    """
+    Queries several sources in parallel and merges whatever comes back in time.
+
+    Each source has a deadline, measured from the start of the retrieval.
+    A source that misses it, or fails, is left out and the results of the
+    others are merged (reciprocal rank fusion, deduplicated on passage text).
+    Retrieval therefore takes at most the longest deadline, however slow a
+    backend is. Timeouts and failures are counted per source in stats().
+    If no source answers at all, retrieval raises RAGSourceError
+    (RAGSourceTimeout if they all timed out) with the FanoutReport as its
+    `report`, rather than returning no documents.
+
+    A source that times out keeps running in its worker thread until it
+    returns; its result is discarded.
+    """
+
+    def __init__(self, sources: List[RAGSourceBase],
+                 deadlines: Optional[List[Optional[float]]] = None,
+                 default_deadline: Optional[float] = Config.FANOUT_DEADLINE_SECONDS,
+                 weights: Optional[List[float]] = None,
+                 names: Optional[List[str]] = None,
+                 rrf_k: int = Config.FANOUT_RRF_K,
+                 max_workers: int = Config.FANOUT_MAX_WORKERS):
+        if not sources:
+            raise ValueError(f"{type(self).__name__} needs at least one source")
+        for option, values in (("deadlines", deadlines), ("weights", weights), ("names", names)):
+            if values is not None and len(values) != len(sources):
+                raise ValueError(f"{option} must have one entry per source")
+
+        self.sources = sources
+        # None means no deadline for that source
+        self.deadlines = deadlines or [default_deadline] * len(sources)
+        self.weights = weights
+        self.names = names or self._default_names(sources)
+        self.rrf_k = rrf_k
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix=type(self).__name__.lower())
+        self._lock = threading.Lock()
+        self._stats = {name: {"calls": 0, "timeouts": 0, "errors": 0} for name in self.names}
+
+    @staticmethod
+    def _default_names(sources: List[RAGSourceBase]) -> List[str]:
+        names = []
+        for source in sources:
+            name = type(source).__name__
+            names.append(name if name not in names else f"{name}-{len(names)}")
+        return names
+
+    def _candidates(self, num_results: int) -> int:
+        return num_results
+
+    def _merge(self, rankings: List[List[Any]], num_results: int) -> List[Dict[str, Any]]:
+        weights = self.weights or [1.0] * len(self.sources)
+        return reciprocal_rank_fusion(rankings, self.rrf_k, weights)[:num_results]
+
+    def _finish(self, report: FanoutReport):
+        for name, error in report.failed.items():
+            terminal_renderer().write(f"Error retrieving documents from {name}: {error}\n")
+
+        with self._lock:
+            for name in self.names:
+                self._stats[name]["calls"] += 1
+            for name in report.timed_out:
+                self._stats[name]["timeouts"] += 1
+            for name in report.failed:
+                self._stats[name]["errors"] += 1
+
+        if not report.latencies:
+            source = type(self).__name__
+            if report.failed:
+                failures = "; ".join([f"{name}: {error}" for name, error in report.failed.items()]
+                                     + [f"{name}: timed out" for name in report.timed_out])
+                error = RAGSourceError(f"No source answered ({failures})", source=source)
+            else:
+                error = RAGSourceTimeout(f"All sources timed out: {', '.join(report.timed_out)}",
+                                         source=source, retryable=True)
+            error.report = report
+            raise error
+
+    def retrieve_with_report(self, question: str, num_results: int = 5) -> Tuple[List[Dict[str, Any]], FanoutReport]:
+        """Like retrieve_documents(), but also says which sources timed out or failed."""
+        candidates = self._candidates(num_results)
+        start = time.monotonic()
+        futures = [
+            self._executor.submit(self._timed, source.retrieve_documents, question, candidates)
+            for source in self.sources
+        ]
+
+        report = FanoutReport()
+        rankings = []
+        for name, deadline, future in zip(self.names, self.deadlines, futures):
+            timeout = None if deadline is None else max(0.0, start + deadline - time.monotonic())
+            try:
+                documents, latency = future.result(timeout=timeout)
+                report.latencies[name] = latency
+            except FutureTimeoutError:
+                future.cancel()
+                report.timed_out.append(name)
+                documents = []
+            except Exception as e:
+                report.failed[name] = str(e)
+                documents = []
+            rankings.append(documents)
+
+        self._finish(report)
+        return self._merge(rankings, num_results), report
+
+    async def aretrieve_with_report(self, question: str, num_results: int = 5) -> Tuple[List[Dict[str, Any]], FanoutReport]:
+        candidates = self._candidates(num_results)
+
+        async def timed(source: RAGSourceBase):
+            started = time.perf_counter()
+            documents = await source.aretrieve_documents(question, candidates)
+            return documents, time.perf_counter() - started
+
+        results = await asyncio.gather(
+            *(asyncio.wait_for(timed(source), timeout=deadline)
+              for source, deadline in zip(self.sources, self.deadlines)),
+            return_exceptions=True)
+
+        report = FanoutReport()
+        rankings = []
+        for name, result in zip(self.names, results):
+            if isinstance(result, (asyncio.TimeoutError, TimeoutError)):
+                report.timed_out.append(name)
+                result = ([], None)
+            elif isinstance(result, Exception):
+                report.failed[name] = str(result)
+                result = ([], None)
+            else:
+                report.latencies[name] = result[1]
+            rankings.append(result[0])
+
+        self._finish(report)
+        return self._merge(rankings, num_results), report
+
+    @staticmethod
+    def _timed(retrieve, question: str, num_results: int):
+        started = time.perf_counter()
+        documents = retrieve(question, num_results)
+        return documents, time.perf_counter() - started
+
+    def retrieve_documents(self, question: str, num_results: int = 5) -> List[Dict[str, Any]]:
+        return self.retrieve_with_report(question, num_results)[0]
+
+    async def aretrieve_documents(self, question: str, num_results: int = 5) -> List[Dict[str, Any]]:
+        return (await self.aretrieve_with_report(question, num_results))[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """Calls, timeouts and errors per source, with each source's timeout rate."""
+        with self._lock:
+            stats: Dict[str, Any] = {}
+            for name, counters in self._stats.items():
+                for counter, value in counters.items():
+                    stats[f"{name}_{counter}"] = value
+                if counters["calls"]:
+                    stats[f"{name}_timeout_rate"] = counters["timeouts"] / counters["calls"]
+        return stats
+
+    def warm_up(self):
+        # In parallel: warm-up time is that of the slowest source, not the sum
+        for future in [self._executor.submit(source.warm_up) for source in self.sources]:
+            future.result()
+
+    def get_document_set_version(self) -> Optional[str]:
+        versions = [source.get_document_set_version() for source in self.sources]
+        if all(version is None for version in versions):
+            return None
+        return ":".join(version or "" for version in versions)
+
+    def get_required_env_vars(self) -> List[str]:
+        required = []
+        for source in self.sources:
+            for var in source.get_required_env_vars():
+                if var not in required:
+                    required.append(var)
+        return required
@@ -0,0 +1,29 @@
+from typing import List, Optional
+from rag_source_base import RAGSourceBase
+from fanout_rag_source import FanoutRAGSource
+from cli_interface import Config
+
+
+class HybridRAGSource(FanoutRAGSource):
+    """
+    Queries several sources at once (typically vector and BM25) and merges
+    their results with reciprocal rank fusion.
+
+    The sources are queried in parallel, so a hybrid retrieval takes as long
+    as the slowest source, not the sum. A source that fails is left out of
+    the fusion instead of failing the whole retrieval. Unlike a plain
+    fan-out, each source is asked for extra candidates so fusion has
+    something to re-rank.
+    """
+
+    def __init__(self, sources: List[RAGSourceBase], weights: Optional[List[float]] = None,
+                 rrf_k: int = Config.HYBRID_RRF_K,
+                 candidates_per_source: int = Config.HYBRID_CANDIDATES_PER_SOURCE,
+                 default_deadline: Optional[float] = None):
+        super().__init__(sources, default_deadline=default_deadline, weights=weights,
+                         rrf_k=rrf_k, max_workers=Config.HYBRID_MAX_WORKERS)
+        self.candidates_per_source = candidates_per_source
+
+    def _candidates(self, num_results: int) -> int:
+        # Fusion needs more than the final count from each branch to re-rank well
+        return max(num_results, self.candidates_per_source)
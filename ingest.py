@@ -0,0 +1,293 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import batched
+from pathlib import Path
+from typing import List, Dict, Any, Iterator, Optional, Callable, Set
+
+import numpy as np
+from dotenv import load_dotenv
+
+from cli_interface import CLIInterface, Config
+from embeddings import embedding_cache_stats
+from local_index import LocalVectorIndex
+from bm25_index import BM25Index
+
+
+def iter_files(root: Path, extensions: List[str]) -> Iterator[Path]:
+    """Yield matching files under root in a stable order."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+        for filename in sorted(filenames):
+            path = Path(dirpath) / filename
+            if path.suffix.lower() in extensions:
+                yield path
+
+
+def file_digest(path: Path, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(block_size):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_file(path: Path, chunk_size: int, overlap: int,
+               block_size: int = 1 << 16) -> Iterator[str]:
+    """
+    Split a text file into overlapping chunks without reading it whole.
+
+    Chunks end on whitespace where possible, so words are not cut in half.
+    """
+    buffer = ""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        while True:
+            block = f.read(block_size)
+            buffer += block
+            while len(buffer) >= chunk_size or (not block and buffer.strip()):
+                end = min(chunk_size, len(buffer))
+                if end < len(buffer):
+                    boundary = max(buffer.rfind(" ", 0, end), buffer.rfind("\n", 0, end))
+                    if boundary > chunk_size // 2:
+                        end = boundary
+                chunk = buffer[:end].strip()
+                if chunk:
+                    yield chunk
+                if end >= len(buffer):
+                    buffer = ""
+                    break
+                buffer = buffer[max(end - overlap, 1):]
+            if not block:
+                return
+
+
+class IngestPipeline:
+    """
+    Streams files into a LocalVectorIndex: walk -> chunk -> embed -> append.
+
+    Chunks are deduplicated by content hash against the index and against
+    each other, and a per-file digest is kept in ingest_state.json next to
+    the index, so re-runs only chunk files that changed and only embed
+    chunks that are new. Chunks that no longer belong to any file are
+    deleted from the index.
+    """
+
+    STATE_FILE = "ingest_state.json"
+
+    def __init__(self, index_path: str,
+                 embed_fn: Optional[Callable[[List[str]], List[List[float]]]] = None,
+                 model: str = Config.EMBEDDING_MODEL,
+                 chunk_size: int = Config.INGEST_CHUNK_SIZE,
+                 chunk_overlap: int = Config.INGEST_CHUNK_OVERLAP,
+                 batch_size: int = Config.INGEST_BATCH_SIZE,
+                 concurrency: int = Config.INGEST_CONCURRENCY,
+                 extensions: List[str] = Config.INGEST_EXTENSIONS):
+        if not 0 <= chunk_overlap < chunk_size // 2:
+            raise ValueError("chunk_overlap must be less than half of chunk_size")
+
+        self.index_path = Path(index_path)
+        self.model = model
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.extensions = [ext.lower() for ext in extensions]
+
+        if embed_fn is None:
+            # Chunks embedded by an earlier run, into this or any other index, come from the cache
+            from embeddings import embed_texts_cached
+            embed_fn = lambda texts: embed_texts_cached(texts, model=self.model)
+        self.embed_fn = embed_fn
+
+        self.index: Optional[LocalVectorIndex] = None
+        self.known_hashes: Dict[str, int] = {}
+        if (self.index_path / LocalVectorIndex.MANIFEST).exists():
+            self._attach_index(LocalVectorIndex(str(self.index_path)))
+
+        state_path = self.index_path / self.STATE_FILE
+        self.state: Dict[str, Dict[str, Any]] = (
+            json.loads(state_path.read_text()) if state_path.exists() else {})
+
+        self.stats = {
+            "files_seen": 0,
+            "files_changed": 0,
+            "chunks_seen": 0,
+            "chunks_embedded": 0,
+            "chunks_deleted": 0,
+            "embed_calls": 0,
+        }
+
+    def _attach_index(self, index: LocalVectorIndex):
+        if index.model and index.model != self.model:
+            raise ValueError(
+                f"Index at {self.index_path} was built with {index.model}, not {self.model}")
+        self.index = index
+        self.known_hashes = {
+            record['hash']: row
+            for row, record in index.iter_live_records(with_text=False) if 'hash' in record
+        }
+
+    def _save_state(self):
+        self.index_path.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path / (self.STATE_FILE + ".tmp")
+        tmp_path.write_text(json.dumps(self.state))
+        os.replace(tmp_path, self.index_path / self.STATE_FILE)
+
+    def _iter_new_chunks(self, root: Path, queued: Set[str]) -> Iterator[Dict[str, Any]]:
+        for path in iter_files(root, self.extensions):
+            self.stats["files_seen"] += 1
+            key = str(path)
+            digest = file_digest(path)
+            if self.state.get(key, {}).get("digest") == digest:
+                continue
+
+            self.stats["files_changed"] += 1
+            relative = str(path.relative_to(root))
+            hashes = []
+            for number, text in enumerate(chunk_file(path, self.chunk_size, self.chunk_overlap)):
+                self.stats["chunks_seen"] += 1
+                content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+                hashes.append(content_hash)
+                if content_hash in self.known_hashes or content_hash in queued:
+                    continue
+                queued.add(content_hash)
+                yield {
+                    'id': content_hash[:16],
+                    'text': text,
+                    'source_display_name': relative,
+                    'hash': content_hash,
+                    'metadata': {'path': relative, 'chunk': number},
+                }
+
+            self.state[key] = {"digest": digest, "hashes": hashes}
+
+    def _embed_batch(self, records: List[Dict[str, Any]]):
+        vectors = self.embed_fn([record['text'] for record in records])
+        return records, np.asarray(vectors, dtype=np.float32)
+
+    def _write(self, records: List[Dict[str, Any]], vectors: np.ndarray):
+        if self.index is None:
+            self._attach_index(LocalVectorIndex.open_or_create(
+                str(self.index_path), vectors.shape[1], self.model))
+        rows = self.index.add(vectors, records)
+        for record, row in zip(records, rows):
+            self.known_hashes[record['hash']] = row
+        self.stats["chunks_embedded"] += len(records)
+
+    def _forget_missing_files(self, root: Path):
+        prefix = str(root) + os.sep
+        for key in list(self.state):
+            if key.startswith(prefix) and not Path(key).exists():
+                del self.state[key]
+
+    def _delete_orphans(self):
+        if self.index is None:
+            return
+        referenced = {h for entry in self.state.values() for h in entry["hashes"]}
+        orphans = [h for h in self.known_hashes if h not in referenced]
+        self.index.delete([self.known_hashes.pop(h) for h in orphans])
+        self.stats["chunks_deleted"] += len(orphans)
+
+    def run(self, root: str) -> Dict[str, Any]:
+        """
+        Ingest every matching file under root.
+
+        Embedding requests run on a thread pool with at most `concurrency`
+        batches in flight, so memory stays bounded however large the corpus.
+        """
+        root_path = Path(root).resolve()
+        start = time.perf_counter()
+        queued: Set[str] = set()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            pending = set()
+            for batch in batched(self._iter_new_chunks(root_path, queued), self.batch_size):
+                if len(pending) >= self.concurrency:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self._write(*future.result())
+                pending.add(executor.submit(self._embed_batch, list(batch)))
+                self.stats["embed_calls"] += 1
+
+            for future in pending:
+                self._write(*future.result())
+
+        self._forget_missing_files(root_path)
+        self._delete_orphans()
+        self._save_state()
+
+        elapsed = time.perf_counter() - start
+        self.stats["seconds"] = elapsed
+        self.stats["docs_per_second"] = self.stats["files_changed"] / elapsed if elapsed else 0.0
+        self.stats["embed_calls_per_second"] = self.stats["embed_calls"] / elapsed if elapsed else 0.0
+        return self.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Ingest a directory of text files into a local vector index")
+    parser.add_argument("directory", help="Directory to ingest")
+    parser.add_argument("--index-path", default=None,
+                        help="Index directory (default: $LOCAL_INDEX_PATH)")
+    parser.add_argument("--model", default=Config.EMBEDDING_MODEL)
+    parser.add_argument("--chunk-size", type=int, default=Config.INGEST_CHUNK_SIZE,
+                        help="Chunk size in characters")
+    parser.add_argument("--chunk-overlap", type=int, default=Config.INGEST_CHUNK_OVERLAP)
+    parser.add_argument("--batch-size", type=int, default=Config.INGEST_BATCH_SIZE,
+                        help="Chunks per embedding request")
+    parser.add_argument("--concurrency", type=int, default=Config.INGEST_CONCURRENCY,
+                        help="Embedding requests in flight")
+    parser.add_argument("--build-ivf", action="store_true",
+                        help="Rebuild the IVF index after ingesting")
+    parser.add_argument("--build-bm25", action="store_true",
+                        help="Rebuild the BM25 keyword index after ingesting")
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / '.env')
+    cli = CLIInterface("RAG Ingest")
+
+    index_path = args.index_path or os.environ.get("LOCAL_INDEX_PATH")
+    if not index_path:
+        cli.print_environment_error(["LOCAL_INDEX_PATH"])
+        return
+
+    pipeline = IngestPipeline(
+        index_path,
+        model=args.model,
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+    )
+
+    cli.start_loading(f"Ingesting {args.directory}...")
+    try:
+        stats = pipeline.run(args.directory)
+    finally:
+        cli.stop_loading()
+    cli.print_success(f"Ingested {args.directory} into {index_path}")
+    cli.print_stats("Ingestion", stats)
+    cache_stats = embedding_cache_stats()
+    if cache_stats:
+        cli.print_stats("Embedding cache", cache_stats)
+
+    if args.build_ivf and pipeline.index is not None and len(pipeline.index):
+        cli.start_loading("Building IVF index...")
+        ivf = pipeline.index.build_ivf()
+        cli.stop_loading()
+        cli.print_success(f"Built IVF index with {ivf.n_lists} lists")
+
+    if args.build_bm25 and pipeline.index is not None:
+        index = pipeline.index
+        cli.start_loading("Building BM25 index...")
+        bm25 = BM25Index.build(index.iter_live_records(), len(index), index.version)
+        bm25.save(str(index.path))
+        cli.stop_loading()
+        cli.print_success(f"Built BM25 index with {len(bm25.vocabulary)} terms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterator
+
+
+STAGES = ["rewrite", "retrieve", "rerank", "format", "prompt", "first_token", "completion", "total"]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values (0 if empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class TurnTrace:
+    """
+    Timings and sizes for one question through the RAG path.
+
+    Stage timings are in seconds:
+        rewrite      turning a follow-up into a standalone query (in a conversation)
+        retrieve     querying the RAG source
+        rerank       re-scoring over-fetched candidates (if a reranker is set)
+        format       turning documents into prompt context
+        prompt       building the chat messages
+        first_token  from sending the LLM request to the first token
+        completion   from sending the LLM request to the last token
+        total        the whole turn
+
+    time_to_first_token is measured from the start of the turn, which is the
+    latency the user actually perceives.
+    """
+
+    def __init__(self, question: str = ""):
+        self.question = question
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.time_to_first_token: Optional[float] = None
+        self.prompt_tokens: Optional[int] = None
+        # Prompt tokens the provider served from its prompt prefix cache
+        self.cached_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+        self.context_chars = 0
+        self.num_documents = 0
+        self.cached = False
+        self.model: Optional[str] = None
+        self.hedged = False
+        self.error: Optional[str] = None
+        # Set when retrieval failed: RAGSourceError.to_dict()
+        self.retrieval_error: Optional[Dict[str, Any]] = None
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def mark_first_token(self, request_started: float):
+        if "first_token" not in self.stages:
+            now = time.perf_counter()
+            self.stages["first_token"] = now - request_started
+            self.time_to_first_token = now - self._start
+
+    def record_usage(self, usage: Any):
+        """Copy token counts from a litellm usage object, if the provider sent one."""
+        if usage is None:
+            return
+        self.prompt_tokens = getattr(usage, "prompt_tokens", self.prompt_tokens)
+        self.completion_tokens = getattr(usage, "completion_tokens", self.completion_tokens)
+
+        # OpenAI-style prompt_tokens_details.cached_tokens, or Anthropic's cache_read_input_tokens
+        details = getattr(usage, "prompt_tokens_details", None)
+        if isinstance(details, dict):
+            cached = details.get("cached_tokens")
+        else:
+            cached = getattr(details, "cached_tokens", None)
+        if cached is None:
+            cached = getattr(usage, "cache_read_input_tokens", None)
+        if cached is not None:
+            self.cached_tokens = cached
+
+    def finish(self):
+        self.stages["total"] = time.perf_counter() - self._start
+        if self.time_to_first_token is None:
+            self.time_to_first_token = self.stages["total"]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "started_at": self.started_at,
+            "stages": {name: round(seconds, 6) for name, seconds in self.stages.items()},
+            "time_to_first_token": self.time_to_first_token,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "completion_tokens": self.completion_tokens,
+            "context_chars": self.context_chars,
+            "num_documents": self.num_documents,
+            "cached": self.cached,
+            "model": self.model,
+            "hedged": self.hedged,
+            "error": self.error,
+            "retrieval_error": self.retrieval_error,
+        }
+
+
+class InstrumentationHook:
+    """Receives a TurnTrace after every turn. The base class does nothing."""
+
+    def on_turn(self, trace: TurnTrace):
+        pass
+
+
+class CompositeHook(InstrumentationHook):
+    def __init__(self, hooks: List[InstrumentationHook]):
+        self.hooks = hooks
+
+    def on_turn(self, trace: TurnTrace):
+        for hook in self.hooks:
+            hook.on_turn(trace)
+
+
+class HistogramAggregator(InstrumentationHook):
+    """Keeps the last `window` values of every stage and reports rolling percentiles."""
+
+    COUNTS = ["time_to_first_token", "prompt_tokens", "cached_tokens", "completion_tokens", "context_chars"]
+    METRICS = STAGES + COUNTS
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._values: Dict[str, deque] = {
+            metric: deque(maxlen=window) for metric in self.METRICS
+        }
+        self.turns = 0
+        self._lock = threading.Lock()
+
+    def on_turn(self, trace: TurnTrace):
+        self.add(trace.to_dict())
+
+    def add(self, record: Dict[str, Any]):
+        with self._lock:
+            self.turns += 1
+            for name, seconds in record.get("stages", {}).items():
+                if name in self._values:
+                    self._values[name].append(seconds)
+            for metric in self.COUNTS:
+                if record.get(metric) is not None:
+                    self._values[metric].append(record[metric])
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """p50/p95/p99 and sample count for every metric with data."""
+        with self._lock:
+            snapshot = {metric: list(values) for metric, values in self._values.items() if values}
+
+        return {
+            metric: {
+                "count": len(values),
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "p99": percentile(values, 99),
+            }
+            for metric, values in snapshot.items()
+        }
+
+    @classmethod
+    def from_jsonl(cls, path: str, window: int = 1000) -> "HistogramAggregator":
+        """Rebuild rolling percentiles from the last `window` turns of a trace log."""
+        aggregator = cls(window)
+        trace_path = Path(path)
+        if not trace_path.exists():
+            return aggregator
+
+        with open(trace_path, "r", encoding="utf-8") as f:
+            lines = deque(f, maxlen=window)
+        for line in lines:
+            try:
+                aggregator.add(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+        return aggregator
+
+
+class JsonLinesExporter(InstrumentationHook):
+    """Appends one JSON object per turn to a file."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def on_turn(self, trace: TurnTrace):
+        line = json.dumps(trace.to_dict()) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
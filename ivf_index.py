@@ -0,0 +1,229 @@
+import argparse
+import json
+import math
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+class IVFIndex:
+    """
+    Inverted-file approximate nearest-neighbour index for a LocalVectorIndex.
+
+    Rows are clustered with spherical k-means; a query is compared against
+    the centroids and only the `nprobe` closest lists are scanned. Each list's
+    vectors are stored contiguously (ivf_vectors.npy, memory-mapped), so a
+    probe is a single sequential read rather than a scattered gather.
+
+    The index covers the first `n_indexed` rows of the vector index. Rows
+    appended after the build are scanned exactly on every query until the IVF
+    index is rebuilt, so results never miss new data.
+    """
+
+    META = "ivf.json"
+    CENTROIDS = "ivf_centroids.npy"
+    OFFSETS = "ivf_offsets.npy"
+    ROWS = "ivf_rows.npy"
+    VECTORS = "ivf_vectors.npy"
+
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray, rows: np.ndarray,
+                 vectors: np.ndarray, n_indexed: int):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.rows = rows
+        self.vectors = vectors
+        self.n_indexed = n_indexed
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    @staticmethod
+    def default_n_lists(n_rows: int) -> int:
+        return max(1, min(n_rows, int(4 * math.sqrt(n_rows))))
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, n_lists: Optional[int] = None,
+              iterations: int = 10, sample_size: Optional[int] = None,
+              batch_size: int = 65536, seed: int = 0,
+              path: Optional[str] = None) -> "IVFIndex":
+        """
+        Cluster L2-normalized embeddings into inverted lists.
+
+        k-means is trained on a random sample (by default 64 points per list)
+        and then every row is assigned to its closest centroid in batches.
+        When `path` is given the index is written there as it is built, with
+        the reordered vectors going straight to a memory-mapped file, so
+        memory stays bounded for corpora larger than RAM.
+        """
+        n_rows = len(embeddings)
+        if n_rows == 0:
+            raise ValueError("Cannot build an IVF index over an empty index")
+
+        n_lists = n_lists or cls.default_n_lists(n_rows)
+        n_lists = min(n_lists, n_rows)
+        rng = np.random.default_rng(seed)
+
+        sample_size = min(n_rows, sample_size or n_lists * 64)
+        sample_rows = np.sort(rng.choice(n_rows, size=sample_size, replace=False))
+        sample = np.asarray(embeddings[sample_rows], dtype=np.float32)
+
+        centroids = sample[rng.choice(sample_size, size=n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = cls._assign(sample, centroids, batch_size)
+            counts = np.bincount(assignment, minlength=n_lists)
+            sums = np.zeros_like(centroids)
+            order = np.argsort(assignment, kind="stable")
+            nonempty = np.flatnonzero(counts)
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[nonempty]
+            sums[nonempty] = np.add.reduceat(sample[order], starts, axis=0)
+
+            empty = counts == 0
+            if empty.any():
+                # Re-seed empty lists from random sample points
+                sums[empty] = sample[rng.choice(sample_size, size=int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = sums / norms
+
+        assignment = np.empty(n_rows, dtype=np.int32)
+        for start in range(0, n_rows, batch_size):
+            chunk = np.asarray(embeddings[start:start + batch_size], dtype=np.float32)
+            assignment[start:start + len(chunk)] = cls._assign(chunk, centroids, batch_size)
+
+        rows = np.argsort(assignment, kind="stable").astype(np.int64)
+        counts = np.bincount(assignment, minlength=n_lists)
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        shape = (n_rows, embeddings.shape[1])
+        if path:
+            vectors = np.lib.format.open_memmap(
+                Path(path) / cls.VECTORS, mode="w+", dtype=np.float32, shape=shape)
+        else:
+            vectors = np.empty(shape, dtype=np.float32)
+        for start in range(0, n_rows, batch_size):
+            vectors[start:start + batch_size] = embeddings[rows[start:start + batch_size]]
+
+        ivf = cls(centroids.astype(np.float32), offsets, rows, vectors, n_rows)
+        if path:
+            vectors.flush()
+            ivf.save(path)
+        return ivf
+
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray, batch_size: int) -> np.ndarray:
+        assignment = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), batch_size):
+            scores = vectors[start:start + batch_size] @ centroids.T
+            assignment[start:start + len(scores)] = scores.argmax(axis=1)
+        return assignment
+
+    @classmethod
+    def exists(cls, path: str) -> bool:
+        return (Path(path) / cls.META).exists()
+
+    def save(self, path: str):
+        index_path = Path(path)
+        np.save(index_path / self.CENTROIDS, self.centroids)
+        np.save(index_path / self.OFFSETS, self.offsets)
+        np.save(index_path / self.ROWS, self.rows)
+        vectors_path = index_path / self.VECTORS
+        already_written = (isinstance(self.vectors, np.memmap)
+                           and self.vectors.filename
+                           and Path(self.vectors.filename).resolve() == vectors_path.resolve())
+        if not already_written:
+            np.save(vectors_path, self.vectors)
+        (index_path / self.META).write_text(json.dumps({
+            "n_lists": self.n_lists,
+            "n_indexed": self.n_indexed,
+        }, indent=2))
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        index_path = Path(path)
+        meta = json.loads((index_path / cls.META).read_text())
+        return cls(
+            centroids=np.load(index_path / cls.CENTROIDS),
+            offsets=np.load(index_path / cls.OFFSETS),
+            rows=np.load(index_path / cls.ROWS, mmap_mode="r"),
+            vectors=np.load(index_path / cls.VECTORS, mmap_mode="r"),
+            n_indexed=meta["n_indexed"],
+        )
+
+    def search(self, query: np.ndarray, k: int, nprobe: int = 8,
+               tail: Optional[np.ndarray] = None,
+               deleted: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        Approximate top-k search. `query` must be L2-normalized.
+
+        Args:
+            query: Query vector
+            k: Number of results
+            nprobe: Number of inverted lists to scan; higher means better
+                recall and slower queries
+            tail: Rows of the vector index appended after the build
+                (rows n_indexed onwards), scanned exactly
+            deleted: Boolean mask over all rows; masked rows are skipped
+
+        Returns:
+            (row, score) pairs, best first
+        """
+        nprobe = max(1, min(nprobe, self.n_lists))
+        centroid_scores = self.centroids @ query
+        if nprobe < self.n_lists:
+            probe = np.argpartition(centroid_scores, -nprobe)[-nprobe:]
+        else:
+            probe = np.arange(self.n_lists)
+
+        candidate_rows = []
+        candidate_scores = []
+        for list_id in probe:
+            start, end = self.offsets[list_id], self.offsets[list_id + 1]
+            if start == end:
+                continue
+            candidate_rows.append(self.rows[start:end])
+            candidate_scores.append(self.vectors[start:end] @ query)
+
+        if tail is not None and len(tail):
+            candidate_rows.append(np.arange(self.n_indexed, self.n_indexed + len(tail)))
+            candidate_scores.append(tail @ query)
+
+        if not candidate_rows:
+            return []
+
+        rows = np.concatenate(candidate_rows)
+        scores = np.concatenate(candidate_scores)
+        if deleted is not None:
+            keep = ~deleted[rows]
+            rows, scores = rows[keep], scores[keep]
+            if not len(rows):
+                return []
+        k = min(k, len(rows))
+        if k < len(rows):
+            top = np.argpartition(scores, -k)[-k:]
+        else:
+            top = np.arange(len(rows))
+        top = top[np.argsort(-scores[top])]
+        return [(int(rows[i]), float(scores[i])) for i in top]
+
+
+def main():
+    from cli_interface import CLIInterface
+    from local_index import LocalVectorIndex
+
+    parser = argparse.ArgumentParser(description="Build an IVF index for a local vector index")
+    parser.add_argument("index_path", help="Directory of the local vector index")
+    parser.add_argument("--lists", type=int, default=None,
+                        help="Number of inverted lists (default: 4 * sqrt(rows))")
+    parser.add_argument("--iterations", type=int, default=10)
+    args = parser.parse_args()
+
+    index = LocalVectorIndex(args.index_path)
+    ivf = index.build_ivf(n_lists=args.lists, iterations=args.iterations)
+    CLIInterface().print_success(f"Built IVF index with {ivf.n_lists} lists over {ivf.n_indexed} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+from cli_interface import Config
+
+
+# litellm takes seconds to import, so it is only loaded on the first request
+# (or by warm_up()). Tests and benchmarks replace these two functions with mocks.
+def completion(**kwargs) -> Any:
+    import litellm
+    return litellm.completion(**kwargs)
+
+
+async def acompletion(**kwargs) -> Any:
+    import litellm
+    return await litellm.acompletion(**kwargs)
+
+
+def warm_up():
+    """Import litellm now, e.g. in a background thread while the CLI starts."""
+    import litellm
+
+
+class LLMRouterError(Exception):
+    """Every model in the route failed or timed out."""
+
+    def __init__(self, failures: List[Tuple[str, str]]):
+        super().__init__("; ".join(f"{model}: {error}" for model, error in failures))
+        self.failures = failures
+
+
+class _Attempt:
+    """One request to one model, run in a worker thread."""
+
+    def __init__(self, model: str, deadline: float, hedge: bool):
+        self.model = model
+        self.deadline = deadline
+        self.hedge = hedge
+        self.pending: List[Any] = []
+        self.cancelled = threading.Event()
+
+
+def _has_content(chunk: Any) -> bool:
+    return bool(chunk.choices) and bool(chunk.choices[0].delta.content)
+
+
+class LLMRouter:
+    """
+    Sends chat completions to an ordered list of models through litellm.
+
+    The first model is tried first. If it fails, or has produced nothing
+    within its timeout, the next model is tried, and so on; LLMRouterError
+    is raised once all have failed. "Produced something" means the first
+    token when streaming and the whole response otherwise.
+
+    With `hedge_after` set, a request that has produced nothing after that
+    many seconds is hedged: a second request goes to the next model (or
+    the same one, if there is only one) and whichever answers first is
+    used. The other is abandoned, though a non-streaming request keeps
+    running to completion in its thread. Hedging trades some duplicate
+    requests for a much shorter tail when a provider slows down.
+    """
+
+    def __init__(self, models: Optional[List[str]] = None,
+                 timeouts: Optional[Dict[str, float]] = None,
+                 default_timeout: float = Config.LLM_TIMEOUT_SECONDS,
+                 hedge_after: Optional[float] = Config.LLM_HEDGE_AFTER_SECONDS,
+                 max_workers: int = Config.LLM_ROUTER_MAX_WORKERS):
+        self.models = models or [Config.LLM_MODEL] + Config.LLM_FALLBACK_MODELS
+        self.timeouts = Config.LLM_MODEL_TIMEOUTS if timeouts is None else timeouts
+        self.default_timeout = default_timeout
+        self.hedge_after = hedge_after
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "fallbacks": 0, "hedges": 0, "hedge_wins": 0,
+                       "timeouts": 0, "errors": 0, "failed": 0}
+        self._wins = {model: 0 for model in self.models}
+
+    def timeout_for(self, model: str) -> float:
+        return self.timeouts.get(model, self.default_timeout)
+
+    def _count(self, *counters: str):
+        with self._lock:
+            for counter in counters:
+                self._stats[counter] += 1
+
+    def _won(self, attempt: _Attempt):
+        with self._lock:
+            self._wins[attempt.model] = self._wins.get(attempt.model, 0) + 1
+            if attempt.hedge:
+                self._stats["hedge_wins"] += 1
+
+    def _run(self, attempt: _Attempt, messages: List[Dict[str, str]], stream: bool,
+             events: "queue.Queue", kwargs: Dict[str, Any]):
+        try:
+            if not stream:
+                response = completion(model=attempt.model, messages=messages,
+                                      timeout=self.timeout_for(attempt.model), **kwargs)
+                events.put((attempt, "response", response))
+                return
+
+            response = completion(model=attempt.model, messages=messages,
+                                  timeout=self.timeout_for(attempt.model), stream=True,
+                                  stream_options={"include_usage": True}, **kwargs)
+            for chunk in response:
+                if attempt.cancelled.is_set():
+                    return
+                events.put((attempt, "chunk", chunk))
+            events.put((attempt, "done", None))
+        except Exception as e:
+            events.put((attempt, "error", e))
+
+    def _route(self, messages: List[Dict[str, str]], stream: bool,
+               trace: Any, kwargs: Dict[str, Any]) -> Tuple[_Attempt, "queue.Queue", Any]:
+        """
+        Run attempts until one produces output.
+
+        Returns:
+            The winning attempt, the event queue its remaining chunks arrive
+            on, and its first event payload
+        """
+        events: "queue.Queue" = queue.Queue()
+        started = time.monotonic()
+        hedge_at = None if self.hedge_after is None else started + self.hedge_after
+        hedged = False
+        remaining = list(self.models)
+        active: List[_Attempt] = []
+        failures: List[Tuple[str, str]] = []
+
+        def launch(hedge: bool = False):
+            # A lone model is hedged against itself
+            model = remaining.pop(0) if remaining else self.models[0]
+            attempt = _Attempt(model, time.monotonic() + self.timeout_for(model), hedge)
+            active.append(attempt)
+            self._executor.submit(self._run, attempt, messages, stream, events, kwargs)
+
+        def fail(attempt: _Attempt, error: str, counter: str):
+            attempt.cancelled.set()
+            active.remove(attempt)
+            failures.append((attempt.model, error))
+            self._count(counter)
+
+        self._count("requests")
+        launch()
+        while True:
+            if not active:
+                if not remaining:
+                    self._count("failed")
+                    raise LLMRouterError(failures)
+                self._count("fallbacks")
+                launch()
+
+            wake = min(attempt.deadline for attempt in active)
+            if hedge_at is not None:
+                wake = min(wake, hedge_at)
+            try:
+                attempt, kind, payload = events.get(timeout=max(0.0, wake - time.monotonic()))
+            except queue.Empty:
+                now = time.monotonic()
+                for attempt in [a for a in active if now >= a.deadline]:
+                    fail(attempt, f"no response within {self.timeout_for(attempt.model)}s", "timeouts")
+                if hedge_at is not None and now >= hedge_at:
+                    hedge_at = None
+                    if active:
+                        self._count("hedges")
+                        launch(hedge=True)
+                        hedged = True
+                continue
+
+            if attempt not in active:
+                # Late output from an attempt that already lost or timed out
+                continue
+            if kind == "error":
+                fail(attempt, str(payload), "errors")
+                continue
+            if kind == "chunk" and not _has_content(payload):
+                attempt.pending.append(payload)
+                continue
+
+            for other in active:
+                if other is not attempt:
+                    other.cancelled.set()
+            self._won(attempt)
+            if trace is not None:
+                trace.model = attempt.model
+                trace.hedged = hedged
+            return attempt, events, payload
+
+    def complete(self, messages: List[Dict[str, str]], trace: Any = None, **kwargs) -> Any:
+        """
+        Returns:
+            The litellm response of the first model to answer
+
+        Raises:
+            LLMRouterError: every model failed or timed out
+        """
+        return self._route(messages, False, trace, kwargs)[2]
+
+    def stream(self, messages: List[Dict[str, str]], trace: Any = None, **kwargs) -> Iterator[Any]:
+        """
+        Yield litellm stream chunks from the first model to produce a token.
+
+        Fallback and hedging only happen before the first token; an error
+        after it is raised, since another model would start the answer over.
+        """
+        attempt, events, first = self._route(messages, True, trace, kwargs)
+        try:
+            yield from attempt.pending
+            if first is None:
+                return
+            yield first
+
+            while True:
+                owner, kind, payload = events.get()
+                if owner is not attempt:
+                    continue
+                if kind == "chunk":
+                    yield payload
+                elif kind == "done":
+                    return
+                else:
+                    raise payload
+        finally:
+            attempt.cancelled.set()
+
+    async def acomplete(self, messages: List[Dict[str, str]], trace: Any = None, **kwargs) -> Any:
+        """Asynchronous complete(), with the same fallback and hedging."""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        hedge_at = None if self.hedge_after is None else started + self.hedge_after
+        hedged = False
+        remaining = list(self.models)
+        active: Dict[asyncio.Task, _Attempt] = {}
+        failures: List[Tuple[str, str]] = []
+
+        def launch(hedge: bool = False):
+            model = remaining.pop(0) if remaining else self.models[0]
+            timeout = self.timeout_for(model)
+            task = asyncio.ensure_future(acompletion(
+                model=model, messages=messages, timeout=timeout, **kwargs))
+            active[task] = _Attempt(model, loop.time() + timeout, hedge)
+
+        def fail(task: asyncio.Task, error: str, counter: str):
+            task.cancel()
+            attempt = active.pop(task)
+            failures.append((attempt.model, error))
+            self._count(counter)
+
+        self._count("requests")
+        launch()
+        try:
+            while True:
+                if not active:
+                    if not remaining:
+                        self._count("failed")
+                        raise LLMRouterError(failures)
+                    self._count("fallbacks")
+                    launch()
+
+                wake = min(attempt.deadline for attempt in active.values())
+                if hedge_at is not None:
+                    wake = min(wake, hedge_at)
+                done, _ = await asyncio.wait(active, timeout=max(0.0, wake - loop.time()),
+                                             return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    if task.exception() is not None:
+                        fail(task, str(task.exception()), "errors")
+                        continue
+                    attempt = active.pop(task)
+                    self._won(attempt)
+                    if trace is not None:
+                        trace.model = attempt.model
+                        trace.hedged = hedged
+                    return task.result()
+
+                now = loop.time()
+                for task in [t for t, a in active.items() if now >= a.deadline]:
+                    fail(task, f"no response within {self.timeout_for(active[task].model)}s", "timeouts")
+                if hedge_at is not None and now >= hedge_at:
+                    hedge_at = None
+                    if active:
+                        self._count("hedges")
+                        launch(hedge=True)
+                        hedged = True
+        finally:
+            for task in active:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            for model, wins in self._wins.items():
+                stats[f"{model}_answers"] = wins
+        return stats
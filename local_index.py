@@ -0,0 +1,365 @@
+import json
+import mmap
+import os
+import uuid
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple, Union
+
+import numpy as np
+
+from ivf_index import IVFIndex
+
+
+class LocalVectorIndex:
+    """
+    On-disk vector index searched in-process with NumPy.
+
+    An index is a directory holding:
+        manifest.json    dimension, row count, capacity and embedding model
+        embeddings.npy   float32 matrix of L2-normalized rows, memory-mapped
+        metadata.jsonl   one JSON record per row (source_display_name, ...)
+        chunks.bin       the rows' texts, UTF-8, back to back, memory-mapped;
+                         each record's "text_span" is its [offset, length]
+        deleted.npy      rows that have been deleted (optional)
+
+    Texts stay in the page cache rather than on the Python heap: search
+    results point into the chunk store by offset and length (text_span()),
+    and are sliced and decoded only if their text is read.
+    Indexes from before the chunk store keep "text" in their records.
+
+    The embeddings file is over-allocated and grown geometrically, so
+    appending a batch only writes the new rows. The manifest is replaced
+    atomically after each append, and rows past its count are ignored, so an
+    interrupted append never exposes half-written data.
+    """
+
+    # Most query-by-row scores held at once by search_batch (float32, so 4 bytes each)
+    SEARCH_BATCH_MAX_SCORES = 32 * 1024 * 1024
+
+    MANIFEST = "manifest.json"
+    EMBEDDINGS = "embeddings.npy"
+    METADATA = "metadata.jsonl"
+    CHUNKS = "chunks.bin"
+    DELETED = "deleted.npy"
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        manifest_path = self.path / self.MANIFEST
+        if not manifest_path.exists():
+            raise FileNotFoundError(f"No local index found at {self.path}")
+
+        manifest = json.loads(manifest_path.read_text())
+        self.dim: int = manifest["dim"]
+        self.count: int = manifest["count"]
+        self.capacity: int = manifest["capacity"]
+        self.model: Optional[str] = manifest.get("model")
+        self.version: str = manifest["version"]
+        self._metadata_size: int = manifest.get("metadata_size", 0)
+        self._chunks_size: int = manifest.get("chunks_size", 0)
+        self._chunks: Optional[memoryview] = self._map_chunks()
+
+        self._embeddings = np.load(
+            self.path / self.EMBEDDINGS, mmap_mode="r+")
+        self._records: List[Dict[str, Any]] = self._load_records()
+        self._deleted = np.zeros(self.capacity, dtype=bool)
+        if (self.path / self.DELETED).exists():
+            self._deleted[np.load(self.path / self.DELETED)] = True
+        self.ivf: Optional[IVFIndex] = self._load_ivf()
+
+    @classmethod
+    def create(cls, path: str, dim: int, model: Optional[str] = None,
+               capacity: int = 1024) -> "LocalVectorIndex":
+        """Create an empty index directory and open it."""
+        index_path = Path(path)
+        index_path.mkdir(parents=True, exist_ok=True)
+        if (index_path / cls.MANIFEST).exists():
+            raise FileExistsError(f"A local index already exists at {index_path}")
+
+        np.lib.format.open_memmap(
+            index_path / cls.EMBEDDINGS, mode="w+", dtype=np.float32,
+            shape=(capacity, dim)).flush()
+        (index_path / cls.METADATA).touch()
+        (index_path / cls.CHUNKS).touch()
+        cls._write_manifest(index_path, {
+            "dim": dim,
+            "count": 0,
+            "capacity": capacity,
+            "model": model,
+            "version": uuid.uuid4().hex,
+            "metadata_size": 0,
+            "chunks_size": 0,
+        })
+        return cls(path)
+
+    @classmethod
+    def open_or_create(cls, path: str, dim: int, model: Optional[str] = None) -> "LocalVectorIndex":
+        if (Path(path) / cls.MANIFEST).exists():
+            return cls(path)
+        return cls.create(path, dim, model)
+
+    @staticmethod
+    def _write_manifest(index_path: Path, manifest: Dict[str, Any]):
+        tmp_path = index_path / (LocalVectorIndex.MANIFEST + ".tmp")
+        tmp_path.write_text(json.dumps(manifest, indent=2))
+        os.replace(tmp_path, index_path / LocalVectorIndex.MANIFEST)
+
+    def _load_records(self) -> List[Dict[str, Any]]:
+        records = []
+        with open(self.path / self.METADATA, "r", encoding="utf-8") as f:
+            for line in f:
+                if len(records) == self.count:
+                    break
+                records.append(json.loads(line))
+        return records
+
+    def _map_chunks(self) -> Optional[memoryview]:
+        if not self._chunks_size:
+            return None
+        with open(self.path / self.CHUNKS, "rb") as f:
+            # The mapping outlives the file object, and any memoryview into it keeps it alive
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))[:self._chunks_size]
+
+    def _load_ivf(self) -> Optional[IVFIndex]:
+        if not IVFIndex.exists(self.path):
+            return None
+        ivf = IVFIndex.load(self.path)
+        # An IVF index built before the index was recreated is useless
+        return ivf if ivf.n_indexed <= self.count else None
+
+    def build_ivf(self, n_lists: Optional[int] = None, iterations: int = 10) -> IVFIndex:
+        """Build (or rebuild) the approximate index over all current rows."""
+        self.ivf = IVFIndex.build(self.embeddings, n_lists=n_lists,
+                                  iterations=iterations, path=str(self.path))
+        return self.ivf
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        """The live rows of the embedding matrix (a view, not a copy)."""
+        return self._embeddings[:self.count]
+
+    def text_view(self, row: int) -> Union[memoryview, str]:
+        """The row's text: a memoryview of its UTF-8 bytes in the chunk store, not a copy."""
+        record = self._records[row]
+        span = record.get('text_span')
+        if span is None or self._chunks is None:
+            # An empty chunk store is never mapped: every span in it is empty
+            return record.get('text', '')
+        offset, length = span
+        return self._chunks[offset:offset + length]
+
+    def text_span(self, row: int) -> Optional[Tuple[memoryview, int, int]]:
+        """The chunk store, offset and length of the row's UTF-8 text, or None if there is no store to point into."""
+        span = self._records[row].get('text_span')
+        if span is None or self._chunks is None:
+            return None
+        return self._chunks, span[0], span[1]
+
+    def get_text(self, row: int) -> str:
+        text = self.text_view(row)
+        return text if isinstance(text, str) else str(text, "utf-8")
+
+    def get_record(self, row: int, with_text: bool = True) -> Dict[str, Any]:
+        """The row's metadata record, with its text decoded into 'text' unless with_text is False."""
+        record = self._records[row]
+        if with_text and 'text_span' in record:
+            return dict(record, text=self.get_text(row))
+        return record
+
+    def iter_live_records(self, with_text: bool = True):
+        """Yield (row, record) for every row that has not been deleted."""
+        for row in range(len(self._records)):
+            if not self._deleted[row]:
+                yield row, self.get_record(row, with_text)
+
+    def delete(self, rows: List[int]):
+        """
+        Mark rows as deleted. Their storage is kept, but search skips them.
+        """
+        if not len(rows):
+            return
+        self._deleted[np.asarray(rows, dtype=np.int64)] = True
+        tmp_path = self.path / (self.DELETED + ".tmp.npy")
+        np.save(tmp_path, np.flatnonzero(self._deleted[:self.count]))
+        os.replace(tmp_path, self.path / self.DELETED)
+        self._bump_version()
+
+    def _grow(self, needed: int):
+        capacity = max(self.capacity * 2, needed)
+        grown_path = self.path / (self.EMBEDDINGS + ".grow")
+        grown = np.lib.format.open_memmap(
+            grown_path, mode="w+", dtype=np.float32, shape=(capacity, self.dim))
+        grown[:self.count] = self._embeddings[:self.count]
+        grown.flush()
+        del grown
+
+        self._embeddings = None
+        os.replace(grown_path, self.path / self.EMBEDDINGS)
+        self._embeddings = np.load(
+            self.path / self.EMBEDDINGS, mmap_mode="r+")
+        self._deleted = np.concatenate(
+            [self._deleted, np.zeros(capacity - self.capacity, dtype=bool)])
+        self.capacity = capacity
+
+    def add(self, embeddings: np.ndarray, records: List[Dict[str, Any]]) -> List[int]:
+        """
+        Append a batch of embeddings with their metadata records.
+
+        Rows are L2-normalized on the way in so search can use a plain dot
+        product as cosine similarity.
+
+        Returns:
+            The row numbers assigned to the new entries
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if embeddings.ndim != 2 or embeddings.shape[1] != self.dim:
+            raise ValueError(
+                f"Expected embeddings of shape (n, {self.dim}), got {embeddings.shape}")
+        if len(embeddings) != len(records):
+            raise ValueError("embeddings and records must have the same length")
+        if not records:
+            return []
+
+        start = self.count
+        end = start + len(records)
+        if end > self.capacity:
+            self._grow(end)
+
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self._embeddings[start:end] = embeddings / norms
+        self._embeddings.flush()
+
+        # Texts go to the chunk store; the records keep where
+        records = [dict(record) for record in records]
+        texts = []
+        offset = self._chunks_size
+        for record in records:
+            data = record.pop('text', '').encode("utf-8")
+            record['text_span'] = [offset, len(data)]
+            texts.append(data)
+            offset += len(data)
+        with open(self.path / self.CHUNKS, "ab") as f:
+            # Drop anything left behind by an interrupted append
+            f.truncate(self._chunks_size)
+            f.write(b"".join(texts))
+        self._chunks_size = offset
+
+        with open(self.path / self.METADATA, "r+b") as f:
+            # Drop anything left behind by an interrupted append
+            f.seek(self._metadata_size)
+            f.truncate()
+            f.write("".join(
+                json.dumps(record, ensure_ascii=False) + "\n" for record in records
+            ).encode("utf-8"))
+            self._metadata_size = f.tell()
+
+        self._records.extend(records)
+        self.count = end
+        self._chunks = self._map_chunks()
+        self._bump_version()
+        return list(range(start, end))
+
+    def _bump_version(self):
+        self.version = uuid.uuid4().hex
+        self._write_manifest(self.path, {
+            "dim": self.dim,
+            "count": self.count,
+            "capacity": self.capacity,
+            "model": self.model,
+            "version": self.version,
+            "metadata_size": self._metadata_size,
+            "chunks_size": self._chunks_size,
+        })
+
+    def search(self, query: np.ndarray, k: int, nprobe: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Top-k search by cosine similarity.
+
+        Uses the IVF index when one has been built and `nprobe` is given,
+        otherwise scores every row exactly.
+
+        Returns:
+            (row, score) pairs, best first
+        """
+        if self.count == 0 or k <= 0:
+            return []
+
+        query = np.asarray(query, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        deleted = self._deleted[:self.count]
+        has_deleted = deleted.any()
+
+        if self.ivf is not None and nprobe:
+            tail = self._embeddings[self.ivf.n_indexed:self.count]
+            return self.ivf.search(query, k, nprobe=nprobe, tail=tail,
+                                   deleted=deleted if has_deleted else None)
+
+        scores = self.embeddings @ query
+        if has_deleted:
+            scores[deleted] = -np.inf
+        k = min(k, self.count)
+        if k < self.count:
+            top = np.argpartition(scores, -k)[-k:]
+        else:
+            top = np.arange(self.count)
+        top = top[np.argsort(-scores[top])]
+        return [(int(row), float(scores[row])) for row in top if scores[row] > -np.inf]
+
+    def search_batch(self, queries: np.ndarray, k: int,
+                     nprobe: Optional[int] = None) -> List[List[Tuple[int, float]]]:
+        """
+        Top-k search for many queries at once, as search() would answer each.
+
+        Exact search scores a block of queries against every row in one
+        matrix multiply rather than one matrix-vector product per query.
+        Blocks are sized to keep the score matrix under
+        SEARCH_BATCH_MAX_SCORES entries. IVF search is still per query.
+
+        Returns:
+            For every query, in order, (row, score) pairs, best first
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        if queries.ndim != 2 or queries.shape[1] != self.dim:
+            raise ValueError(f"Expected queries of shape (n, {self.dim}), got {queries.shape}")
+        if self.count == 0 or k <= 0:
+            return [[] for _ in range(len(queries))]
+
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        queries = queries / norms
+
+        deleted = self._deleted[:self.count]
+        has_deleted = deleted.any()
+
+        if self.ivf is not None and nprobe:
+            tail = self._embeddings[self.ivf.n_indexed:self.count]
+            return [
+                self.ivf.search(query, k, nprobe=nprobe, tail=tail,
+                                deleted=deleted if has_deleted else None)
+                for query in queries
+            ]
+
+        k = min(k, self.count)
+        block = max(1, self.SEARCH_BATCH_MAX_SCORES // self.count)
+        results = []
+        for start in range(0, len(queries), block):
+            scores = queries[start:start + block] @ self.embeddings.T
+            if has_deleted:
+                scores[:, deleted] = -np.inf
+            if k < self.count:
+                top = np.argpartition(scores, -k, axis=1)[:, -k:]
+            else:
+                top = np.broadcast_to(np.arange(self.count), scores.shape)
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+            for rows, row_scores in zip(top.tolist(), top_scores.tolist()):
+                results.append([(row, score) for row, score in zip(rows, row_scores) if score > -np.inf])
+        return results
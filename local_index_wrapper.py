@@ -0,0 +1,85 @@
+import os
+from typing import List, Optional, Callable
+from rag_source_base import RAGSourceBase, RetrievalResult, RetrievedDocument
+from local_index import LocalVectorIndex
+from cli_interface import Config
+
+
+def index_document(index: LocalVectorIndex, row: int, score: float) -> RetrievedDocument:
+    """A row of the index as a RetrievedDocument, pointing into the chunk store rather than copying its text."""
+    record = index.get_record(row, with_text=False)
+    doc_id = record.get('id', str(row))
+    source, metadata = record.get('source_display_name', ''), record.get('metadata', {})
+    span = index.text_span(row)
+    if span is None:
+        return RetrievedDocument(doc_id, index.get_text(row), source, score, metadata)
+    return RetrievedDocument.in_store(doc_id, *span, source, score, metadata)
+
+
+class LocalIndexWrapper(RAGSourceBase):
+    """Retrieves documents from a LocalVectorIndex on disk, with no network hop for search."""
+
+    def __init__(self, index_path: Optional[str] = None,
+                 embed_fn: Optional[Callable[[str], List[float]]] = None,
+                 nprobe: Optional[int] = None,
+                 embed_batch_fn: Optional[Callable[[List[str]], List[List[float]]]] = None):
+        self.index_path = index_path or os.environ.get("LOCAL_INDEX_PATH")
+        # Only used if an IVF index has been built; 0 forces exact search
+        self.nprobe = nprobe if nprobe is not None else int(
+            os.environ.get("LOCAL_INDEX_NPROBE", Config.LOCAL_INDEX_NPROBE))
+
+        if not self.index_path:
+            raise ValueError("Missing required local index environment variables")
+
+        self.index = LocalVectorIndex(self.index_path)
+        self.embedding_model = self.index.model or Config.EMBEDDING_MODEL
+
+        if embed_fn is None:
+            from embeddings import embed_query, embed_queries
+            embed_fn = lambda text: embed_query(text, model=self.embedding_model)
+            if embed_batch_fn is None:
+                embed_batch_fn = lambda texts: embed_queries(texts, model=self.embedding_model)
+        self.embed_fn = embed_fn
+        self.embed_batch_fn = embed_batch_fn or (lambda texts: [embed_fn(text) for text in texts])
+
+    def retrieve_documents(self, question: str, num_results: int = 5) -> List[RetrievedDocument]:
+        query = self.embed_fn(question)
+        return [
+            self._to_document(row, score)
+            for row, score in self.index.search(query, num_results, nprobe=self.nprobe)
+        ]
+
+    def retrieve_documents_batch(self, questions: List[str], num_results: int = 5,
+                                 max_workers: int = Config.RETRIEVAL_BATCH_MAX_WORKERS) -> List[RetrievalResult]:
+        """
+        Embeds the questions a few hundred per request and scores them all
+        against the index together (see LocalVectorIndex.search_batch).
+
+        If a batch embedding request fails, the questions are retrieved one
+        by one instead, so only those that fail on their own get an error.
+        """
+        if not questions:
+            return []
+
+        try:
+            queries = []
+            for start in range(0, len(questions), Config.RETRIEVAL_BATCH_EMBED_SIZE):
+                queries.extend(self.embed_batch_fn(questions[start:start + Config.RETRIEVAL_BATCH_EMBED_SIZE]))
+        except Exception:
+            return super().retrieve_documents_batch(questions, num_results, max_workers)
+
+        return [
+            [self._to_document(row, score) for row, score in hits]
+            for hits in self.index.search_batch(queries, num_results, nprobe=self.nprobe)
+        ]
+
+    def _to_document(self, row: int, score: float) -> RetrievedDocument:
+        return index_document(self.index, row, score)
+
+    def get_document_set_version(self) -> Optional[str]:
+        return self.index.version
+
+    def get_required_env_vars(self) -> List[str]:
+        return [
+            "LOCAL_INDEX_PATH"
+        ]
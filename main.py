@@ -1,12 +1,23 @@
 import os
+import argparse
+import asyncio
+import threading
 import warnings
 from pathlib import Path
 from dotenv import load_dotenv
 from rag_chat import RAGChat
+from conversation import ConversationStore
+from batch_runner import BatchRunner
+from instrumentation import CompositeHook, HistogramAggregator, JsonLinesExporter
+from answer_cache import AnswerCache
+from caching_rag_source import CachingRAGSource, LRUCacheBackend, SqliteCacheBackend
+from prefetcher import RetrievalPrefetcher
+from embeddings import embed_query, embedding_cache_stats
 from cli_interface import CLIInterface, Config, Colors
 from rag_source_base import RAGSourceType, RAGSourceBase
 from vectorize_wrapper import VectorizeWrapper
-from pinecone_wrapper import PineconeWrapper
+from fanout_rag_source import FanoutRAGSource
+from reranker import Reranker, get_scorer
 
 # This is just to suppress warnings in our terminal
 warnings.filterwarnings("ignore", message="Pydantic serializer warnings")
@@ -30,14 +41,145 @@ def get_rag_source() -> tuple[RAGSourceBase | None, list[str]]:
     """
     if RAG_SOURCE == RAGSourceType.NONE:
         return None, []
-    elif RAG_SOURCE == RAGSourceType.VECTORIZE:
-        wrapper = VectorizeWrapper()
-        return wrapper, wrapper.get_required_env_vars()
-    elif RAG_SOURCE == RAGSourceType.PINECONE:
-        wrapper = PineconeWrapper()
-        return wrapper, wrapper.get_required_env_vars()
+
+    wrapper = create_source(RAG_SOURCE)
+    return with_retrieval_cache(wrapper), wrapper.get_required_env_vars()
+
+
+def create_source(source_type: RAGSourceType) -> RAGSourceBase:
+    # Sources other than Vectorize are imported when chosen: the local
+    # indexes pull in numpy, which a Vectorize-only run never needs
+    if source_type == RAGSourceType.VECTORIZE:
+        return VectorizeWrapper()
+    elif source_type == RAGSourceType.PINECONE:
+        from pinecone_wrapper import PineconeWrapper
+        return PineconeWrapper()
+    elif source_type == RAGSourceType.LOCAL:
+        from local_index_wrapper import LocalIndexWrapper
+        return LocalIndexWrapper()
+    elif source_type == RAGSourceType.HYBRID:
+        return get_hybrid_source()
+    elif source_type == RAGSourceType.FANOUT:
+        return get_fanout_source()
+    else:
+        raise ValueError(f"Unknown RAG source type: {source_type}")
+
+
+def get_hybrid_source() -> FanoutRAGSource:
+    """Vector search (Vectorize or the local index) fused with BM25 over the local index."""
+    from local_index_wrapper import LocalIndexWrapper
+    from bm25_wrapper import BM25Wrapper
+    from hybrid_rag_source import HybridRAGSource
+
+    if Config.HYBRID_VECTOR_SOURCE == "local":
+        vector = LocalIndexWrapper()
+        keyword = BM25Wrapper(index=vector.index)
+    else:
+        vector = VectorizeWrapper()
+        keyword = BM25Wrapper()
+    return HybridRAGSource([vector, keyword])
+
+
+def get_fanout_source() -> FanoutRAGSource:
+    """Every source in Config.FANOUT_SOURCES, queried together under per-source deadlines."""
+    names = Config.FANOUT_SOURCES
+    source_types = [RAGSourceType(name) for name in names]
+    if RAGSourceType.FANOUT in source_types or RAGSourceType.NONE in source_types:
+        raise ValueError("Config.FANOUT_SOURCES can only list retrieval sources")
+
+    return FanoutRAGSource(
+        [create_source(source_type) for source_type in source_types],
+        deadlines=[Config.FANOUT_SOURCE_DEADLINES.get(name, Config.FANOUT_DEADLINE_SECONDS)
+                   for name in names],
+        names=names
+    )
+
+
+def with_retrieval_cache(source: RAGSourceBase) -> RAGSourceBase:
+    if not Config.RETRIEVAL_CACHE_ENABLED:
+        return source
+
+    if Config.RETRIEVAL_CACHE_BACKEND == "sqlite":
+        backend = SqliteCacheBackend(
+            str(Path(__file__).parent / Config.RETRIEVAL_CACHE_PATH),
+            max_entries=Config.RETRIEVAL_CACHE_MAX_ENTRIES
+        )
     else:
-        raise ValueError(f"Unknown RAG source type: {RAG_SOURCE}")
+        backend = LRUCacheBackend(max_entries=Config.RETRIEVAL_CACHE_MAX_ENTRIES)
+
+    return CachingRAGSource(source, backend=backend,
+                            ttl_seconds=Config.RETRIEVAL_CACHE_TTL_SECONDS)
+
+
+def get_answer_cache() -> AnswerCache | None:
+    if not Config.ANSWER_CACHE_ENABLED:
+        return None
+
+    return AnswerCache(
+        str(Path(__file__).parent / Config.ANSWER_CACHE_PATH),
+        max_entries=Config.ANSWER_CACHE_MAX_ENTRIES,
+        ttl_seconds=Config.ANSWER_CACHE_TTL_SECONDS,
+        embed_fn=embed_query if Config.ANSWER_CACHE_SEMANTIC else None,
+        similarity_threshold=Config.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+        namespace=f"{Config.LLM_MODEL}:{RAG_SOURCE.value}"
+    )
+
+
+def get_reranker() -> Reranker | None:
+    if not Config.RERANK_ENABLED or RAG_SOURCE == RAGSourceType.NONE:
+        return None
+    return Reranker(get_scorer(Config.RERANK_SCORER))
+
+
+def get_prefetcher(rag_source: RAGSourceBase | None) -> RetrievalPrefetcher | None:
+    # Prefetched results are handed over through the retrieval cache
+    if not Config.PREFETCH_ENABLED or not isinstance(rag_source, CachingRAGSource):
+        return None
+    return RetrievalPrefetcher(rag_source)
+
+
+def get_instrumentation() -> tuple[CompositeHook, HistogramAggregator]:
+    aggregator = HistogramAggregator(window=Config.STATS_WINDOW)
+    hooks = [aggregator]
+    if Config.TRACE_LOG_ENABLED:
+        hooks.append(JsonLinesExporter(
+            str(Path(__file__).parent / Config.TRACE_LOG_PATH)))
+    return CompositeHook(hooks), aggregator
+
+
+def warm_up_in_background(rag: RAGChat):
+    """Load litellm and the source client while the user reads the banner or the batch file is read."""
+    def warm_up():
+        try:
+            rag.warm_up()
+        except Exception:
+            # The first question loads them again and reports the error
+            pass
+
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+
+def print_cache_stats(cli: CLIInterface, rag: RAGChat):
+    source = rag.rag_source
+    if isinstance(source, CachingRAGSource):
+        cli.print_stats("Retrieval cache", source.stats())
+        source = source.source
+    if isinstance(source, FanoutRAGSource):
+        cli.print_stats("Source timeouts", source.stats())
+    for backend in source.sources if isinstance(source, FanoutRAGSource) else [source]:
+        if isinstance(backend, VectorizeWrapper):
+            cli.print_stats("Vectorize client", backend.stats())
+    if rag.prefetcher:
+        cli.print_stats("Prefetch", rag.prefetcher.stats())
+    if rag.answer_cache:
+        cli.print_stats("Answer cache", rag.answer_cache.stats())
+    embedding_stats = embedding_cache_stats()
+    if embedding_stats:
+        cli.print_stats("Embedding cache", embedding_stats)
+    if rag.reranker:
+        cli.print_stats("Reranker", rag.reranker.stats())
+    if len(rag.router.models) > 1 or rag.router.hedge_after is not None:
+        cli.print_stats("LLM router", rag.router.stats())
 
 
 def check_environment_variables(rag_source_vars: list[str]) -> list[str]:
@@ -55,17 +197,114 @@ def check_environment_variables(rag_source_vars: list[str]) -> list[str]:
     return missing_vars
 
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=Config.APP_NAME)
+    parser.add_argument("--batch", metavar="INPUT",
+                        help="Answer every question in a JSONL file instead of chatting")
+    parser.add_argument("--output", metavar="OUTPUT",
+                        help="JSONL file for batch answers (default: INPUT with .answers.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=Config.BATCH_CONCURRENCY,
+                        help="Questions answered in parallel in batch mode")
+    parser.add_argument("--question-field", default="question",
+                        help="JSON field holding the question in batch mode")
+    parser.add_argument("--num-results", type=int, default=Config.DEFAULT_NUM_RESULTS)
+    parser.add_argument("--stats", action="store_true",
+                        help="Print rolling latency percentiles from the trace log and exit")
+    return parser.parse_args()
+
+
+def run_interactive(cli: CLIInterface, rag: RAGChat, aggregator: HistogramAggregator):
+    cli.print_exit_instructions()
+    # Follow-up questions are understood in the context of the session
+    conversation = ConversationStore(rag.router).get("cli")
+
+    while True:
+        try:
+            question = cli.get_user_input()
+
+            if question.lower() in Config.QUIT_COMMANDS:
+                print_cache_stats(cli, rag)
+                if aggregator.turns:
+                    cli.print_percentiles("Session latency", aggregator.summary())
+                cli.print_goodbye()
+                break
+
+            if not question:
+                cli.print_warning("Please enter a question")
+                continue
+
+            if Config.STREAM_ANSWERS:
+                cli.print_answer_stream(rag.chat_stream(question, conversation=conversation))
+            else:
+                answer = rag.chat(question, conversation=conversation)
+                cli.print_answer(answer)
+
+            cli.print_latency(**rag.last_latency)
+
+        except KeyboardInterrupt:
+            cli.stop_loading()
+            cli.print_info("\nOperation cancelled")
+            continue
+        except Exception as e:
+            cli.print_error(f"An error occurred: {e}")
+            continue
+
+
+def run_batch(cli: CLIInterface, rag: RAGChat, aggregator: HistogramAggregator,
+              args: argparse.Namespace):
+    output_path = args.output or str(Path(args.batch).with_suffix(".answers.jsonl"))
+    runner = BatchRunner(
+        rag,
+        concurrency=args.concurrency,
+        num_results=args.num_results,
+        question_field=args.question_field,
+        on_result=lambda result: cli.print_batch_progress(
+            runner.stats["answered"], runner.stats["failed"])
+    )
+
+    completed = len(BatchRunner.load_completed(Path(output_path)))
+    if completed:
+        cli.print_info(f"Resuming: {completed} questions already answered in {output_path}")
+    cli.print_info(f"Answering {args.batch} with concurrency {args.concurrency}")
+
+    stats = asyncio.run(runner.run(args.batch, output_path))
+
+    cli.end_batch_progress()
+    cli.print_success(f"Answers written to {output_path}")
+    cli.print_stats("Batch run", stats)
+    print_cache_stats(cli, rag)
+    cli.print_percentiles("Batch latency", aggregator.summary())
+
+
+def show_stats(cli: CLIInterface):
+    trace_path = Path(__file__).parent / Config.TRACE_LOG_PATH
+    aggregator = HistogramAggregator.from_jsonl(str(trace_path), window=Config.STATS_WINDOW)
+    cli.print_percentiles(
+        f"Latency over the last {aggregator.turns} turns ({trace_path.name})",
+        aggregator.summary())
+
+
 def main():
+    args = parse_args()
+
     app_name_suffix = {
         RAGSourceType.NONE: "",
         RAGSourceType.VECTORIZE: " with Vectorize",
-        RAGSourceType.PINECONE: " with Pinecone"
+        RAGSourceType.PINECONE: " with Pinecone",
+        RAGSourceType.LOCAL: " with Local Index",
+        RAGSourceType.HYBRID: " with Hybrid Search",
+        RAGSourceType.FANOUT: " with Multiple Sources"
     }
     app_name = Config.APP_NAME + app_name_suffix.get(RAG_SOURCE, "")
     cli = CLIInterface(app_name)
 
-    cli.clear_screen()
-    cli.print_welcome_banner()
+    if args.stats:
+        show_stats(cli)
+        return
+
+    if not args.batch:
+        cli.clear_screen()
+        cli.print_welcome_banner()
 
     env_loaded, env_message = load_environment()
 
@@ -88,50 +327,40 @@ def main():
     else:
         statuses.append((True, "All environment variables configured"))
 
+    hook, aggregator = get_instrumentation()
+
     try:
-        rag = RAGChat(cli, rag_source=rag_source_instance)
+        rag = RAGChat(cli, rag_source=rag_source_instance,
+                      answer_cache=get_answer_cache(), hook=hook,
+                      reranker=get_reranker(), prefetcher=get_prefetcher(rag_source_instance))
         statuses.append((True, "RAG Chat initialized successfully"))
-
-        if RAG_SOURCE == RAGSourceType.VECTORIZE:
-            statuses.append((True, "Connected to Vectorize and OpenAI"))
-        elif RAG_SOURCE == RAGSourceType.PINECONE:
-            statuses.append((True, "Connected to Pinecone and OpenAI"))
-        else:
-            statuses.append((True, "Connected to OpenAI"))
-
-        cli.print_status_box(statuses)
-
-        cli.print_exit_instructions()
-
-        while True:
-            try:
-                question = cli.get_user_input()
-
-                if question.lower() in Config.QUIT_COMMANDS:
-                    cli.print_goodbye()
-                    break
-
-                if not question:
-                    cli.print_warning("Please enter a question")
-                    continue
-
-                answer = rag.chat(question)
-                cli.print_answer(answer)
-
-            except KeyboardInterrupt:
-                cli.print_info("\nOperation cancelled")
-                continue
-            except Exception as e:
-                cli.print_error(f"An error occurred: {e}")
-                continue
-
+        if Config.WARM_UP_IN_BACKGROUND:
+            warm_up_in_background(rag)
     except Exception as e:
         statuses.append((False, f"Failed to initialize RAG Chat: {str(e)}"))
         cli.print_status_box(statuses)
         cli.print_error(f"Error: {e}")
+        return
 
-        if missing_vars:
-            cli.print_environment_error(missing_vars)
+    if RAG_SOURCE == RAGSourceType.VECTORIZE:
+        statuses.append((True, "Connected to Vectorize and OpenAI"))
+    elif RAG_SOURCE == RAGSourceType.PINECONE:
+        statuses.append((True, "Connected to Pinecone and OpenAI"))
+    elif RAG_SOURCE == RAGSourceType.LOCAL:
+        statuses.append((True, "Opened local index and connected to OpenAI"))
+    elif RAG_SOURCE == RAGSourceType.HYBRID:
+        statuses.append((True, "Opened vector and keyword indexes and connected to OpenAI"))
+    elif RAG_SOURCE == RAGSourceType.FANOUT:
+        statuses.append((True, f"Connected to {', '.join(Config.FANOUT_SOURCES)} and OpenAI"))
+    else:
+        statuses.append((True, "Connected to OpenAI"))
+
+    cli.print_status_box(statuses)
+
+    if args.batch:
+        run_batch(cli, rag, aggregator, args)
+    else:
+        run_interactive(cli, rag, aggregator)
 
 
 if __name__ == "__main__":
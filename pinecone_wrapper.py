@@ -1,6 +1,7 @@
 import os
-from typing import List, Dict, Any
-from rag_source_base import RAGSourceBase
+from typing import List
+from rag_source_base import RAGSourceBase, RetrievedDocument
+from cli_interface import terminal_renderer
 
 
 class PineconeWrapper(RAGSourceBase):
@@ -14,9 +15,9 @@ class PineconeWrapper(RAGSourceBase):
         if not all([self.api_key, self.environment, self.index_name]):
             raise ValueError("Missing required Pinecone environment variables")
 
-        print(f"Mock Pinecone initialized with index: {self.index_name}")
+        terminal_renderer().write(f"Mock Pinecone initialized with index: {self.index_name}\n")
 
-    def retrieve_documents(self, question: str, num_results: int = 5) -> List[Dict[str, Any]]:
+    def retrieve_documents(self, question: str, num_results: int = 5) -> List[RetrievedDocument]:
         """
         Mock implementation that returns sample documents.
         In a real implementation, this would query the Pinecone vector database.
@@ -24,19 +25,24 @@ class PineconeWrapper(RAGSourceBase):
         mock_documents = []
 
         for i in range(min(num_results, 3)):
-            mock_documents.append({
-                'text': f"This is a mock document {i+1} retrieved from Pinecone for query: '{question}'. "
+            mock_documents.append(RetrievedDocument(
+                id=f"pinecone_mock_{i+1}",
+                text=f"This is a mock document {i+1} retrieved from Pinecone for query: '{question}'. "
                 f"In a real implementation, this would contain actual content from your knowledge base.",
-                'source_display_name': f"mock_source_{i+1}.txt",
-                'relevancy': 0.95 - (i * 0.1),
-                'metadata': {
+                source_display_name=f"mock_source_{i+1}.txt",
+                relevancy=0.95 - (i * 0.1),
+                metadata={
                     'source': 'pinecone_mock',
                     'index': self.index_name
                 }
-            })
+            ))
 
         return mock_documents
 
+    async def aretrieve_documents(self, question: str, num_results: int = 5) -> List[RetrievedDocument]:
+        # The mock does no I/O, so there is nothing to offload to a thread
+        return self.retrieve_documents(question, num_results)
+
     def get_required_env_vars(self) -> List[str]:
         return [
             "PINECONE_API_KEY",
@@ -0,0 +1,140 @@
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Dict, Any, Iterable, Tuple
+from caching_rag_source import CachingRAGSource
+from cli_interface import Config
+
+# A sentence ending in a question mark, and a list marker before one
+QUESTION = re.compile(r"[^.!?\n]*\?")
+LIST_MARKER = re.compile(r"^[\s\-*•>\"'“]*(?:\d+[.)]\s*)?")
+
+
+def normalize_query(query: str) -> str:
+    """The form two queries must share to count as the same: case, spacing and end punctuation ignored."""
+    return " ".join(query.lower().split()).rstrip(" ?.!")
+
+
+def extract_follow_ups(answer: str, max_questions: int = Config.PREFETCH_MAX_FOLLOW_UPS) -> List[str]:
+    """
+    Questions the answer suggests asking next, such as a closing "You could
+    also ask: ...?" list. The last ones win, since answers put suggestions
+    at the end; questions of fewer than three words are ignored.
+    """
+    questions: "OrderedDict[str, str]" = OrderedDict()
+    for match in QUESTION.finditer(answer):
+        question = LIST_MARKER.sub("", match.group()).replace("**", "").strip()
+        if len(question.split()) >= 3:
+            questions.pop(normalize_query(question), None)
+            questions[normalize_query(question)] = question
+    return list(questions.values())[-max_questions:] if max_questions else []
+
+
+class RetrievalPrefetcher:
+    """
+    Retrieves likely next queries in the background and parks the results in the retrieval cache.
+
+    Speculation is per session. prefetch() queues candidate queries, such
+    as the question while its standalone rewrite is being generated, or
+    the follow-ups an answer suggests. When the session already has
+    max_candidates pending, a new candidate replaces the oldest one that
+    has not started, so the latest suggestions win. resolve() is then called with the
+    query actually retrieved: a candidate matching it is used, and every
+    other candidate of the session is cancelled if it has not started.
+    Candidates already running finish and stay cached, but count as
+    wasted, which is what stats()' waste ratio measures.
+    """
+
+    def __init__(self, source: CachingRAGSource,
+                 max_candidates: int = Config.PREFETCH_MAX_CANDIDATES,
+                 max_workers: int = Config.PREFETCH_MAX_WORKERS,
+                 max_sessions: int = Config.CONVERSATION_MAX_SESSIONS):
+        self.source = source
+        self.max_candidates = max_candidates
+        self.max_sessions = max_sessions
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        # session -> (normalized query, num_results) -> (query, future of whether it fetched anything)
+        self._pending: "OrderedDict[str, Dict[Tuple[str, int], Tuple[str, Future]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"speculated": 0, "already_cached": 0, "used": 0, "cancelled": 0, "wasted": 0}
+
+    def _fetch(self, query: str, num_results: int) -> bool:
+        fetched = self.source.prefetch(query, num_results)
+        if not fetched:
+            with self._lock:
+                self.counters["already_cached"] += 1
+        return fetched
+
+    def prefetch(self, session_id: str, queries: Iterable[str], num_results: int):
+        """Start retrieving queries the session may ask next, up to max_candidates pending at once."""
+        with self._lock:
+            pending = self._pending.setdefault(session_id, {})
+            self._pending.move_to_end(session_id)
+            for query in queries:
+                key = (normalize_query(query), num_results)
+                if key in pending or (len(pending) >= self.max_candidates and not self._make_room(pending)):
+                    continue
+                pending[key] = (query, self._executor.submit(self._fetch, query, num_results))
+                self.counters["speculated"] += 1
+
+            while len(self._pending) > self.max_sessions:
+                _, evicted = self._pending.popitem(last=False)
+                self._settle(evicted.values())
+
+    def _make_room(self, pending: Dict[Tuple[str, int], Tuple[str, Future]]) -> bool:
+        """Cancel the oldest candidate that has not started. Must hold the lock."""
+        for key, (_, future) in pending.items():
+            if future.cancel():
+                del pending[key]
+                self.counters["cancelled"] += 1
+                return True
+        return False
+
+    def resolve(self, session_id: str, query: str, num_results: int) -> str:
+        """
+        Settle the session's candidates against the query it is about to retrieve.
+
+        Returns:
+            The matching candidate's query, which is what the cache holds,
+            or the query itself if no candidate matches
+        """
+        with self._lock:
+            pending = self._pending.pop(session_id, {})
+            match = pending.pop((normalize_query(query), num_results), None)
+            if match is not None:
+                query, future = match
+                # Not started yet: the query is faster fetching it itself
+                if future.cancel():
+                    self.counters["cancelled"] += 1
+                elif self._fetched(future):
+                    self.counters["used"] += 1
+            self._settle(pending.values())
+        return query
+
+    def _settle(self, candidates: Iterable[Tuple[str, Future]]):
+        """Cancel candidates nobody asked for. Must hold the lock."""
+        for _, future in candidates:
+            if future.cancel():
+                self.counters["cancelled"] += 1
+            elif self._fetched(future):
+                self.counters["wasted"] += 1
+
+    @staticmethod
+    def _fetched(future: Future) -> bool:
+        """Whether a started candidate fetched, or is still fetching, results. A failed one is a miss."""
+        if not future.done():
+            return True
+        return future.exception() is None and future.result()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            fetched = self.counters["used"] + self.counters["wasted"]
+            return {
+                **self.counters,
+                "pending": sum(len(pending) for pending in self._pending.values()),
+                "waste_ratio": self.counters["wasted"] / fetched if fetched else 0.0,
+            }
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
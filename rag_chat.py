@@ -1,55 +1,91 @@
+import asyncio
 import os
+import time
 import warnings
-from typing import List, Dict, Any, Optional
-from litellm import completion
-from rag_source_base import RAGSourceBase
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+from rag_source_base import RAGSourceBase, RAGSourceError, RetrievedDocument
+from answer_cache import AnswerCache
+from context_builder import ContextBuilder
+from reranker import Reranker
+import llm_router
+from llm_router import LLMRouter
+from conversation import Conversation
+from prefetcher import RetrievalPrefetcher, extract_follow_ups
+from instrumentation import InstrumentationHook, TurnTrace
 from cli_interface import Config
 
 warnings.filterwarnings("ignore", category=UserWarning, module="pydantic")
 
 
 class RAGChat:
-    def __init__(self, cli_interface, rag_source: Optional[RAGSourceBase] = None):
+    def __init__(self, cli_interface, rag_source: Optional[RAGSourceBase] = None,
+                 answer_cache: Optional[AnswerCache] = None,
+                 hook: Optional[InstrumentationHook] = None,
+                 context_builder: Optional[ContextBuilder] = None,
+                 reranker: Optional[Reranker] = None,
+                 router: Optional[LLMRouter] = None,
+                 prompt_layout: str = Config.PROMPT_LAYOUT,
+                 prefetcher: Optional[RetrievalPrefetcher] = None):
+        if prompt_layout not in ("prefix_cache", "classic"):
+            raise ValueError(f"Unknown prompt layout: {prompt_layout}")
+
         self.cli = cli_interface
         self.rag_source = rag_source
+        self.answer_cache = answer_cache
+        self.context_builder = context_builder or ContextBuilder()
+        self.reranker = reranker
+        self.router = router or LLMRouter()
+        self.prompt_layout = prompt_layout
+        self.prefetcher = prefetcher
+        self.hook = hook or InstrumentationHook()
+        self.last_trace: Optional[TurnTrace] = None
 
         self.openai_api_key = os.environ.get("OPENAI_API_KEY")
 
         if not self.openai_api_key:
             raise ValueError("Missing OPENAI_API_KEY environment variable")
 
-    def format_context(self, documents: List[Any]) -> str:
-        if not documents:
-            return "No relevant documents found."
-
-        context = "Here are the relevant documents:\n\n"
-        for i, doc in enumerate(documents, 1):
-            context += f"Document {i}:\n"
-
-            if hasattr(doc, 'text') or isinstance(doc, dict) and 'text' in doc:
-                text = doc.text if hasattr(doc, 'text') else doc['text']
-                context += f"Content: {text}\n"
-
-            if hasattr(doc, 'source_display_name') or isinstance(doc, dict) and 'source_display_name' in doc:
-                source = doc.source_display_name if hasattr(
-                    doc, 'source_display_name') else doc['source_display_name']
-                context += f"Source: {source}\n"
+    def warm_up(self):
+        """Load litellm and the RAG source's client now rather than on the first question."""
+        llm_router.warm_up()
+        if self.rag_source:
+            self.rag_source.warm_up()
 
-            if hasattr(doc, 'relevancy') or isinstance(doc, dict) and 'relevancy' in doc:
-                score = doc.relevancy if hasattr(
-                    doc, 'relevancy') else doc['relevancy']
-                context += f"Relevance Score: {score}\n"
+    def format_context(self, documents: List[Any]) -> str:
+        return self.context_builder.build(documents, stable=self.prompt_layout == "prefix_cache")
 
-            context += "\n"
+    def build_messages(self, question: str, context: str,
+                       history: Optional[List[Dict[str, str]]] = None) -> List[Dict[str, str]]:
+        """
+        history: earlier turns of the conversation, as chat messages, placed before the question.
 
-        return context
+        The "prefix_cache" layout orders the messages from most to least
+        stable (system prompt and context, history, question) so that
+        consecutive requests over the same documents share a long prefix
+        the provider can serve from its prompt cache.
+        """
+        if self.prompt_layout == "prefix_cache":
+            return [
+                {
+                    "role": "system",
+                    "content": Config.SYSTEM_CONTEXT_TEMPLATE.format(
+                        system_prompt=Config.SYSTEM_PROMPT,
+                        context=context
+                    )
+                },
+                *(history or []),
+                {
+                    "role": "user",
+                    "content": Config.QUESTION_PROMPT_TEMPLATE.format(question=question)
+                }
+            ]
 
-    def generate_answer(self, question: str, context: str) -> str:
-        messages = [
+        return [
             {
                 "role": "system",
                 "content": Config.SYSTEM_PROMPT
             },
+            *(history or []),
             {
                 "role": "user",
                 "content": Config.USER_PROMPT_TEMPLATE.format(
@@ -59,29 +95,313 @@ class RAGChat:
             }
         ]
 
+    def _complete(self, messages: List[Dict[str, str]], trace: TurnTrace) -> str:
+        request_started = time.perf_counter()
+        with trace.stage("completion"):
+            response = self.router.complete(messages, trace)
+        trace.mark_first_token(request_started)
+        trace.record_usage(getattr(response, "usage", None))
+        return response.choices[0].message.content
+
+    async def _acomplete(self, messages: List[Dict[str, str]], trace: TurnTrace) -> str:
+        request_started = time.perf_counter()
+        with trace.stage("completion"):
+            response = await self.router.acomplete(messages, trace)
+        trace.mark_first_token(request_started)
+        trace.record_usage(getattr(response, "usage", None))
+        return response.choices[0].message.content
+
+    def _complete_stream(self, messages: List[Dict[str, str]], trace: TurnTrace) -> Iterator[str]:
+        request_started = time.perf_counter()
+        for chunk in self.router.stream(messages, trace):
+            trace.record_usage(getattr(chunk, "usage", None))
+            if not chunk.choices:
+                continue
+            token = chunk.choices[0].delta.content
+            if token:
+                trace.mark_first_token(request_started)
+                yield token
+        trace.stages["completion"] = time.perf_counter() - request_started
+
+    def generate_answer(self, question: str, context: str) -> str:
+        try:
+            return self._complete(self.build_messages(question, context), TurnTrace(question))
+        except Exception as e:
+            return f"Error generating response: {e}"
+
+    async def agenerate_answer(self, question: str, context: str) -> str:
         try:
-            response = completion(
-                model="openai/gpt-4o-mini",
-                messages=messages
-            )
-            return response.choices[0].message.content
+            return await self._acomplete(self.build_messages(question, context), TurnTrace(question))
         except Exception as e:
             return f"Error generating response: {e}"
 
-    def chat(self, question: str, num_results: int = Config.DEFAULT_NUM_RESULTS) -> str:
+    def generate_answer_stream(self, question: str, context: str) -> Iterator[str]:
+        """Yield answer tokens as the model produces them."""
+        try:
+            yield from self._complete_stream(self.build_messages(question, context), TurnTrace(question))
+        except Exception as e:
+            yield f"Error generating response: {e}"
+
+    def _num_candidates(self, num_results: int) -> int:
+        return self.reranker.num_candidates(num_results) if self.reranker else num_results
+
+    @staticmethod
+    def _normalize(documents: List[Any]) -> List[RetrievedDocument]:
+        """The built-in sources already return RetrievedDocuments; others may return dicts."""
+        return [RetrievedDocument.from_any(doc) for doc in documents]
+
+    def prepare_context(self, question: str, num_results: int = Config.DEFAULT_NUM_RESULTS,
+                        trace: Optional[TurnTrace] = None) -> Tuple[List[Any], str]:
+        """Retrieve documents for the question and format them into prompt context."""
+        trace = trace or TurnTrace(question)
+
         if self.rag_source:
             self.cli.print_retrieving(question)
-            documents = self.rag_source.retrieve_documents(
-                question, num_results)
+            try:
+                with trace.stage("retrieve"):
+                    documents = self._normalize(self.rag_source.retrieve_documents(
+                        question, self._num_candidates(num_results)))
+            finally:
+                self.cli.stop_loading()
+            if self.reranker:
+                with trace.stage("rerank"):
+                    documents = self.reranker.rerank(question, documents, num_results)
 
             self.cli.print_documents_with_snippets(documents)
 
-            context = self.format_context(documents)
+            with trace.stage("format"):
+                context = self.format_context(documents)
         else:
-            context = "No external knowledge base available. Please answer based on your general knowledge."
             self.cli.print_info("Answering without document retrieval")
+            documents, context = [], Config.NO_SOURCE_CONTEXT
+
+        trace.num_documents = len(documents)
+        trace.context_chars = len(context)
+        return documents, context
 
-        self.cli.print_generating()
-        answer = self.generate_answer(question, context)
+    async def aprepare_context(self, question: str, num_results: int = Config.DEFAULT_NUM_RESULTS,
+                               trace: Optional[TurnTrace] = None) -> Tuple[List[Any], str]:
+        """Like prepare_context(), but retrieves asynchronously and does not touch the CLI."""
+        trace = trace or TurnTrace(question)
+
+        if self.rag_source:
+            with trace.stage("retrieve"):
+                documents = self._normalize(await self.rag_source.aretrieve_documents(
+                    question, self._num_candidates(num_results)))
+            if self.reranker:
+                with trace.stage("rerank"):
+                    documents = await asyncio.to_thread(
+                        self.reranker.rerank, question, documents, num_results)
+            with trace.stage("format"):
+                context = self.format_context(documents)
+        else:
+            documents, context = [], Config.NO_SOURCE_CONTEXT
+
+        trace.num_documents = len(documents)
+        trace.context_chars = len(context)
+        return documents, context
+
+    def _cached_answer(self, question: str, documents: List[Any], trace: TurnTrace,
+                       history: Optional[List[Dict[str, str]]] = None) -> Optional[str]:
+        # An answer that drew on a conversation's history is that session's alone
+        if not self.answer_cache or history:
+            return None
+
+        if self.rag_source:
+            self.answer_cache.sync_source_version(
+                self.rag_source.get_document_set_version())
+        answer = self.answer_cache.get(question, documents)
+        trace.cached = answer is not None
+        return answer
+
+    def _store_answer(self, question: str, documents: List[Any], answer: str,
+                      history: Optional[List[Dict[str, str]]] = None):
+        if self.answer_cache and answer and not history:
+            self.answer_cache.put(question, documents, answer)
+
+    def _standalone_query(self, question: str, num_results: int,
+                          conversation: Optional[Conversation], trace: TurnTrace) -> str:
+        """The query to retrieve and cache with: the question, or its standalone rewrite in a conversation."""
+        if conversation is None:
+            return question
+        if self.prefetcher is None:
+            with trace.stage("rewrite"):
+                return conversation.standalone_query(question)
+
+        num_candidates = self._num_candidates(num_results)
+        if conversation.turns:
+            # Questions that already stand alone come back from the rewrite unchanged
+            self.prefetcher.prefetch(conversation.session_id, [question], num_candidates)
+        with trace.stage("rewrite"):
+            query = conversation.standalone_query(question)
+        return self.prefetcher.resolve(conversation.session_id, query, num_candidates)
+
+    def _prefetch_follow_ups(self, answer: str, num_results: int, conversation: Optional[Conversation]):
+        """Retrieve the follow-up questions the answer suggests, before the user asks one."""
+        if self.prefetcher is not None and conversation is not None:
+            self.prefetcher.prefetch(conversation.session_id, extract_follow_ups(answer),
+                                     self._num_candidates(num_results))
+
+    @staticmethod
+    def _history(conversation: Optional[Conversation]) -> Optional[List[Dict[str, str]]]:
+        return conversation.messages() if conversation else None
+
+    @staticmethod
+    def _remember(conversation: Optional[Conversation], question: str, answer: str):
+        if conversation is not None and answer:
+            conversation.add_turn(question, answer)
+
+    @staticmethod
+    def _retrieval_failed(error: RAGSourceError, trace: TurnTrace) -> str:
+        trace.error = str(error)
+        trace.retrieval_error = error.to_dict()
+        return f"Error retrieving documents: {error}"
+
+    def _finish_turn(self, trace: TurnTrace):
+        trace.finish()
+        self.last_trace = trace
+        try:
+            self.hook.on_turn(trace)
+        except Exception:
+            # Instrumentation must never break a turn
+            pass
+
+    @property
+    def last_latency(self) -> Dict[str, float]:
+        """Time to first token and total latency of the last turn, in seconds."""
+        if not self.last_trace:
+            return {}
+        return {
+            "time_to_first_token": self.last_trace.time_to_first_token,
+            "total": self.last_trace.stages["total"]
+        }
+
+    def chat(self, question: str, num_results: int = Config.DEFAULT_NUM_RESULTS,
+             trace: Optional[TurnTrace] = None,
+             conversation: Optional[Conversation] = None) -> str:
+        """
+        Answer one question.
+
+        In a conversation, a follow-up is first rewritten into a standalone
+        query for retrieval, and the conversation's history is sent with the
+        question. Answers given with history are neither served from nor
+        stored in the answer cache, which is shared by every session.
+        """
+        trace = trace or TurnTrace(question)
+        query = self._standalone_query(question, num_results, conversation, trace)
+        try:
+            documents, context = self.prepare_context(query, num_results, trace)
+        except RAGSourceError as e:
+            answer = self._retrieval_failed(e, trace)
+            self._finish_turn(trace)
+            return answer
+
+        history = self._history(conversation)
+        answer = self._cached_answer(query, documents, trace, history)
+        if answer is not None:
+            self.cli.print_info("Answer served from cache")
+            self._remember(conversation, question, answer)
+            self._prefetch_follow_ups(answer, num_results, conversation)
+        else:
+            with trace.stage("prompt"):
+                messages = self.build_messages(question, context, history)
+            self.cli.print_generating()
+            try:
+                answer = self._complete(messages, trace)
+                self._store_answer(query, documents, answer, history)
+                self._remember(conversation, question, answer)
+                self._prefetch_follow_ups(answer, num_results, conversation)
+            except Exception as e:
+                trace.error = str(e)
+                answer = f"Error generating response: {e}"
+
+        self._finish_turn(trace)
+        return answer
+
+    def chat_stream(self, question: str, num_results: int = Config.DEFAULT_NUM_RESULTS,
+                    trace: Optional[TurnTrace] = None,
+                    conversation: Optional[Conversation] = None) -> Iterator[str]:
+        """
+        Like chat(), but yields the answer token by token.
+
+        Once the generator is exhausted, last_trace (or the TurnTrace passed
+        in) holds the stage timings of the turn, including the time to first
+        token.
+        """
+        trace = trace or TurnTrace(question)
+        query = self._standalone_query(question, num_results, conversation, trace)
+        try:
+            documents, context = self.prepare_context(query, num_results, trace)
+        except RAGSourceError as e:
+            yield self._retrieval_failed(e, trace)
+            self._finish_turn(trace)
+            return
+
+        history = self._history(conversation)
+        cached = self._cached_answer(query, documents, trace, history)
+        if cached is not None:
+            self.cli.print_info("Answer served from cache")
+            self._remember(conversation, question, cached)
+            self._prefetch_follow_ups(cached, num_results, conversation)
+            yield cached
+        else:
+            with trace.stage("prompt"):
+                messages = self.build_messages(question, context, history)
+            self.cli.print_generating()
+            tokens = []
+            try:
+                for token in self._complete_stream(messages, trace):
+                    tokens.append(token)
+                    yield token
+                answer = "".join(tokens)
+                self._store_answer(query, documents, answer, history)
+                self._remember(conversation, question, answer)
+                self._prefetch_follow_ups(answer, num_results, conversation)
+            except Exception as e:
+                trace.error = str(e)
+                yield f"Error generating response: {e}"
+
+        self._finish_turn(trace)
+
+    async def achat(self, question: str, num_results: int = Config.DEFAULT_NUM_RESULTS,
+                    trace: Optional[TurnTrace] = None,
+                    conversation: Optional[Conversation] = None) -> str:
+        """
+        Asynchronous counterpart of chat() for serving many questions from one event loop.
+
+        Unlike chat(), this does not drive the CLI: spinners and document
+        previews make no sense when hundreds of questions are in flight.
+        Nor does it speculate with the prefetcher: batch questions are all
+        known up front. Pass a TurnTrace to read back the stage timings of this call;
+        last_trace is not reliable when calls overlap.
+        """
+        trace = trace or TurnTrace(question)
+        query = question
+        if conversation is not None:
+            with trace.stage("rewrite"):
+                query = await asyncio.to_thread(conversation.standalone_query, question)
+        try:
+            documents, context = await self.aprepare_context(query, num_results, trace)
+        except RAGSourceError as e:
+            answer = self._retrieval_failed(e, trace)
+            self._finish_turn(trace)
+            return answer
+
+        # The cache does sqlite I/O, and embeds the question in semantic mode
+        history = self._history(conversation)
+        answer = await asyncio.to_thread(self._cached_answer, query, documents, trace, history)
+        if answer is not None:
+            self._remember(conversation, question, answer)
+        else:
+            with trace.stage("prompt"):
+                messages = self.build_messages(question, context, history)
+            try:
+                answer = await self._acomplete(messages, trace)
+                await asyncio.to_thread(self._store_answer, query, documents, answer, history)
+                self._remember(conversation, question, answer)
+            except Exception as e:
+                trace.error = str(e)
+                answer = f"Error generating response: {e}"
 
+        self._finish_turn(trace)
         return answer
@@ -1,12 +1,182 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Union
 from enum import Enum
+from cli_interface import Config
+
+
+def get_document_field(doc: Any, field: str, default: Any = None) -> Any:
+    """Read a field from a retrieved document, whether it is a model object or a dict."""
+    if isinstance(doc, dict):
+        return doc.get(field, default)
+    return getattr(doc, field, default)
+
+
+def to_document_dict(doc: Any, relevancy: Optional[float] = None) -> Dict[str, Any]:
+    """Copy a retrieved document into the dict shape the local sources return, optionally rescored."""
+    return {
+        'id': get_document_field(doc, 'id'),
+        'text': get_document_field(doc, 'text', ''),
+        'source_display_name': get_document_field(doc, 'source_display_name', ''),
+        'relevancy': get_document_field(doc, 'relevancy') if relevancy is None else relevancy,
+        'metadata': get_document_field(doc, 'metadata', {}) or {}
+    }
+
+
+class RetrievedDocument:
+    """
+    One retrieved passage, in the shape every stage after retrieval reads.
+
+    Sources build these once, so the stages after them read attributes
+    instead of probing for dicts or API model objects. The text may be
+    given as UTF-8 bytes, or with in_store() as an offset and length into
+    a memory-mapped chunk store. It is then decoded when it is read and
+    never kept, so results held in a cache or by many sessions hold no
+    copies of their text, nor a buffer object per document.
+
+    doc['text'] and doc.get('text') still work, for code written against
+    the dicts sources used to return.
+    """
+
+    # With _length set, _text is a chunk store and the text is _length bytes at _offset in it
+    __slots__ = ("id", "source_display_name", "relevancy", "metadata", "_text", "_offset", "_length")
+
+    FIELDS = ("id", "text", "source_display_name", "relevancy", "metadata")
+
+    def __init__(self, id: Any, text: Union[str, bytes, memoryview] = "",
+                 source_display_name: str = "", relevancy: Optional[float] = None,
+                 metadata: Optional[Dict[str, Any]] = None):
+        self.id = id
+        self.source_display_name = source_display_name or ""
+        self.relevancy = relevancy
+        self.metadata = metadata if metadata is not None else {}
+        self._text = text
+        self._offset = 0
+        self._length = None
+
+    @classmethod
+    def in_store(cls, id: Any, store: memoryview, offset: int, length: int,
+                 source_display_name: str = "", relevancy: Optional[float] = None,
+                 metadata: Optional[Dict[str, Any]] = None) -> "RetrievedDocument":
+        """A document whose text is the length UTF-8 bytes at offset in store."""
+        doc = cls(id, store, source_display_name, relevancy, metadata)
+        doc._offset = offset
+        doc._length = length
+        return doc
+
+    @property
+    def text(self) -> str:
+        text = self._text
+        return text if isinstance(text, str) else str(self.text_bytes(), "utf-8")
+
+    def text_bytes(self) -> Union[bytes, memoryview]:
+        """The text as UTF-8, without decoding it (e.g. to hash it)."""
+        text = self._text
+        if self._length is not None:
+            return text[self._offset:self._offset + self._length]
+        return text.encode("utf-8") if isinstance(text, str) else text
+
+    def text_prefix(self, chars: int) -> str:
+        """Up to the first chars characters of the text, decoding no more of it than that needs."""
+        text = self._text
+        if isinstance(text, str):
+            return text[:chars]
+        # No character takes more than 4 bytes; a character cut off at the end is dropped
+        return str(self.text_bytes()[:chars * 4], "utf-8", errors="ignore")[:chars]
+
+    @classmethod
+    def from_any(cls, doc: Any) -> "RetrievedDocument":
+        """Convert a dict or API model document; a RetrievedDocument is returned as is."""
+        if isinstance(doc, cls):
+            return doc
+        return cls(
+            get_document_field(doc, 'id'),
+            get_document_field(doc, 'text', '') or '',
+            get_document_field(doc, 'source_display_name', ''),
+            get_document_field(doc, 'relevancy'),
+            get_document_field(doc, 'metadata', {}) or {},
+        )
+
+    def rescored(self, relevancy: float) -> "RetrievedDocument":
+        """A copy with another relevancy, sharing this one's text."""
+        doc = RetrievedDocument(self.id, self._text, self.source_display_name, relevancy, self.metadata)
+        doc._offset, doc._length = self._offset, self._length
+        return doc
+
+    def __getitem__(self, field: str) -> Any:
+        if field not in self.FIELDS:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def get(self, field: str, default: Any = None) -> Any:
+        return getattr(self, field) if field in self.FIELDS else default
+
+    def keys(self):
+        return self.FIELDS
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def __reduce__(self):
+        # Chunk stores and memoryviews cannot be pickled, e.g. into the SQLite retrieval cache
+        return (RetrievedDocument, (self.id, self.text, self.source_display_name,
+                                    self.relevancy, self.metadata))
+
+    def __repr__(self) -> str:
+        return (f"RetrievedDocument(id={self.id!r}, source_display_name={self.source_display_name!r}, "
+                f"relevancy={self.relevancy!r})")
+
+
+class RAGSourceError(Exception):
+    """
+    A retrieval failed. Raised by sources instead of returning no documents,
+    so callers can tell "nothing relevant" from "could not ask".
+    """
+
+    def __init__(self, message: str, source: str = "", status: Optional[int] = None,
+                 retryable: bool = False):
+        super().__init__(message)
+        self.source = source
+        self.status = status
+        self.retryable = retryable
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "type": type(self).__name__,
+            "message": str(self),
+            "source": self.source,
+            "status": self.status,
+            "retryable": self.retryable,
+        }
+
+
+class RAGSourceTimeout(RAGSourceError):
+    """The source did not answer within its timeout."""
+
+
+class RAGSourceUnavailable(RAGSourceError):
+    """The source's circuit breaker is open; the request was not attempted."""
+
+
+def as_source_error(error: Exception, source: str = "") -> RAGSourceError:
+    """The error itself if it is a RAGSourceError, otherwise one wrapping its message."""
+    if isinstance(error, RAGSourceError):
+        return error
+    return RAGSourceError(str(error) or type(error).__name__, source=source)
+
+
+# One question's result in a batch: its documents, or the error retrieving them failed with
+RetrievalResult = Union[List[Dict[str, Any]], RAGSourceError]
 
 
 class RAGSourceType(Enum):
     NONE = "none"
     VECTORIZE = "vectorize"
     PINECONE = "pinecone"
+    LOCAL = "local"
+    HYBRID = "hybrid"
+    FANOUT = "fanout"
 
 
 class RAGSourceBase(ABC):
@@ -26,6 +196,78 @@ class RAGSourceBase(ABC):
         """
         pass
 
+    async def aretrieve_documents(self, question: str, num_results: int = 5) -> List[Dict[str, Any]]:
+        """
+        Asynchronously retrieve relevant documents based on the question.
+
+        Sources without a native async client inherit this default, which runs
+        retrieve_documents in a worker thread so the event loop is not blocked.
+
+        Args:
+            question: The query string
+            num_results: Number of results to return
+
+        Returns:
+            List of documents with relevant content
+        """
+        return await asyncio.to_thread(self.retrieve_documents, question, num_results)
+
+    def retrieve_documents_batch(self, questions: List[str], num_results: int = 5,
+                                 max_workers: int = Config.RETRIEVAL_BATCH_MAX_WORKERS) -> List[RetrievalResult]:
+        """
+        Retrieve documents for many questions at once.
+
+        This default calls retrieve_documents for up to `max_workers`
+        questions concurrently, in threads. Sources that can do better, e.g.
+        by scoring every query in one pass, override it.
+
+        Args:
+            questions: The query strings
+            num_results: Number of results to return per question
+            max_workers: Most questions in flight at once
+
+        Returns:
+            One result per question, in input order: its documents, or the
+            RAGSourceError its retrieval failed with. A failing question
+            does not fail the rest of the batch.
+        """
+        if not questions:
+            return []
+
+        source = getattr(self, "NAME", type(self).__name__)
+
+        def retrieve(question: str) -> RetrievalResult:
+            try:
+                return self.retrieve_documents(question, num_results)
+            except Exception as e:
+                return as_source_error(e, source)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(questions))),
+                                thread_name_prefix="retrieve-batch") as executor:
+            return list(executor.map(retrieve, questions))
+
+    def warm_up(self):
+        """
+        Load clients and indexes ahead of the first question.
+
+        Optional: sources load lazily on first use either way. Callers can
+        run this in the background while the user is still reading the
+        banner, so the first question does not pay for it.
+        """
+        pass
+
+    def get_document_set_version(self) -> Optional[str]:
+        """
+        Identify the current version of the source's document set.
+
+        Caches use this to invalidate themselves when documents are added or
+        removed. Sources that cannot tell return None.
+
+        Returns:
+            An opaque version string, or None if unknown
+        """
+        return None
+
     @abstractmethod
     def get_required_env_vars(self) -> List[str]:
         """
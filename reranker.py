@@ -0,0 +1,193 @@
+import importlib.util
+import json
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import List, Dict, Any
+import llm_router
+from rag_source_base import RetrievedDocument
+from cli_interface import Config
+
+
+class RelevanceScorer(ABC):
+    """Scores passages against a question. Higher is more relevant; scales need not match across scorers."""
+
+    @abstractmethod
+    def score(self, question: str, passages: List[str]) -> List[float]:
+        pass
+
+
+class CrossEncoderScorer(RelevanceScorer):
+    """
+    Scores (question, passage) pairs with a local cross-encoder.
+
+    Needs the optional sentence-transformers package; the model is loaded on
+    first use.
+    """
+
+    def __init__(self, model_name: str = Config.RERANK_CROSS_ENCODER_MODEL):
+        # Fail at startup rather than silently falling back on every question
+        if importlib.util.find_spec("sentence_transformers") is None:
+            raise ImportError(
+                "CrossEncoderScorer needs sentence-transformers: uv add sentence-transformers")
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+                self._model = CrossEncoder(self.model_name)
+        return self._model
+
+    def score(self, question: str, passages: List[str]) -> List[float]:
+        model = self._load()
+        scores = model.predict([(question, passage) for passage in passages],
+                               batch_size=len(passages), show_progress_bar=False)
+        return [float(score) for score in scores]
+
+
+class LLMScorer(RelevanceScorer):
+    """Asks an LLM to rate a whole batch of passages in one request."""
+
+    PROMPT = (
+        "Rate how relevant each passage is to the question, from 0 (irrelevant) "
+        "to 10 (answers it directly). Reply with only a JSON array of numbers, "
+        "one per passage, in order.\n\nQuestion: {question}\n\n{passages}"
+    )
+
+    def __init__(self, model: str = Config.RERANK_LLM_MODEL,
+                 max_passage_chars: int = Config.RERANK_MAX_PASSAGE_CHARS,
+                 timeout: float = Config.RERANK_TIME_BUDGET_SECONDS):
+        self.model = model
+        self.max_passage_chars = max_passage_chars
+        # A request the reranker has given up on should not hold a worker much longer than that
+        self.timeout = timeout
+
+    def score(self, question: str, passages: List[str]) -> List[float]:
+        numbered = "\n\n".join(
+            f"Passage {i}:\n{passage[:self.max_passage_chars]}"
+            for i, passage in enumerate(passages, 1))
+        response = llm_router.completion(
+            model=self.model,
+            messages=[{"role": "user", "content": self.PROMPT.format(
+                question=question, passages=numbered)}],
+            temperature=0,
+            timeout=self.timeout
+        )
+
+        content = response.choices[0].message.content or ""
+        match = re.search(r"\[.*?\]", content, re.DOTALL)
+        scores = json.loads(match.group()) if match else None
+        if not isinstance(scores, list) or len(scores) != len(passages):
+            raise ValueError(f"Expected {len(passages)} relevance scores, got: {content[:200]}")
+        return [float(score) for score in scores]
+
+
+class Reranker:
+    """
+    Re-orders over-fetched candidates with a RelevanceScorer and keeps the best.
+
+    Candidates are scored in batches of `batch_size`, concurrently. If all
+    batches are not scored within `time_budget` seconds, or the scorer
+    fails, the candidates are returned in the source's order instead, so
+    reranking can make an answer better but never later than the budget.
+
+    The workers are shared by all questions. Batches that had not started
+    by the deadline are cancelled; those already running cannot be, and
+    while they fill every worker, questions skip reranking at once
+    instead of waiting out their budget behind them.
+    """
+
+    def __init__(self, scorer: RelevanceScorer,
+                 candidates: int = Config.RERANK_CANDIDATES,
+                 batch_size: int = Config.RERANK_BATCH_SIZE,
+                 time_budget: float = Config.RERANK_TIME_BUDGET_SECONDS,
+                 max_workers: int = Config.RERANK_MAX_WORKERS):
+        self.scorer = scorer
+        self.candidates = candidates
+        self.batch_size = batch_size
+        self.time_budget = time_budget
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rerank")
+        self._lock = threading.Lock()
+        self._abandoned = 0  # timed-out batches still running
+        self._stats = {"reranked": 0, "fallbacks": 0, "timeouts": 0, "errors": 0, "busy": 0}
+
+    def num_candidates(self, num_results: int) -> int:
+        """How many documents to retrieve so that num_results can be chosen from them."""
+        return max(num_results, self.candidates)
+
+    def _count(self, *counters: str):
+        with self._lock:
+            for counter in counters:
+                self._stats[counter] += 1
+
+    def _abandon(self, future: Future):
+        with self._lock:
+            self._abandoned += 1
+        future.add_done_callback(self._release)
+
+    def _release(self, future: Future):
+        with self._lock:
+            self._abandoned -= 1
+
+    def rerank(self, question: str, documents: List[Any], num_results: int) -> List[Any]:
+        """
+        Returns:
+            The num_results best documents, with the scorer's score as their
+            relevancy, or the first num_results in their original order on
+            timeout or error
+        """
+        if len(documents) <= 1:
+            return documents[:num_results]
+
+        documents = [RetrievedDocument.from_any(doc) for doc in documents]
+        with self._lock:
+            busy = self._abandoned >= self.max_workers
+        if busy:
+            self._count("fallbacks", "busy")
+            return documents[:num_results]
+
+        passages = [doc.text for doc in documents]
+        deadline = time.monotonic() + self.time_budget
+        futures = [
+            self._executor.submit(self.scorer.score, question, passages[start:start + self.batch_size])
+            for start in range(0, len(passages), self.batch_size)
+        ]
+
+        done, not_done = wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+        if not_done:
+            for future in not_done:
+                if not future.cancel():
+                    self._abandon(future)
+            self._count("fallbacks", "timeouts")
+            return documents[:num_results]
+
+        try:
+            scores = [score for future in futures for score in future.result()]
+        except Exception:
+            self._count("fallbacks", "errors")
+            return documents[:num_results]
+
+        order = sorted(range(len(documents)), key=lambda i: scores[i], reverse=True)
+        self._count("reranked")
+        return [documents[i].rescored(scores[i]) for i in order[:num_results]]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        total = stats["reranked"] + stats["fallbacks"]
+        stats["fallback_rate"] = stats["fallbacks"] / total if total else 0.0
+        return stats
+
+
+def get_scorer(name: str = Config.RERANK_SCORER) -> RelevanceScorer:
+    if name == "cross-encoder":
+        return CrossEncoderScorer()
+    if name == "llm":
+        return LLMScorer()
+    raise ValueError(f"Unknown rerank scorer: {name}")
@@ -0,0 +1,89 @@
+import random
+import threading
+import time
+from typing import Iterator, Optional
+from cli_interface import Config
+
+
+class RetryPolicy:
+    """
+    Bounded retries with full-jitter exponential backoff.
+
+    The n-th retry waits a random time between 0 and
+    min(max_delay, base_delay * 2 ** n), so clients that failed together do
+    not retry together.
+    """
+
+    def __init__(self, max_retries: int = Config.VECTORIZE_MAX_RETRIES,
+                 base_delay: float = Config.VECTORIZE_BACKOFF_BASE_SECONDS,
+                 max_delay: float = Config.VECTORIZE_BACKOFF_MAX_SECONDS):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delays(self) -> Iterator[float]:
+        """Yield the wait before each retry; exhausting it means giving up."""
+        for attempt in range(self.max_retries):
+            yield random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    Fails fast while a dependency is unhealthy.
+
+    After `failure_threshold` consecutive failed calls the circuit opens and
+    allow() refuses calls for `reset_timeout` seconds. Then it lets a single
+    trial call through (half-open): success closes the circuit, failure
+    opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = Config.CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout: float = Config.CIRCUIT_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.rejected = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+
+            self.rejected += 1
+            return False
+
+    def retry_after(self) -> float:
+        """Seconds until the circuit will let a trial call through."""
+        with self._lock:
+            if self.state != self.OPEN:
+                return 0.0
+            return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
@@ -0,0 +1,379 @@
+import argparse
+import json
+import signal
+import threading
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any, Optional, Tuple
+
+from rag_chat import RAGChat
+from conversation import Conversation, ConversationStore
+from caching_rag_source import CachingRAGSource
+from embeddings import embedding_cache_stats
+from fanout_rag_source import FanoutRAGSource
+from vectorize_wrapper import VectorizeWrapper
+from instrumentation import HistogramAggregator, TurnTrace
+from cli_interface import CLIInterface, QuietInterface, Config
+
+MAX_BODY_BYTES = 1 << 20
+
+
+class RAGRequestHandler(BaseHTTPRequestHandler):
+    """
+    Endpoints:
+        POST /chat          {"question": ..., "num_results": ..., "session_id": ...} -> JSON answer
+        POST /chat/stream   same body, answer tokens as a chunked text/plain body
+        GET  /metrics       request counters, latency percentiles and cache stats
+        GET  /health        200 while serving, 503 while draining
+
+    Requests with the same optional session_id share a conversation, so
+    follow-up questions are understood in context.
+    """
+
+    protocol_version = "HTTP/1.1"
+    server: "RAGServer"
+
+    def setup(self):
+        # Idle keep-alive connections are closed after this many seconds
+        self.timeout = self.server.keepalive_timeout
+        super().setup()
+
+    def log_message(self, format: str, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status: HTTPStatus, payload: Dict[str, Any],
+                   headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: HTTPStatus, message: str,
+                    headers: Optional[Dict[str, str]] = None):
+        self._send_json(status, {"error": message}, headers)
+
+    def _read_body(self) -> Optional[bytes]:
+        """Read the whole request body, so the connection can be reused for the next request."""
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # Where this body ends is unknown, so nothing after it on the connection can be read
+            self.close_connection = True
+            self._send_error(HTTPStatus.BAD_REQUEST, "Invalid Content-Length", {"Connection": "close"})
+            return None
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self._send_error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+            return None
+        return self.rfile.read(length)
+
+    def _parse_request(self, body: bytes) -> Tuple[str, int, Optional[Conversation]]:
+        request = json.loads(body or b"{}")
+        question = str(request.get("question", "")).strip()
+        if not question:
+            raise ValueError("Missing 'question'")
+        num_results = int(request.get("num_results", Config.DEFAULT_NUM_RESULTS))
+        if num_results <= 0:
+            raise ValueError("'num_results' must be positive")
+        session_id = request.get("session_id")
+        conversation = self.server.conversations.get(str(session_id)) if session_id else None
+        return question, num_results, conversation
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self._send_json(HTTPStatus.OK, self.server.metrics())
+        elif self.path == "/health":
+            draining = self.server.draining.is_set()
+            self._send_json(HTTPStatus.SERVICE_UNAVAILABLE if draining else HTTPStatus.OK,
+                            {"status": "draining" if draining else "ok"})
+        else:
+            self._send_error(HTTPStatus.NOT_FOUND, f"Unknown path {self.path}")
+
+    def do_POST(self):
+        body = self._read_body()
+        if body is None:
+            return
+
+        if self.path not in ("/chat", "/chat/stream"):
+            self._send_error(HTTPStatus.NOT_FOUND, f"Unknown path {self.path}")
+            return
+
+        if self.server.draining.is_set():
+            self.close_connection = True
+            self._send_error(HTTPStatus.SERVICE_UNAVAILABLE, "Server is shutting down",
+                             {"Connection": "close"})
+            return
+
+        try:
+            question, num_results, conversation = self._parse_request(body)
+        except (ValueError, TypeError, AttributeError) as e:
+            self._send_error(HTTPStatus.BAD_REQUEST, str(e))
+            return
+
+        if not self.server.acquire():
+            self._send_error(HTTPStatus.TOO_MANY_REQUESTS, "Server is at capacity",
+                             {"Retry-After": "1"})
+            return
+
+        try:
+            if self.path == "/chat":
+                self._chat(question, num_results, conversation)
+            else:
+                self._chat_stream(question, num_results, conversation)
+        finally:
+            self.server.release()
+
+    def _chat(self, question: str, num_results: int, conversation: Optional[Conversation]):
+        trace = TurnTrace(question)
+        try:
+            answer = self.server.rag.chat(question, num_results, trace=trace, conversation=conversation)
+        except Exception as e:
+            self.server.count("errors")
+            self._send_error(HTTPStatus.INTERNAL_SERVER_ERROR, f"Internal error: {e}")
+            return
+
+        if trace.retrieval_error:
+            self._send_retrieval_error(answer, trace)
+            return
+        if trace.error:
+            self.server.count("errors")
+            self._send_error(HTTPStatus.BAD_GATEWAY, answer)
+            return
+
+        self._send_json(HTTPStatus.OK, {
+            "answer": answer,
+            "cached": trace.cached,
+            "timings": trace.to_dict()["stages"],
+            "prompt_tokens": trace.prompt_tokens,
+            "completion_tokens": trace.completion_tokens,
+        })
+
+    def _send_retrieval_error(self, message: str, trace: TurnTrace):
+        self.server.count("errors")
+        # The knowledge base is down or shedding load, not this server
+        retryable = trace.retrieval_error["retryable"]
+        self._send_json(
+            HTTPStatus.SERVICE_UNAVAILABLE if retryable else HTTPStatus.BAD_GATEWAY,
+            {"error": message, "retrieval_error": trace.retrieval_error},
+            {"Retry-After": "1"} if retryable else None)
+
+    def _write_chunk(self, text: str):
+        data = text.encode("utf-8")
+        if data:
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+    def _chat_stream(self, question: str, num_results: int, conversation: Optional[Conversation]):
+        trace = TurnTrace(question)
+        tokens = self.server.rag.chat_stream(question, num_results, trace=trace,
+                                             conversation=conversation)
+        try:
+            # The headers wait for the first token, so a failure before it still gets a 500
+            try:
+                first = next(tokens, "")
+            except Exception as e:
+                self.server.count("errors")
+                self._send_error(HTTPStatus.INTERNAL_SERVER_ERROR, f"Internal error: {e}")
+                return
+            if trace.retrieval_error:
+                # The error is the whole answer; draining the generator also finishes the turn
+                self._send_retrieval_error(first + "".join(tokens), trace)
+                return
+
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", "text/plain; charset=utf-8")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+
+            self._write_chunk(first)
+            try:
+                for token in tokens:
+                    self._write_chunk(token)
+            except (BrokenPipeError, ConnectionResetError):
+                raise
+            except Exception as e:
+                # Too late for an error status: end the body with the error instead of cutting it off
+                trace.error = str(e)
+                self._write_chunk(f"\n\nError generating response: {e}")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away; stop generating for it
+            self.close_connection = True
+        finally:
+            tokens.close()
+
+        if trace.error:
+            self.server.count("errors")
+
+
+class RAGServer(ThreadingHTTPServer):
+    """
+    HTTP front end sharing one RAGChat (and so one RAG source client, and
+    one set of caches) across every request.
+
+    Each connection gets a thread and is kept alive between requests. At
+    most `max_concurrency` questions are answered at once; beyond that the
+    server answers 429 straight away rather than queueing work it cannot
+    finish in time.
+    """
+
+    daemon_threads = True
+    # The socketserver default of 5 resets connections under a burst of clients
+    request_queue_size = 128
+
+    def __init__(self, address: Tuple[str, int], rag: RAGChat,
+                 aggregator: Optional[HistogramAggregator] = None,
+                 max_concurrency: int = Config.SERVER_MAX_CONCURRENCY,
+                 keepalive_timeout: float = Config.SERVER_KEEPALIVE_TIMEOUT,
+                 verbose: bool = False):
+        super().__init__(address, RAGRequestHandler)
+        self.rag = rag
+        self.conversations = ConversationStore(rag.router)
+        self.aggregator = aggregator
+        self.max_concurrency = max_concurrency
+        self.keepalive_timeout = keepalive_timeout
+        self.verbose = verbose
+        self.draining = threading.Event()
+
+        self._in_flight = 0
+        self._state = threading.Condition()
+        self.counters = {"requests": 0, "rejected": 0, "errors": 0}
+
+    def acquire(self) -> bool:
+        with self._state:
+            if self._in_flight >= self.max_concurrency:
+                self.counters["rejected"] += 1
+                return False
+            self._in_flight += 1
+            self.counters["requests"] += 1
+            return True
+
+    def release(self):
+        with self._state:
+            self._in_flight -= 1
+            self._state.notify_all()
+
+    def count(self, counter: str):
+        with self._state:
+            self.counters[counter] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._state:
+            metrics: Dict[str, Any] = {
+                "in_flight": self._in_flight,
+                "max_concurrency": self.max_concurrency,
+                "draining": self.draining.is_set(),
+                **self.counters,
+            }
+        if self.aggregator:
+            metrics["latency"] = self.aggregator.summary()
+        source = self.rag.rag_source
+        if isinstance(source, CachingRAGSource):
+            metrics["retrieval_cache"] = source.stats()
+            if self.rag.prefetcher:
+                metrics["prefetch"] = self.rag.prefetcher.stats()
+            source = source.source
+        if isinstance(source, FanoutRAGSource):
+            metrics["sources"] = source.stats()
+        for backend in source.sources if isinstance(source, FanoutRAGSource) else [source]:
+            if isinstance(backend, VectorizeWrapper):
+                metrics["vectorize"] = backend.stats()
+        if self.rag.answer_cache:
+            metrics["answer_cache"] = self.rag.answer_cache.stats()
+        embedding_stats = embedding_cache_stats()
+        if embedding_stats:
+            metrics["embedding_cache"] = embedding_stats
+        if self.rag.reranker:
+            metrics["reranker"] = self.rag.reranker.stats()
+        metrics["llm"] = self.rag.router.stats()
+        metrics["conversations"] = self.conversations.stats()
+        return metrics
+
+    def drain(self, timeout: float) -> bool:
+        """
+        Refuse new questions and wait for in-flight ones to finish.
+
+        Returns:
+            True if every request finished within the timeout
+        """
+        self.draining.set()
+        with self._state:
+            return self._state.wait_for(lambda: self._in_flight == 0, timeout)
+
+
+def serve(server: RAGServer, shutdown_timeout: float = Config.SERVER_SHUTDOWN_TIMEOUT) -> bool:
+    """
+    Serve until SIGTERM or SIGINT, then shut down gracefully.
+
+    Must be called from the main thread. Returns True if every in-flight
+    request finished before the shutdown timeout.
+    """
+    def handle_signal(signum, frame):
+        server.draining.set()
+        # shutdown() waits for serve_forever() to return, so it cannot run on this thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    previous = {sig: signal.signal(sig, handle_signal)
+                for sig in (signal.SIGTERM, signal.SIGINT)}
+    try:
+        server.serve_forever()
+    finally:
+        drained = server.drain(shutdown_timeout)
+        server.server_close()
+        for sig, handler in previous.items():
+            signal.signal(sig, handler)
+    return drained
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=f"{Config.APP_NAME} HTTP server")
+    parser.add_argument("--host", default=Config.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=Config.SERVER_PORT)
+    parser.add_argument("--concurrency", type=int, default=Config.SERVER_MAX_CONCURRENCY,
+                        help="Questions answered at once before returning 429")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    return parser.parse_args()
+
+
+def main():
+    from main import (load_environment, get_rag_source, check_environment_variables,
+                      get_answer_cache, get_instrumentation, get_reranker, get_prefetcher)
+
+    args = parse_args()
+    cli = CLIInterface(f"{Config.APP_NAME} Server")
+    load_environment()
+
+    rag_source, required_vars = get_rag_source()
+    missing_vars = check_environment_variables(required_vars)
+    if missing_vars:
+        cli.print_environment_error(missing_vars)
+        return
+
+    hook, aggregator = get_instrumentation()
+    rag = RAGChat(QuietInterface(), rag_source=rag_source,
+                  answer_cache=get_answer_cache(), hook=hook,
+                  reranker=get_reranker(), prefetcher=get_prefetcher(rag_source))
+
+    # Pay for imports and client setup before accepting requests, not on the first one
+    rag.warm_up()
+
+    server = RAGServer((args.host, args.port), rag, aggregator,
+                       max_concurrency=args.concurrency, verbose=args.verbose)
+    cli.print_success(f"Serving on http://{args.host}:{server.server_port}")
+    cli.print_info("Press Ctrl+C to stop")
+
+    if serve(server):
+        cli.print_success("All requests finished, shut down cleanly")
+    else:
+        cli.print_warning("Shut down with requests still in flight")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,48 @@
-import vectorize_client as v
 import os
+import socket
 import ssl
-import urllib3
-from typing import List, Dict, Any
-from rag_source_base import RAGSourceBase
+import threading
+import time
+from typing import List, Dict, Any, Optional
+from rag_source_base import (RAGSourceBase, RAGSourceError, RAGSourceTimeout, RAGSourceUnavailable,
+                             RetrievalResult, RetrievedDocument)
+from resilience import RetryPolicy, CircuitBreaker
+from cli_interface import Config, terminal_renderer
 
-# Disable SSL warnings if we're bypassing verification
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+def _vectorize():
+    """The vectorize_client package, imported on first use: it takes over a second to import."""
+    import vectorize_client
+    return vectorize_client
+
+
+def _urllib3():
+    """urllib3, imported with the client rather than at startup, where it costs tens of milliseconds."""
+    import urllib3
+    import urllib3.connection
+    return urllib3
 
 
 class VectorizeWrapper(RAGSourceBase):
-    def __init__(self):
+    """
+    Retrieves from a Vectorize pipeline.
+
+    Requests share a pool of keep-alive connections and have explicit
+    connect and read timeouts. Timeouts, connection errors, 429 and 5xx
+    responses are retried with jittered exponential backoff; repeated
+    failures open a circuit breaker so that, while Vectorize is down,
+    questions fail at once instead of each waiting out its retries.
+    Failures are raised as RAGSourceError rather than returned as no
+    documents.
+    """
+
+    NAME = "vectorize"
+
+    def __init__(self, host: str = Config.VECTORIZE_HOST,
+                 pool_size: int = Config.VECTORIZE_POOL_SIZE,
+                 connect_timeout: float = Config.VECTORIZE_CONNECT_TIMEOUT,
+                 read_timeout: float = Config.VECTORIZE_READ_TIMEOUT,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 breaker: Optional[CircuitBreaker] = None):
         self.access_token = os.environ.get("VECTORIZE_PIPELINE_ACCESS_TOKEN")
         self.organization_id = os.environ.get("VECTORIZE_ORGANIZATION_ID")
         self.pipeline_id = os.environ.get("VECTORIZE_PIPELINE_ID")
@@ -19,6 +51,24 @@ class VectorizeWrapper(RAGSourceBase):
             raise ValueError(
                 "Missing required Vectorize environment variables")
 
+        self.host = host
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "retries": 0, "failures": 0, "rejected": 0}
+        # Built on first use: see _pipelines()
+        self._api = None
+        self._api_lock = threading.Lock()
+
+    def _build_client(self):
+        """SSL context, connection pool and API client; deferred until the first question or warm_up()."""
+        v = _vectorize()
+        urllib3 = _urllib3()
+        # Disable SSL warnings if we're bypassing verification
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
         # Create SSL context
         try:
             # Try to create a default SSL context first
@@ -30,42 +80,136 @@ class VectorizeWrapper(RAGSourceBase):
             ssl_context = ssl.create_default_context()
             ssl_context.check_hostname = False
             ssl_context.verify_mode = ssl.CERT_NONE
-            print("Warning: Using unverified SSL context due to certificate issues")
+            terminal_renderer().write("Warning: Using unverified SSL context due to certificate issues\n")
 
         api_config = v.Configuration(
             access_token=self.access_token,
-            host="https://api.vectorize.io/v1"
+            host=self.host
         )
-        
+        # One shared pool of keep-alive connections; TCP keepalive notices
+        # connections the server or a middlebox has silently dropped
+        api_config.connection_pool_maxsize = self.pool_size
+        api_config.socket_options = urllib3.connection.HTTPConnection.default_socket_options + [
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        ]
+        # Retries happen here, with backoff and the circuit breaker, not in urllib3
+        api_config.retries = False
+
         # Try to configure SSL context if the client supports it
         try:
             api_config.ssl_context = ssl_context
         except AttributeError:
             # If the client doesn't support ssl_context, we'll rely on system settings
             pass
-            
-        self.api_client = v.ApiClient(api_config)
-        self.pipelines = v.PipelinesApi(self.api_client)
 
-    def retrieve_documents(self, question: str, num_results: int = 5) -> List[Dict[str, Any]]:
+        return v.PipelinesApi(v.ApiClient(api_config))
+
+    def _pipelines(self):
+        with self._api_lock:
+            if self._api is None:
+                self._api = self._build_client()
+            return self._api
+
+    def warm_up(self):
+        self._pipelines()
+
+    def _count(self, counter: str):
+        with self._lock:
+            self._stats[counter] += 1
+
+    def _classify(self, error: Exception) -> RAGSourceError:
+        """Turn a client exception into a RAGSourceError saying whether a retry can help."""
+        v = _vectorize()
+        urllib3 = _urllib3()
+        if isinstance(error, v.ApiException):
+            status = error.status or None
+            if status is None and "SSLError" in str(error.reason):
+                return RAGSourceError(
+                    "SSL error talking to Vectorize. If on macOS, try running: "
+                    "/Applications/Python\\ 3.*/Install\\ Certificates.command",
+                    source=self.NAME)
+            retryable = status is None or status == 429 or status >= 500
+            return RAGSourceError(f"Vectorize returned {status}: {error.reason}",
+                                  source=self.NAME, status=status, retryable=retryable)
+        if isinstance(error, urllib3.exceptions.TimeoutError):
+            return RAGSourceTimeout(f"Vectorize timed out: {error}", source=self.NAME, retryable=True)
+        if isinstance(error, (urllib3.exceptions.HTTPError, ConnectionError)):
+            return RAGSourceError(f"Could not reach Vectorize: {error}", source=self.NAME, retryable=True)
+        return RAGSourceError(f"Error retrieving documents: {error}", source=self.NAME)
+
+    @staticmethod
+    def _retry_after(error: Exception) -> float:
+        headers = getattr(error, "headers", None) or {}
         try:
-            response = self.pipelines.retrieve_documents(
-                self.organization_id,
-                self.pipeline_id,
-                v.RetrieveDocumentsRequest(
-                    question=question,
-                    num_results=num_results,
+            return float(headers.get("Retry-After", 0))
+        except (TypeError, ValueError):
+            return 0.0
+
+    def retrieve_documents(self, question: str, num_results: int = 5) -> List[RetrievedDocument]:
+        """
+        Raises:
+            RAGSourceUnavailable: the circuit is open; Vectorize was not called
+            RAGSourceTimeout: the last attempt timed out
+            RAGSourceError: any other failure, after retrying those that may be transient
+        """
+        v = _vectorize()
+        pipelines = self._pipelines()
+        request = v.RetrieveDocumentsRequest(question=question, num_results=num_results)
+        delays = self.retry_policy.delays()
+
+        while True:
+            if not self.breaker.allow():
+                self._count("rejected")
+                self._count("failures")
+                raise RAGSourceUnavailable(
+                    f"Vectorize is failing; not retrying for {self.breaker.retry_after():.0f}s",
+                    source=self.NAME, retryable=True)
+
+            self._count("requests")
+            try:
+                response = pipelines.retrieve_documents(
+                    self.organization_id,
+                    self.pipeline_id,
+                    request,
+                    _request_timeout=self.timeout
                 )
-            )
-            return response.documents
-        except ssl.SSLError as e:
-            print(f"SSL Error retrieving documents: {e}")
-            print("This is likely due to certificate verification issues on macOS.")
-            print("Try running: /Applications/Python\\ 3.*/Install\\ Certificates.command")
-            return []
-        except Exception as e:
-            print(f"Error retrieving documents: {e}")
-            return []
+                self.breaker.record_success()
+                # Keep only what we use, not the API's pydantic models
+                return [RetrievedDocument.from_any(doc) for doc in response.documents]
+            except Exception as e:
+                error = self._classify(e)
+                if error.retryable:
+                    self.breaker.record_failure()
+                else:
+                    # The service answered; a bad request says nothing about its health
+                    self.breaker.record_success()
+                delay = next(delays, None) if error.retryable else None
+                if delay is None:
+                    self._count("failures")
+                    raise error from e
+                # Honour the server's Retry-After, within our own backoff cap
+                delay = min(max(delay, self._retry_after(e)), self.retry_policy.max_delay)
+
+            self._count("retries")
+            time.sleep(delay)
+
+    def retrieve_documents_batch(self, questions: List[str], num_results: int = 5,
+                                 max_workers: int = Config.RETRIEVAL_BATCH_MAX_WORKERS) -> List[RetrievalResult]:
+        """
+        One request per question, concurrently over the pooled connections.
+
+        At most pool_size requests are in flight, since more would only
+        wait for a connection. Each question is retried and counted by the
+        circuit breaker on its own.
+        """
+        return super().retrieve_documents_batch(questions, num_results, min(max_workers, self.pool_size))
+
+    def stats(self) -> Dict[str, Any]:
+        """HTTP requests sent, retries, questions that failed, those refused by the breaker, and its state."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["circuit"] = self.breaker.state
+        return stats
 
     def get_required_env_vars(self) -> List[str]:
         return [